@@ -0,0 +1,119 @@
+# Bulk loading into stg_sales / stg_rejects
+
+# The simplest way to load rows is one INSERT per row. Every one of those is a round trip to the
+# database, plus parsing and planning the statement again - which caps us at a few hundred rows a second.
+
+# There are two much faster options, and this module uses whichever one the database supports:
+
+# 1. COPY FROM STDIN (PostgreSQL only) - we write a whole batch of rows out as CSV text and stream it
+#    to the server in one go. This is the fastest way to get data into Postgres, by a wide margin.
+# 2. executemany (everything else, e.g. SQLite in our tests) - one INSERT statement, sent with a whole
+#    batch of parameter sets at once.
+
+# Either way we go through pandas' to_sql(), the same pandas + SQLAlchemy engine pattern we used in
+# Week4/Sqlalchemy/sql-pandas.py. chunksize controls the batch size, and method lets us plug in COPY.
+
+import csv
+import io
+import os
+from contextlib import nullcontext
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from tables import stg_rejects, stg_sales
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+def get_engine(database_url=None):
+    # Same as sql-pandas.py - the connection string lives in our .env file, never in the code
+    if database_url is None:
+        load_dotenv()
+        database_url = os.getenv("DATABASE_URL")
+
+    return create_engine(database_url)
+
+
+def copy_from_stdin(table, conn, keys, data_iter):
+    # pandas calls this once per batch with the rows as tuples. We write them into an in-memory CSV
+    # and hand that to Postgres' COPY command. Missing values come through as None, which csv writes
+    # as an empty field - and an unquoted empty field is NULL to COPY.
+    buffer = io.StringIO()
+    row_count = 0
+    writer = csv.writer(buffer)
+
+    for row in data_iter:
+        writer.writerow(row)
+        row_count += 1
+
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{key}"' for key in keys)
+    table_name = f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+    sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    dbapi_connection = conn.connection.dbapi_connection # The raw psycopg connection under SQLAlchemy
+
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"): # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else: # psycopg (version 3)
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    return row_count
+
+
+class BulkLoader:
+
+    def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE, use_copy=None):
+        self.engine = engine
+        self.batch_size = batch_size
+
+        # COPY only exists in PostgreSQL - anywhere else we fall back to batched executemany
+        # (method=None is pandas' default, which is executemany).
+        if use_copy is None:
+            use_copy = engine.dialect.name == "postgresql"
+        self.method = copy_from_stdin if use_copy else None
+
+    def load_frame(self, df, table=stg_sales, connection=None):
+        # Only send the columns the table actually has (e.g. skip the id, which the database assigns)
+        columns = [column.name for column in table.columns if column.name in df.columns]
+
+        # engine.begin() opens a connection and a transaction, commits if everything worked,
+        # rolls back if anything raised - and closes the connection either way.
+        # Pass a connection to load inside a transaction that's already open - the caller commits it,
+        # together with whatever else it does on that connection.
+        with nullcontext(connection) if connection is not None else self.engine.begin() as connection:
+            df[columns].to_sql(
+                table.name,
+                connection,
+                if_exists="append",
+                index=False,
+                chunksize=self.batch_size,
+                method=self.method,
+            )
+
+        return len(df)
+
+    def load_batches(self, batches, table=stg_sales):
+        # For streamed input (e.g. read_csv(chunksize=...)). Each batch is its own transaction - that keeps
+        # transactions short, and a batch that fails doesn't undo the batches that were already loaded.
+        return sum(self.load_frame(batch, table) for batch in batches)
+
+    def load_rejects(self, rejects, source=None, connection=None):
+        # rejects is a frame of the original columns plus a "reason" column. We store the original
+        # record as a JSON string, so rejects from any source fit in the same table.
+        if rejects.empty:
+            return 0
+
+        records = rejects.drop(columns=["reason"]).to_json(orient="records", lines=True, date_format="iso")
+
+        reject_rows = pd.DataFrame({
+            "source": source,
+            "record": records.splitlines(),
+            "reason": rejects["reason"].to_numpy(),
+        })
+
+        return self.load_frame(reject_rows, stg_rejects, connection)
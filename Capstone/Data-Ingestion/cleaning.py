@@ -0,0 +1,17 @@
+# Cleaning validated sales rows before they're loaded
+
+# Validation (validation.py) decides which rows we keep. Cleaning tidies up the rows we kept - the
+# columns that are allowed to be missing get a default value, so reports and dashboards downstream
+# don't have to deal with NULL regions or sales people. Same idea as the fillna('Unknown') step in
+# Week2's sales_data_demo.ipynb.
+
+DEFAULT_FILLS = {
+    "product_name": "Unknown",
+    "region": "Unknown",
+    "sales_person": "Unknown",
+}
+
+
+def clean_sales(df, fills=DEFAULT_FILLS):
+    # Returns a new frame - the one passed in is left alone
+    return df.assign(**{column: df[column].fillna(value) for column, value in fills.items() if column in df.columns})
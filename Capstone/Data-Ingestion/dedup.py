@@ -0,0 +1,96 @@
+# Incremental deduplication across ingestion runs
+
+# drop_duplicates() only knows about the rows in front of it. If today's file overlaps with
+# yesterday's (or with a file that's a subset of another, like electronics_sales_data.csv is of
+# sales_data.csv), the only way to catch repeats with drop_duplicates is to reload everything we've
+# ever loaded, every time - so each run gets slower than the last.
+
+# Instead we keep an index of what we've already loaded: a 64 bit hash of each record's key, stored in
+# the dedup_index table (see tables.py). For a new batch we hash its keys and CLAIM them: insert them into
+# the index, skipping any that are already there, and the database tells us which ones went in. Only
+# those rows are new. The work is proportional to the batch, not to everything loaded so far.
+
+# Claiming happens on the connection the rows are loaded on, in the same transaction. Two runs loading
+# the same order at the same time can't both claim it - the second one's insert waits on the first one's
+# row (it's the table's primary key), then skips it once the first commits. And a load that fails rolls
+# its claims back with it.
+
+# By default the key is the natural key, order_id. Pass key_columns=None to hash the whole row instead.
+# Hashes are computed from the values AFTER validation, so the same record always hashes the same way.
+
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects import postgresql, sqlite
+from tables import dedup_index
+
+INSERT_BATCH_SIZE = 5_000 # Hashes per INSERT statement - SQLite limits bound parameters
+
+# INSERT ... ON CONFLICT DO NOTHING is spelled differently by each database, so SQLAlchemy keeps it in
+# the dialect packages. These are the databases we load into - anything else needs adding here.
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def row_hashes(df, key_columns=("order_id",)):
+    # hash_pandas_object hashes each row in C and gives back unsigned 64 bit ints. Our database column is
+    # a signed BIGINT, so we reinterpret the same 64 bits as signed (no information lost).
+    keys = df if key_columns is None else df[list(key_columns)]
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    return pd.Series(hashes.view(np.int64), index=df.index)
+
+
+class DedupIndex:
+
+    def __init__(self, engine, key_columns=("order_id",)):
+        self.engine = engine
+        self.key_columns = key_columns
+
+    def claim(self, df, connection=None):
+        # Returns (new_df, duplicates_df). A row is a duplicate if it's been loaded in an earlier run (or
+        # claimed by a run that's loading it right now), or if it repeats an earlier row in this same batch.
+        # Pass the connection the new rows will be loaded on - see the top of the file.
+        hashes = row_hashes(df, self.key_columns)
+
+        statement = self._insert(connection).returning(dedup_index.c.key_hash)
+        claimed = set()
+        with self._transaction(connection) as connection:
+            unique = hashes.unique()
+            for start in range(0, len(unique), INSERT_BATCH_SIZE):
+                batch = [{"key_hash": int(key_hash)} for key_hash in unique[start:start + INSERT_BATCH_SIZE]]
+                claimed.update(connection.execute(statement.values(batch)).scalars())
+
+        duplicate = ~hashes.isin(claimed) | hashes.duplicated()
+
+        return df[~duplicate], df[duplicate]
+
+    def mark_loaded(self, df, connection=None):
+        # Adds rows to the index without asking which were new - e.g. for rows that were loaded some
+        # other way. Already indexed rows are skipped, not an error.
+        hashes = row_hashes(df, self.key_columns).unique()
+        if len(hashes) == 0:
+            return 0
+
+        rows = [{"key_hash": int(key_hash)} for key_hash in hashes]
+        statement = self._insert(connection)
+
+        with self._transaction(connection) as connection:
+            connection.execute(statement, rows)
+
+        return len(rows)
+
+    def _transaction(self, connection):
+        # The caller's transaction if there is one, otherwise one of our own
+        return nullcontext(connection) if connection is not None else self.engine.begin()
+
+    def _insert(self, connection):
+        # INSERT INTO dedup_index ... ON CONFLICT (key_hash) DO NOTHING
+        dialect = (connection if connection is not None else self.engine).dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise ValueError(f"DedupIndex doesn't support {dialect!r} databases - supported: {', '.join(UPSERT_INSERTS)}")
+
+        return UPSERT_INSERTS[dialect](dedup_index).on_conflict_do_nothing(index_elements=["key_hash"])
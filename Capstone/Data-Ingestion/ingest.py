@@ -0,0 +1,87 @@
+# Ingest the sources listed in a config file - the entry point the scheduler runs
+
+# Usage, from this folder (DATABASE_URL in .env is where the rows get loaded):
+#   python ingest.py sources.yaml                       # every configured source
+#   python ingest.py sources.yaml --source daily_sales  # just one (repeat --source for more)
+#   python ingest.py sources.yaml --list                # what's configured - reads nothing
+#
+# Start up time matters here: this runs thousands of times a day, and most runs are small. So the only
+# imports up top are the standard library and sources.py (which is standard library too). pandas,
+# SQLAlchemy and the loaders are imported inside run(), after the arguments are parsed - --help, --list
+# and a bad argument all finish in a few tens of milliseconds. Check with: python -X importtime ingest.py --help
+
+import argparse
+import json
+import sys
+
+from sources import SourceRegistry
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_BATCH_SIZE = 10_000 # Same as bulk_loader.py - not imported from there, that would pull in pandas
+DEFAULT_REPORT_DIR = "./reports"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ingest the sources listed in a YAML/JSON config file")
+    parser.add_argument("config", help="sources config file (.yaml, .yml or .json)")
+    parser.add_argument("--source", action="append", dest="sources", help="only this source (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list the configured sources and exit")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR, help="where the per-source JSON reports go")
+    parser.add_argument("--trace-memory", action="store_true", help="measure each stage's peak memory (slower)")
+    parser.add_argument("--profile", action="store_true", help="save a cProfile file for each stage")
+    return parser
+
+
+def run(registry, names, engine, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE, reporter=None):
+    # The heavy part - only imported once there's actually something to load
+    from bulk_loader import BulkLoader
+    from dedup import DedupIndex
+    from parallel_ingest import ingest_chunks
+    from tables import create_tables
+
+    create_tables(engine)
+    loader, dedup = BulkLoader(engine, batch_size), DedupIndex(engine)
+    reports = []
+
+    for name in names:
+        source = registry.get(name)
+        reports.append(ingest_chunks(name, lambda: registry.read_chunks(name, chunk_size), loader,
+                                     source.validator(), dedup, reporter))
+
+    return reports
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    registry = SourceRegistry.from_file(args.config)
+
+    if args.list:
+        for name in registry.names():
+            print(f"{name}\t{registry.get(name).kind}")
+        return 0
+
+    names = args.sources or registry.names()
+    for name in names:
+        registry.get(name) # Fail on a typo before connecting to anything
+
+    from bulk_loader import get_engine
+    from instrumentation import Reporter
+
+    engine = get_engine()
+    reporter = Reporter(args.report_dir, engine, trace_memory=args.trace_memory, profile=args.profile)
+
+    try:
+        reports = run(registry, names, engine, args.chunk_size, args.batch_size, reporter)
+    finally:
+        engine.dispose()
+
+    for report in reports:
+        print(json.dumps(report))
+
+    return 1 if any("error" in report for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# Measuring every stage of a load
+
+# A load goes read -> validate -> clean -> dedup -> load. When a load is slow, the first question is
+# WHICH of those is slow - and without numbers for each stage we're guessing. A LoadRun records, per stage:
+#   seconds      wall clock time, added up over every chunk
+#   rows_in/out  rows the stage was given and rows it passed on
+#   rejects      rows it threw out (validation) or skipped (dedup)
+#   bytes_read   size of the input (read stage)
+#   peak_mb      the most memory the stage allocated at once - only with trace_memory=True
+#   max_rss_mb   the process' memory high water mark so far, as the OS sees it
+# At the end of a run the report is written out as JSON, and one row per stage goes into load_audit.
+
+# Two optional hooks for digging into a slow stage:
+# - trace_memory=True uses tracemalloc to measure each stage's peak allocation. It slows Python down
+#   noticeably, so it's off by default.
+# - profile_dir="..." runs each stage under cProfile and saves a .prof file per stage. Look at one with
+#   python -m pstats <file>, or a viewer like snakeviz.
+
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from tables import load_audit
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+DEFAULT_REPORT_DIR = "./reports"
+
+STAGE_FIELDS = ("calls", "seconds", "rows_in", "rows_out", "rejects", "bytes_read", "peak_mb", "max_rss_mb")
+
+
+def new_run_id():
+    # Sorts by time, and the random part keeps runs started in the same second apart
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux, but bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def empty_stage():
+    return {field: 0 for field in STAGE_FIELDS} | {"peak_mb": None, "max_rss_mb": None}
+
+
+def add_stage(total, stage):
+    # Combines two sets of numbers for the same stage (e.g. from two chunks, or from a worker process)
+    for field in ("calls", "seconds", "rows_in", "rows_out", "rejects", "bytes_read"):
+        total[field] += stage[field]
+
+    for field in ("peak_mb", "max_rss_mb"):
+        if stage[field] is not None:
+            total[field] = max(total[field] or 0, stage[field])
+
+    return total
+
+
+class LoadRun:
+
+    def __init__(self, source, run_id=None, trace_memory=False, profile_dir=None):
+        self.source = source
+        self.run_id = run_id or new_run_id()
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.stages = {} # Stage name -> numbers, in the order the stages first ran
+        self.profile_files = {}
+        self.error = None
+        self._profilers = {}
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        # Wrap a stage's work in a with block. The block fills in what only it knows:
+        #   with run.stage("validate", rows_in=len(df)) as counts:
+        #       valid, rejects = validator.validate(df)
+        #       counts["rows_out"], counts["rejects"] = len(valid), len(rejects)
+        counts = {"rows_in": rows_in, "rows_out": 0, "rejects": 0, "bytes_read": 0}
+
+        tracing = self.trace_memory
+        if tracing:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+
+        profiler = None
+        if self.profile_dir:
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+            profiler.enable()
+
+        started = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            seconds = time.perf_counter() - started
+
+            if profiler is not None:
+                profiler.disable()
+
+            peak_mb = None
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                peak_mb = (peak - baseline) / 1024 ** 2
+                if started_tracing:
+                    tracemalloc.stop()
+
+            add_stage(self.stages.setdefault(name, empty_stage()), {
+                "calls": 1, "seconds": seconds, **counts, "peak_mb": peak_mb, "max_rss_mb": max_rss_mb(),
+            })
+
+    def merge(self, stages):
+        # Adds in stages measured somewhere else - e.g. the read/validate/clean numbers a worker process sent back
+        for name, stage in stages.items():
+            add_stage(self.stages.setdefault(name, empty_stage()), stage)
+
+    def fail(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        # Stops the clock and writes out any cProfile results
+        self.finished_at = datetime.now(timezone.utc)
+
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for name, profiler in self._profilers.items():
+                path = os.path.join(self.profile_dir, f"{self.run_id}-{name}.prof")
+                profiler.dump_stats(path)
+                self.profile_files[name] = path
+
+        return self
+
+    def report(self):
+        finished_at = self.finished_at or datetime.now(timezone.utc)
+
+        return {
+            "run_id": self.run_id,
+            "source": self.source,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": finished_at.isoformat(),
+            "seconds": round((finished_at - self.started_at).total_seconds(), 3),
+            "stages": {
+                name: {field: round(value, 3) if isinstance(value, float) else value for field, value in stage.items()}
+                for name, stage in self.stages.items()
+            },
+            "profiles": self.profile_files,
+        }
+
+
+def write_report(report, directory=DEFAULT_REPORT_DIR):
+    # One JSON file per run, named by run id
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{report['run_id']}.json")
+
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    return path
+
+
+def record_audit(engine, report):
+    # One row per stage in load_audit, so we can compare stages across loads with plain SQL
+    rows = [
+        {
+            "run_id": report["run_id"],
+            "source": report["source"],
+            "stage": name,
+            "status": report["status"],
+            "error": report["error"],
+            **{field: stage[field] for field in STAGE_FIELDS},
+        }
+        for name, stage in report["stages"].items()
+    ]
+
+    if not rows: # A run that failed before any stage ran still gets a row
+        rows = [{"run_id": report["run_id"], "source": report["source"], "stage": "none",
+                 "status": report["status"], "error": report["error"]}]
+
+    with engine.begin() as connection:
+        connection.execute(insert(load_audit), rows)
+
+    return len(rows)
+
+
+class Reporter:
+
+    # Where a load's reports go. Hand one to ingest_file/ingest_directory, and every file loaded gets its
+    # own LoadRun, JSON report and load_audit rows. engine=None skips the table, report_dir=None the JSON.
+    def __init__(self, report_dir=DEFAULT_REPORT_DIR, engine=None, trace_memory=False, profile=False):
+        self.report_dir = report_dir
+        self.engine = engine
+        self.trace_memory = trace_memory
+        self.profile_dir = os.path.join(report_dir or ".", "profiles") if profile else None
+        self.reports = []
+
+    @property
+    def run_options(self):
+        # Plain values only - these get sent to worker processes
+        return {"trace_memory": self.trace_memory, "profile_dir": self.profile_dir}
+
+    def new_run(self, source, run_id=None):
+        return LoadRun(source, run_id=run_id, **self.run_options)
+
+    def publish(self, run):
+        report = run.finish().report()
+
+        if self.report_dir:
+            report["path"] = write_report(report, self.report_dir)
+        if self.engine is not None:
+            record_audit(self.engine, report)
+
+        self.reports.append(report)
+        return report
@@ -0,0 +1,201 @@
+# Reading and writing JSON without loading whole files
+
+# json.load() reads the entire file into one string, then builds every Python object in it before
+# handing anything back. For a file of tens of GB that's never going to fit in memory.
+
+# Two ways around it:
+
+# 1. JSON Lines (.jsonl / .ndjson) - one complete JSON document per line. We can read it a line at a time
+#    with a plain for loop, and appending a record is just writing one more line. This is the format to
+#    use for anything we write ourselves.
+# 2. For files that are one big JSON array ([{...}, {...}, ...]) we read the file in blocks, and pull
+#    complete records out of the text as soon as they've arrived, using json's raw_decode(). The same
+#    trick reads files of documents written back to back.
+
+import json
+import re
+
+import pandas as pd
+
+DEFAULT_BLOCK_SIZE = 64 * 1024 # Characters read from the file at a time
+DEFAULT_CHUNK_SIZE = 10_000 # Records per DataFrame chunk
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+
+_WHITESPACE = re.compile(r"\s*")
+_NUMBER = re.compile(r"[-+0-9.eE]*") # Every character that can carry a number on (1.5e-3)
+# An error this close to the end of what we've read could just be a record cut off by the block ("tru",
+# "1.5e-", "\u00") - anywhere earlier, reading more won't fix it
+_INCOMPLETE_MARGIN = 8
+
+
+def write_json_lines(records, path, mode="w"):
+    # records can be any iterable of dicts - a list, a generator, df.to_dict("records")...
+    # Use mode="a" to add to the end of an existing file. Returns how many records were written.
+    count = 0
+
+    with open(path, mode) as json_file:
+        for record in records:
+            json_file.write(json.dumps(record, default=str) + "\n") # default=str covers dates and the like
+            count += 1
+
+    return count
+
+
+def iter_json_lines(path):
+    # A file object is already a line-by-line iterator, so only one line is in memory at a time
+    with open(path) as json_file:
+        for line_number, line in enumerate(json_file, start=1):
+            if not line.strip():
+                continue # Blank lines (like a trailing newline) aren't records
+
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{path}, line {line_number}: {error.msg}") from error
+
+
+def iter_json_array(path, block_size=DEFAULT_BLOCK_SIZE):
+    # Yields the items of a top-level JSON array one at a time. Memory use is about one block plus
+    # one record, however big the file is.
+    return _iter_values(path, block_size, in_array=True)
+
+
+def iter_json_values(path, block_size=DEFAULT_BLOCK_SIZE):
+    # Yields each JSON document in a file of documents one after another - JSON Lines, a single
+    # (even pretty-printed) object, or documents written back to back like {...}{...}
+    return _iter_values(path, block_size, in_array=False)
+
+
+def _iter_values(path, block_size, in_array):
+    decoder = json.JSONDecoder()
+
+    with open(path) as json_file:
+        buffer = ""
+        position = 0
+        consumed = 0 # Bytes of the file dropped from the front of the buffer, for error messages
+        at_end = False
+        read_size = block_size
+
+        def read_more():
+            nonlocal buffer, position, consumed, at_end
+            block = json_file.read(read_size)
+            at_end = block == ""
+            consumed += len(buffer[:position].encode(json_file.encoding))
+            buffer = buffer[position:] + block # Drop what we've already consumed
+            position = 0
+
+        def next_character():
+            # Skips whitespace (reading more of the file as needed) and returns the next character,
+            # or "" at the end of the file
+            nonlocal position
+            while True:
+                position = _WHITESPACE.match(buffer, position).end()
+                if position < len(buffer) or at_end:
+                    return buffer[position:position + 1]
+                read_more()
+
+        if in_array:
+            if next_character() != "[":
+                raise ValueError(f"{path} does not contain a JSON array")
+            position += 1
+
+        expecting_item = True
+        seen_item = False
+
+        while True:
+            character = next_character()
+
+            if character == "":
+                if in_array:
+                    raise ValueError(f"{path}: unexpected end of file inside the array")
+                return
+
+            if in_array and character == "]":
+                if expecting_item and seen_item:
+                    raise ValueError(f"{path}: trailing ',' in array")
+                position += 1
+                if next_character() != "":
+                    raise ValueError(f"{path}: extra data after the end of the array")
+                return
+
+            if in_array and character == ",":
+                if expecting_item:
+                    raise ValueError(f"{path}: unexpected ',' in array")
+                position += 1
+                expecting_item = True
+                continue
+
+            if in_array and not expecting_item:
+                raise ValueError(f"{path}: expected ',' or ']' after an array item")
+
+            # A number that runs to the end of the buffer might carry on in the next block (1.5e | 5),
+            # and raw_decode would happily hand back just the part it can see - so read more first
+            if character in "-0123456789" and not at_end:
+                if _NUMBER.match(buffer, position).end() == len(buffer):
+                    read_more()
+                    continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                # Only a record that runs off the end of the buffer might just not be all here yet (a string
+                # with no closing quote is reported where it starts). A mistake in the middle of the buffer is
+                # a mistake - reading on would pull in the rest of the file before telling us so.
+                cut_off = (error.pos >= len(buffer) - _INCOMPLETE_MARGIN
+                           or error.msg.startswith("Unterminated string"))
+                if at_end or not cut_off:
+                    offset = consumed + len(buffer[:error.pos].encode(json_file.encoding))
+                    raise ValueError(f"{path}: invalid JSON at byte {offset}: {error.msg}") from error
+                # Read more and try again. We read bigger blocks each time, so one very large record
+                # doesn't get re-parsed over and over.
+                read_more()
+                read_size *= 2
+                continue
+
+            yield item
+            position = end
+            expecting_item = False
+            seen_item = True
+            read_size = block_size
+
+
+def iter_json_records(path, block_size=DEFAULT_BLOCK_SIZE):
+    # One function for any JSON source: .jsonl/.ndjson files are read line by line, a file that starts
+    # with [ is read as an array, and anything else as a series of documents.
+    if path.lower().endswith(JSON_LINES_EXTENSIONS):
+        return iter_json_lines(path)
+
+    with open(path) as json_file:
+        first = ""
+        while not first:
+            block = json_file.read(block_size)
+            if block == "":
+                break # Empty file
+            first = block.lstrip()[:1]
+
+    if first == "[":
+        return iter_json_array(path, block_size)
+
+    return iter_json_values(path, block_size)
+
+
+def read_json_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, dtype=None):
+    # Like pd.read_csv(chunksize=...), but for JSON - yields DataFrames of up to chunk_size records
+    batch = []
+
+    for record in iter_json_records(path):
+        batch.append(record)
+
+        if len(batch) == chunk_size:
+            yield _to_frame(batch, dtype)
+            batch = []
+
+    if batch:
+        yield _to_frame(batch, dtype)
+
+
+def _to_frame(records, dtype):
+    df = pd.DataFrame.from_records(records)
+
+    return df.astype(dtype) if dtype else df
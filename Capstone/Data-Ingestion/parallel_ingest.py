@@ -0,0 +1,262 @@
+# Ingesting a whole directory of files in parallel
+
+# Reading and validating a file is CPU work - parsing text, building frames, checking rules. Python
+# only runs one thread of Python code at a time (the GIL), so threads won't help here. Processes will:
+# a ProcessPoolExecutor starts one Python process per core, and each one reads + validates its own files.
+
+# Loading is different. If every worker wrote to the database on its own, they'd fight over the same
+# tables, and the dedup check for one file could run before another file's rows were marked as loaded.
+# So the workers only hand back their validated frames, and the main process loads them - one file
+# at a time, in a single writer. Each file gets a report of what happened to its rows.
+
+# Every stage (read -> validate -> clean -> dedup -> load) is timed with a LoadRun (instrumentation.py).
+# Pass a Reporter to get a JSON report and load_audit rows for every file.
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from cleaning import clean_sales
+from instrumentation import LoadRun
+from json_stream import read_json_chunks
+from validation import Validator
+
+SOURCE_PATTERNS = ("*.csv", "*.json", "*.jsonl", "*.ndjson")
+JSON_EXTENSIONS = (".json", ".jsonl", ".ndjson")
+
+DEFAULT_CHUNK_SIZE = 100_000 # Rows per chunk when streaming a single file
+
+
+def iter_source_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Everything is read as text - the validator does the type checking and parsing,
+    # so a bad value gets rejected with a reason instead of breaking the whole read.
+    if path.lower().endswith(JSON_EXTENSIONS):
+        return read_json_chunks(path, chunk_size, dtype="string")
+
+    return pd.read_csv(path, dtype="string", chunksize=chunk_size)
+
+
+def read_source(path):
+    chunks = list(iter_source_chunks(path))
+
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def prepare(df, validator, run):
+    # validate -> clean for one frame (a whole file, or one chunk of one). Returns (valid, rejects).
+    with run.stage("validate", rows_in=len(df)) as counts:
+        valid, rejects = validator.validate(df)
+        counts["rows_out"], counts["rejects"] = len(valid), len(rejects)
+
+    with run.stage("clean", rows_in=len(valid)) as counts:
+        valid = clean_sales(valid)
+        counts["rows_out"] = len(valid)
+
+    return valid, rejects
+
+
+def process_file(path, validator, run_options=None):
+    # Runs in a worker process. Returns plain data (frames and numbers) - that's what gets
+    # sent back to the main process. Errors are returned too, so one bad file doesn't stop the rest.
+    run = LoadRun(path, **(run_options or {}))
+    started = time.perf_counter()
+
+    try:
+        with run.stage("read") as counts:
+            df = read_source(path)
+            counts["rows_out"], counts["bytes_read"] = len(df), os.path.getsize(path)
+
+        valid, rejects = prepare(df, validator, run)
+    except Exception as error:
+        result = {"error": f"{type(error).__name__}: {error}"}
+    else:
+        result = {"rows_read": len(df), "valid": valid, "rejects": rejects}
+
+    # The worker's stage numbers go back with the result, to be finished off by the main process
+    run.finish()
+    result.update({
+        "path": path,
+        "seconds": time.perf_counter() - started,
+        "run_id": run.run_id,
+        "started_at": run.started_at,
+        "stages": run.stages,
+        "profile_files": run.profile_files,
+    })
+
+    return result
+
+
+def find_sources(directory, patterns=SOURCE_PATTERNS):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+
+    return sorted(paths)
+
+
+def load_result(result, loader, dedup=None, run=None):
+    # The single writer: dedup + load for one file's validated rows, in the main process.
+    # run collects the dedup/load stage numbers, on top of whatever the worker measured.
+    if run is None:
+        run = LoadRun(result["path"], run_id=result.get("run_id"))
+    run.merge(result.get("stages", {}))
+    run.profile_files.update(result.get("profile_files", {}))
+
+    report = {"file": os.path.basename(result["path"]), "run_id": run.run_id,
+              "parse_seconds": round(result["seconds"], 3)}
+
+    if "error" in result:
+        report["error"] = result["error"]
+        run.error = result["error"]
+        return report
+
+    valid = result["valid"]
+    duplicates = valid.iloc[0:0]
+    started = time.perf_counter()
+
+    try:
+        # One transaction for claiming the rows in the dedup index, the valid rows and the rejects. If any
+        # of it fails, none of it is committed - so a row can't be marked without being loaded, or loaded
+        # without being marked (and loaded again next run).
+        with loader.engine.begin() as connection:
+            if dedup is not None:
+                with run.stage("dedup", rows_in=len(valid)) as counts:
+                    valid, duplicates = dedup.claim(valid, connection)
+                    counts["rows_out"], counts["rejects"] = len(valid), len(duplicates)
+
+            with run.stage("load", rows_in=len(valid)) as counts:
+                loaded = loader.load_frame(valid, connection=connection)
+                loader.load_rejects(result["rejects"], source=report["file"], connection=connection)
+                counts["rows_out"] = loaded
+    except Exception as error:
+        # The transaction has rolled back - record it and move on to the next file
+        report["error"] = f"{type(error).__name__}: {error}"
+        run.error = report["error"]
+        return report
+
+    report.update({
+        "rows_read": result["rows_read"],
+        "loaded": loaded,
+        "rejected": len(result["rejects"]),
+        "duplicates": len(duplicates),
+        "load_seconds": round(time.perf_counter() - started, 3),
+    })
+
+    return report
+
+
+def ingest_file(path, loader, validator=None, dedup=None, chunk_size=DEFAULT_CHUNK_SIZE, reporter=None):
+    # Streaming mode for one file that's too big to hold in memory: read, validate, dedup and load a
+    # chunk at a time. Returns one report for the whole file.
+    bytes_read = os.path.getsize(path) if os.path.exists(path) else 0 # A missing file is reported by the read
+
+    return ingest_chunks(path, lambda: iter_source_chunks(path, chunk_size), loader, validator, dedup, reporter,
+                         bytes_read)
+
+
+def ingest_chunks(source, chunks, loader, validator=None, dedup=None, reporter=None, bytes_read=0):
+    # The streaming loop behind ingest_file, for anything that yields DataFrame chunks - a file, or a
+    # configured source (sources.py). chunks is a function returning the chunk iterator, so that opening
+    # the source happens inside the try below and a bad source ends up in the report.
+    validator = validator if validator is not None else Validator()
+    run = reporter.new_run(source) if reporter is not None else LoadRun(source)
+    totals = {"file": os.path.basename(source), "run_id": run.run_id, "rows_read": 0, "loaded": 0, "rejected": 0,
+              "duplicates": 0}
+
+    try:
+        chunks = iter(chunks())
+        bytes_left = bytes_read # Counted against the first chunk
+
+        while True:
+            # Reading is lazy - the source is actually read when we ask for the next chunk
+            with run.stage("read") as counts:
+                chunk = next(chunks, None)
+                counts["rows_out"] = 0 if chunk is None else len(chunk)
+                counts["bytes_read"], bytes_left = bytes_left, 0
+
+            if chunk is None:
+                break
+
+            started = time.perf_counter()
+            valid, rejects = prepare(chunk, validator, run)
+            result = {"path": source, "rows_read": len(chunk), "valid": valid, "rejects": rejects,
+                      "seconds": time.perf_counter() - started}
+
+            report = load_result(result, loader, dedup, run)
+            if "error" in report:
+                totals["error"] = report["error"]
+                break
+
+            for key in ("rows_read", "loaded", "rejected", "duplicates"):
+                totals[key] += report[key]
+    except Exception as error:
+        totals["error"] = f"{type(error).__name__}: {error}"
+        run.fail(error)
+
+    if reporter is not None:
+        reporter.publish(run)
+
+    return totals
+
+
+def ingest_directory(directory, loader, validator=None, dedup=None, workers=None, reporter=None):
+    # workers=None means one process per CPU core. Returns one report per file, in the order
+    # the files finished parsing.
+    validator = validator if validator is not None else Validator()
+    run_options = reporter.run_options if reporter is not None else None
+    paths = find_sources(directory)
+    reports = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, path, validator, run_options) for path in paths]
+
+        # as_completed hands us each file as soon as its worker is done, so loading the first files
+        # overlaps with parsing the rest
+        for future in as_completed(futures):
+            result = future.result()
+
+            run = None
+            if reporter is not None:
+                run = reporter.new_run(result["path"], run_id=result["run_id"])
+                run.started_at = result["started_at"] # The run started when the worker picked the file up
+
+            reports.append(load_result(result, loader, dedup, run))
+
+            if run is not None:
+                reporter.publish(run)
+
+    return reports
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from bulk_loader import DEFAULT_BATCH_SIZE, BulkLoader, get_engine
+    from dedup import DedupIndex
+    from instrumentation import DEFAULT_REPORT_DIR, Reporter
+    from tables import create_tables
+
+    parser = argparse.ArgumentParser(description="Ingest every CSV/JSON file in a directory")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR, help="where the per-file JSON reports go")
+    parser.add_argument("--trace-memory", action="store_true", help="measure each stage's peak memory (slower)")
+    parser.add_argument("--profile", action="store_true", help="save a cProfile file for each stage")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    create_tables(engine)
+    reporter = Reporter(args.report_dir, engine, trace_memory=args.trace_memory, profile=args.profile)
+
+    try:
+        reports = ingest_directory(args.directory, BulkLoader(engine, args.batch_size), dedup=DedupIndex(engine),
+                                   workers=args.workers, reporter=reporter)
+    finally:
+        engine.dispose()
+
+    for report in reports:
+        print(json.dumps(report))
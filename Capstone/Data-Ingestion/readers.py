@@ -0,0 +1,95 @@
+# The built-in readers for sources.py - one per source type
+
+# A reader takes a Source and a chunk size, and yields DataFrames of up to chunk_size rows. Everything
+# is read as text, same as parallel_ingest.py - the validator does the parsing, so a bad value gets
+# rejected with a reason instead of breaking the read.
+
+# This module is only imported the first time a source is read (see READERS in sources.py),
+# so it's free to import pandas and friends at the top.
+
+import datetime
+import os
+
+import pandas as pd
+from json_stream import read_json_chunks
+
+
+def read_csv(source, chunk_size):
+    for path in source.paths:
+        yield from pd.read_csv(path, dtype="string", chunksize=chunk_size)
+
+
+def read_json(source, chunk_size):
+    # Plain JSON arrays and JSON Lines both work - json_stream.py works out which one it has
+    for path in source.paths:
+        yield from read_json_chunks(path, chunk_size, dtype="string")
+
+
+def read_excel(source, chunk_size):
+    # openpyxl's read-only mode streams the sheet a row at a time - pd.read_excel would load the whole
+    # workbook first. The header is the first row with anything in it. sheet: picks a sheet by name.
+    from openpyxl import load_workbook
+
+    for path in source.paths:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+
+        try:
+            sheet = source.settings.get("sheet")
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            header, batch = None, []
+
+            for row in worksheet.iter_rows(values_only=True):
+                if header is None:
+                    if any(cell is not None for cell in row):
+                        header = [str(cell) if cell is not None else f"column_{number}"
+                                  for number, cell in enumerate(row)]
+                    continue
+
+                batch.append([_excel_text(cell) for cell in row])
+                if len(batch) == chunk_size:
+                    yield pd.DataFrame(batch, columns=header).astype("string")
+                    batch = []
+
+            if batch:
+                yield pd.DataFrame(batch, columns=header).astype("string")
+        finally:
+            workbook.close()
+
+
+def _excel_text(cell):
+    # Excel dates come through as datetimes - a date with no time gets written like the CSVs write it
+    if isinstance(cell, datetime.datetime) and cell.time() == datetime.time():
+        return cell.date().isoformat()
+    return cell
+
+
+def read_sql(source, chunk_size):
+    from sqlalchemy import create_engine, text
+
+    # What to read: query (any SELECT), or table for the whole of one table
+    query = source.settings.get("query")
+    if not query:
+        if not source.settings.get("table"):
+            raise ValueError(f"Source '{source.name}': sql source needs a 'table' (or 'query') option")
+        query = f"SELECT * FROM {source.settings['table']}"
+
+    # url_env names the env variable holding the connection string, like DATABASE_URL in our .env files.
+    # (A plain url setting works too - handy for SQLite files, which have no password to hide.)
+    url = source.settings.get("url")
+    if url is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        url = os.getenv(source.settings.get("url_env", "DATABASE_URL"))
+
+    if not url:
+        raise ValueError(f"Source '{source.name}' has no database url - set url_env or url")
+
+    engine = create_engine(url)
+
+    try:
+        # stream_results so the database hands rows over as we ask for them, not all at once
+        with engine.connect().execution_options(stream_results=True) as connection:
+            for chunk in pd.read_sql(text(query), connection, chunksize=chunk_size):
+                yield chunk.astype("string")
+    finally:
+        engine.dispose()
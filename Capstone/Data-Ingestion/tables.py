@@ -0,0 +1,79 @@
+# Table definitions for the ingestion subsystem
+
+# Instead of writing CREATE TABLE statements by hand, we describe our tables with SQLAlchemy's Table
+# objects. SQLAlchemy turns these into the right CREATE TABLE for whatever database we point it at,
+# which means the same definitions work against PostgreSQL in production and SQLite in our tests.
+
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, Float, Integer, MetaData, Numeric, String, Table, Text, func,
+)
+
+metadata = MetaData()
+
+# SQLite only auto-increments a primary key if it is exactly INTEGER, so we swap BigInteger for
+# Integer when we're running against SQLite.
+ID_TYPE = BigInteger().with_variant(Integer, "sqlite")
+
+# stg_sales - cleaned, validated sales transactions
+stg_sales = Table(
+    "stg_sales",
+    metadata,
+    Column("id", ID_TYPE, primary_key=True, autoincrement=True),
+    Column("order_id", String(20), nullable=False),
+    Column("order_date", Date, nullable=False),
+    Column("customer_id", String(20)),
+    Column("product_category", String(50)),
+    Column("product_name", String(100)),
+    Column("quantity", Integer),
+    Column("unit_price", Numeric(10, 2, asdecimal=False)),
+    Column("region", String(20)),
+    Column("sales_person", String(50)),
+)
+
+# stg_rejects - records that failed validation, kept for review
+stg_rejects = Table(
+    "stg_rejects",
+    metadata,
+    Column("id", ID_TYPE, primary_key=True, autoincrement=True),
+    Column("source", String(255)), # Which file (or other source) the record came from
+    Column("record", Text, nullable=False), # The original record, as JSON
+    Column("reason", Text, nullable=False), # Why it was rejected
+    Column("rejected_at", DateTime, server_default=func.now()),
+)
+
+# dedup_index - a hash of the key of every record we've already loaded. The primary key doubles as a
+# unique index, so checking whether a batch has been seen is an index lookup per row, no matter how
+# big stg_sales gets.
+dedup_index = Table(
+    "dedup_index",
+    metadata,
+    Column("key_hash", BigInteger, primary_key=True, autoincrement=False),
+    Column("first_seen", DateTime, server_default=func.now()),
+)
+
+# load_audit - one row per stage per load (see instrumentation.py), so we can see which stage
+# is slow, and whether it's getting slower, with plain SQL
+load_audit = Table(
+    "load_audit",
+    metadata,
+    Column("id", ID_TYPE, primary_key=True, autoincrement=True),
+    Column("run_id", String(64), nullable=False, index=True),
+    Column("source", String(255)),
+    Column("stage", String(20), nullable=False), # read / validate / clean / dedup / load
+    Column("status", String(10), nullable=False), # ok / error - for the run as a whole
+    Column("error", Text),
+    Column("calls", Integer), # How many chunks went through the stage
+    Column("seconds", Float),
+    Column("rows_in", BigInteger),
+    Column("rows_out", BigInteger),
+    Column("rejects", BigInteger),
+    Column("bytes_read", BigInteger),
+    Column("peak_mb", Float), # Only filled in with trace_memory=True
+    Column("max_rss_mb", Float), # Always filled in (where the OS reports it)
+    Column("recorded_at", DateTime, server_default=func.now()),
+)
+
+
+def create_tables(engine):
+    # CREATE TABLE IF NOT EXISTS for everything above
+    metadata.create_all(engine)
@@ -0,0 +1,128 @@
+# Tests for the bulk loader. We use SQLite as a stand-in for PostgreSQL so these run anywhere -
+# the executemany path runs for real, and the COPY path is checked against a fake psycopg cursor.
+
+import json
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
+from bulk_loader import BulkLoader, copy_from_stdin
+from tables import create_tables, stg_rejects, stg_sales
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+def make_sales(rows, start=0):
+    return pd.DataFrame({
+        "order_id": [f"ORD{i:07d}" for i in range(start, start + rows)],
+        "order_date": pd.to_datetime("2024-04-12"),
+        "customer_id": "CUST535",
+        "product_category": "Electronics",
+        "product_name": "Laptop",
+        "quantity": 8,
+        "unit_price": 55.99,
+        "region": "East",
+        "sales_person": "Diana",
+    })
+
+
+def count_rows(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_load_frame_inserts_every_row(engine):
+
+    # Arrange - a batch size that doesn't divide the row count evenly
+    loader = BulkLoader(engine, batch_size=300)
+
+    # Act
+    loaded = loader.load_frame(make_sales(1_000))
+
+    # Assert
+    assert loaded == 1_000
+    assert count_rows(engine, stg_sales) == 1_000
+
+
+def test_load_batches_loads_each_batch(engine):
+
+    # Arrange
+    loader = BulkLoader(engine)
+    batches = (make_sales(250, start) for start in range(0, 1_000, 250))
+
+    # Act
+    loaded = loader.load_batches(batches)
+
+    # Assert
+    assert loaded == 1_000
+    assert count_rows(engine, stg_sales) == 1_000
+
+
+def test_load_rejects_stores_record_and_reason(engine):
+
+    # Arrange
+    loader = BulkLoader(engine)
+    rejects = make_sales(2).assign(unit_price=[None, 1.0], reason=["unit_price: not_null", "order_id: dup"])
+
+    # Act
+    loader.load_rejects(rejects, source="sales_data.csv")
+
+    # Assert
+    with engine.connect() as connection:
+        rows = connection.execute(select(stg_rejects).order_by(stg_rejects.c.id)).all()
+
+    assert [row.reason for row in rows] == ["unit_price: not_null", "order_id: dup"]
+    assert rows[0].source == "sales_data.csv"
+    assert json.loads(rows[0].record)["unit_price"] is None
+
+
+class FakeCursor:
+
+    def __init__(self):
+        self.sql = None
+        self.data = None
+
+    def copy_expert(self, sql, file):
+        self.sql = sql
+        self.data = file.read()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeSQLTable:
+    name = "stg_sales"
+    schema = None
+
+
+def test_copy_from_stdin_streams_rows_as_csv():
+
+    # Arrange - mimic the connection chain pandas hands us: conn.connection.dbapi_connection.cursor()
+    cursor = FakeCursor()
+
+    class FakeDBAPIConnection:
+        def cursor(self):
+            return cursor
+
+    class FakeConnection:
+        class connection:
+            dbapi_connection = FakeDBAPIConnection()
+
+    rows = iter([("ORD0001", 8, 55.99), ("ORD0002", None, 1.5)])
+
+    # Act
+    row_count = copy_from_stdin(FakeSQLTable(), FakeConnection(), ["order_id", "quantity", "unit_price"], rows)
+
+    # Assert
+    assert row_count == 2
+    assert cursor.sql == 'COPY "stg_sales" ("order_id", "quantity", "unit_price") FROM STDIN WITH (FORMAT csv)'
+    assert cursor.data.splitlines() == ["ORD0001,8,55.99", "ORD0002,,1.5"]
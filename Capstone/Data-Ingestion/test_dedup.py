@@ -0,0 +1,104 @@
+# Tests for incremental deduplication, against SQLite
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, create_mock_engine
+from dedup import DedupIndex, row_hashes
+from tables import create_tables
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+def orders(*order_ids):
+    return pd.DataFrame({"order_id": list(order_ids), "quantity": range(len(order_ids))})
+
+
+def test_claim_drops_rows_loaded_in_earlier_runs(engine):
+
+    # Arrange - yesterday's file was already loaded
+    index = DedupIndex(engine)
+    index.mark_loaded(orders("ORD0001", "ORD0002"))
+
+    # Act - today's file overlaps with it
+    new, duplicates = index.claim(orders("ORD0002", "ORD0003"))
+
+    # Assert
+    assert new["order_id"].tolist() == ["ORD0003"]
+    assert duplicates["order_id"].tolist() == ["ORD0002"]
+
+
+def test_claim_drops_repeats_within_a_batch(engine):
+
+    # Arrange
+    index = DedupIndex(engine)
+
+    # Act
+    new, duplicates = index.claim(orders("ORD0001", "ORD0001", "ORD0002"))
+
+    # Assert
+    assert new["order_id"].tolist() == ["ORD0001", "ORD0002"]
+    assert len(duplicates) == 1
+
+
+def test_mark_loaded_twice_is_not_an_error(engine):
+
+    # Arrange
+    index = DedupIndex(engine)
+    index.mark_loaded(orders("ORD0001"))
+
+    # Act
+    index.mark_loaded(orders("ORD0001", "ORD0002"))
+
+    # Assert
+    new, _ = index.claim(orders("ORD0001", "ORD0002", "ORD0003"))
+    assert new["order_id"].tolist() == ["ORD0003"]
+
+
+def test_claims_only_last_if_the_transaction_commits(engine):
+
+    # Arrange
+    index = DedupIndex(engine)
+
+    # Act - the load after the claim fails, so the whole transaction rolls back
+    with pytest.raises(RuntimeError):
+        with engine.begin() as connection:
+            claimed, _ = index.claim(orders("ORD0001", "ORD0002"), connection)
+            raise RuntimeError("load failed")
+
+    # Assert - the next run can claim (and load) them, and the one after that can't
+    retried, _ = index.claim(orders("ORD0001", "ORD0002"))
+    again, duplicates = index.claim(orders("ORD0001", "ORD0002"))
+    assert claimed["order_id"].tolist() == retried["order_id"].tolist() == ["ORD0001", "ORD0002"]
+    assert len(again) == 0 and len(duplicates) == 2
+
+
+def test_refuses_databases_without_an_upsert():
+
+    # Arrange - a mock engine never connects, it just has MySQL's dialect
+    index = DedupIndex(create_mock_engine("mysql://", lambda *args, **kwargs: None))
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="'mysql'"):
+        index.mark_loaded(orders("ORD0001"))
+    with pytest.raises(ValueError, match="'mysql'"):
+        index.claim(orders("ORD0001"))
+
+
+def test_row_hashes_whole_row_when_no_key_columns():
+
+    # Arrange - same order_id, different quantity
+    df = pd.DataFrame({"order_id": ["ORD0001", "ORD0001"], "quantity": [1, 2]})
+
+    # Act
+    by_key = row_hashes(df)
+    by_row = row_hashes(df, key_columns=None)
+
+    # Assert
+    assert by_key[0] == by_key[1]
+    assert by_row[0] != by_row[1]
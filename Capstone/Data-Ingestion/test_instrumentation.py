@@ -0,0 +1,104 @@
+# Tests for per-stage load instrumentation - reports on disk and rows in load_audit
+
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine, select
+from bulk_loader import BulkLoader
+from dedup import DedupIndex
+from instrumentation import LoadRun, Reporter
+from parallel_ingest import ingest_directory, ingest_file
+from tables import create_tables, load_audit
+
+HEADER = "order_id,order_date,customer_id,product_category,product_name,quantity,unit_price,region,sales_person\n"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    rows = [f"ORD{n:04d},2024-04-12,CUST1,Books,Novel,2,12.50,,Bob\n" for n in range(1, 11)]
+    rows.append("ORD0099,not a date,CUST1,Books,Novel,2,12.50,West,Bob\n") # Rejected
+    rows.append(rows[0]) # A duplicate of ORD0001
+    path.write_text(HEADER + "".join(rows))
+    return str(path)
+
+
+def audit_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(load_audit).order_by(load_audit.c.id)).mappings().all()
+
+
+def test_stage_adds_up_over_calls():
+
+    # Arrange
+    run = LoadRun("example.csv", trace_memory=True)
+
+    # Act
+    for size in (3, 4):
+        with run.stage("validate", rows_in=size) as counts:
+            data = list(range(100_000)) # Something for tracemalloc to see
+            counts["rows_out"], counts["rejects"] = size - 1, 1
+
+    # Assert
+    stage = run.report()["stages"]["validate"]
+    assert (stage["calls"], stage["rows_in"], stage["rows_out"], stage["rejects"]) == (2, 7, 5, 2)
+    assert stage["peak_mb"] > 1
+    assert len(data) == 100_000
+
+
+def test_ingest_file_reports_every_stage(engine, sales_csv, tmp_path):
+
+    # Arrange
+    reporter = Reporter(str(tmp_path / "reports"), engine)
+
+    # Act
+    totals = ingest_file(sales_csv, BulkLoader(engine), dedup=DedupIndex(engine), chunk_size=5, reporter=reporter)
+
+    # Assert - the JSON report
+    with open(os.path.join(tmp_path, "reports", f"{totals['run_id']}.json")) as report_file:
+        report = json.load(report_file)
+
+    stages = report["stages"]
+    assert list(stages) == ["read", "validate", "clean", "dedup", "load"]
+    assert stages["read"]["rows_out"] == 12
+    assert stages["read"]["bytes_read"] == os.path.getsize(sales_csv)
+    assert (stages["validate"]["rows_in"], stages["validate"]["rejects"]) == (12, 1)
+    assert (stages["dedup"]["rows_in"], stages["dedup"]["rejects"]) == (11, 1)
+    assert stages["load"]["rows_out"] == totals["loaded"] == 10
+    assert report["status"] == "ok"
+
+    # Assert - one load_audit row per stage
+    rows = audit_rows(engine)
+    assert [row["stage"] for row in rows] == list(stages)
+    assert {row["run_id"] for row in rows} == {totals["run_id"]}
+    # Memory is recorded without trace_memory too - the process' high water mark after each stage
+    assert all(row["max_rss_mb"] > 0 for row in rows)
+
+
+def test_ingest_directory_reports_worker_stages_and_errors(engine, sales_csv, tmp_path):
+
+    # Arrange
+    drop = os.path.dirname(sales_csv)
+    with open(os.path.join(drop, "broken.csv"), "w") as broken:
+        broken.write("not,the,right,columns\n")
+    reporter = Reporter(str(tmp_path / "reports"), engine, profile=True)
+
+    # Act
+    ingest_directory(drop, BulkLoader(engine), dedup=DedupIndex(engine), workers=2, reporter=reporter)
+
+    # Assert
+    by_source = {os.path.basename(report["source"]): report for report in reporter.reports}
+    assert by_source["broken.csv"]["status"] == "error"
+    assert "Missing required columns" in by_source["broken.csv"]["error"]
+    assert by_source["sales.csv"]["stages"]["clean"]["rows_out"] == 11 # Measured in the worker process
+    assert os.path.exists(by_source["sales.csv"]["profiles"]["load"])
+    assert {row["status"] for row in audit_rows(engine)} == {"ok", "error"}
@@ -0,0 +1,149 @@
+# Tests for the streaming JSON reader/writer
+
+import json
+
+import pytest
+from json_stream import iter_json_array, iter_json_records, read_json_chunks, write_json_lines
+
+RECORDS = [{"order_id": f"ORD{number:04d}", "quantity": number, "tags": ["a", "]", "{"]} for number in range(50)]
+
+
+def test_iter_json_array_across_tiny_blocks(tmp_path):
+
+    # Arrange - a block size of 3 splits nearly every record and number across reads
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps(RECORDS + [1234567, -2.5e10], indent=2))
+
+    # Act
+    items = list(iter_json_array(str(path), block_size=3))
+
+    # Assert
+    assert items == RECORDS + [1234567, -2.5e10]
+
+
+@pytest.mark.parametrize("block_size", range(1, 9))
+def test_iter_json_array_numbers_split_across_blocks(tmp_path, block_size):
+
+    # Arrange - every possible place for a block to end inside a number
+    path = tmp_path / "numbers.json"
+    path.write_text("[1.5e5, 2.25, 300, -0.125, 7E-2, true, null]")
+
+    # Act
+    items = list(iter_json_array(str(path), block_size=block_size))
+
+    # Assert
+    assert items == [1.5e5, 2.25, 300, -0.125, 7e-2, True, None]
+
+
+@pytest.mark.parametrize("text", ["[1 2]", "[1,]", "[,1]", "[1,,2]", '[{"a": 1} {"a": 2}]'])
+@pytest.mark.parametrize("block_size", [1, 2, 3, 64])
+def test_iter_json_array_rejects_bad_commas(tmp_path, text, block_size):
+
+    # Arrange
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), block_size=block_size))
+
+
+def test_iter_json_array_rejects_truncated_file(tmp_path):
+
+    # Arrange
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps(RECORDS)[:-1])
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), block_size=16))
+
+
+def test_iter_json_array_stops_at_a_bad_record_without_reading_the_rest(tmp_path, monkeypatch):
+
+    # Arrange - a large array with one broken record near the start
+    good = json.dumps(RECORDS * 200)
+    bad_at = good.index('"ORD0010"')
+    path = tmp_path / "orders.json"
+    path.write_text(good[:bad_at] + "ORD0010" + good[bad_at + 9:]) # The quotes are missing
+
+    reads = []
+    real_open = open
+
+    class CountingFile:
+        def __init__(self, json_file):
+            self.json_file = json_file
+            self.encoding = json_file.encoding
+
+        def read(self, size):
+            block = self.json_file.read(size)
+            reads.append(len(block))
+            return block
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.json_file.close()
+
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: CountingFile(real_open(*args, **kwargs)))
+
+    # Act - Assert
+    with pytest.raises(ValueError, match=f"invalid JSON at byte {bad_at}: Expecting value"):
+        list(iter_json_array(str(path), block_size=64))
+
+    assert sum(reads) < bad_at + 4 * 64 # A few blocks past the bad record - not the whole file
+    assert len(good) > 100 * sum(reads)
+
+
+def test_iter_json_records_reads_back_to_back_documents(tmp_path):
+
+    # Arrange - documents written one after another with nothing between them, and one pretty-printed
+    path = tmp_path / "dogs.json"
+    path.write_text('{"name": "Pancake"}{"name": "Ellie"}\n{\n  "name": "Callie"\n}\n')
+
+    # Act
+    documents = list(iter_json_records(str(path)))
+
+    # Assert
+    assert documents == [{"name": "Pancake"}, {"name": "Ellie"}, {"name": "Callie"}]
+
+
+def test_iter_json_array_rejects_data_after_the_array(tmp_path):
+
+    # Arrange - what file_handling.py used to write: a list, then a second document straight after it
+    path = tmp_path / "json-test.json"
+    path.write_text('["Jonathan", "Richard"]{"breed": "Malchi", "name": "Pancake"}')
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        list(iter_json_records(str(path)))
+
+
+def test_json_lines_round_trip(tmp_path):
+
+    # Arrange
+    path = str(tmp_path / "orders.jsonl")
+
+    # Act
+    written = write_json_lines(iter(RECORDS), path)
+    read_back = list(iter_json_records(path))
+
+    # Assert
+    assert written == len(RECORDS)
+    assert read_back == RECORDS
+
+
+def test_read_json_chunks_yields_bounded_frames(tmp_path):
+
+    # Arrange
+    path = str(tmp_path / "orders.json")
+    with open(path, "w") as json_file:
+        json.dump(RECORDS, json_file)
+
+    # Act
+    chunks = list(read_json_chunks(path, chunk_size=20))
+
+    # Assert
+    assert [len(chunk) for chunk in chunks] == [20, 20, 10]
+    assert chunks[2]["order_id"].iloc[-1] == "ORD0049"
@@ -0,0 +1,108 @@
+# Tests for parallel directory ingestion, loading into SQLite
+
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from bulk_loader import BulkLoader
+from dedup import DedupIndex
+from parallel_ingest import ingest_directory, ingest_file
+from tables import create_tables, dedup_index, stg_rejects, stg_sales
+
+HEADER = "order_id,order_date,customer_id,product_category,product_name,quantity,unit_price,region,sales_person\n"
+
+
+def order_line(number, unit_price="9.99"):
+    return f"ORD{number:04d},2024-04-12,CUST535,Electronics,Laptop,8,{unit_price},East,Diana\n"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def drop_directory(tmp_path):
+    directory = tmp_path / "drop"
+    directory.mkdir()
+
+    (directory / "day1.csv").write_text(HEADER + "".join(order_line(n) for n in range(1, 6)))
+    # day2 overlaps day1 by two orders, and has one bad row
+    (directory / "day2.csv").write_text(HEADER + "".join(order_line(n) for n in range(4, 9)) + order_line(9, ""))
+    (directory / "day3.json").write_text(json.dumps([
+        {"order_id": "ORD0010", "order_date": "2024-04-13", "customer_id": "CUST1", "product_category": "Books",
+         "product_name": "Novel", "quantity": 2, "unit_price": 12.5, "region": "West", "sales_person": "Bob"},
+    ]))
+    (directory / "broken.csv").write_text("this is not,the right\nfile,at all\n")
+
+    return directory
+
+
+def count_rows(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_ingest_directory_loads_every_file_once(engine, drop_directory):
+
+    # Act
+    reports = ingest_directory(str(drop_directory), BulkLoader(engine), dedup=DedupIndex(engine), workers=2)
+
+    # Assert
+    by_file = {report["file"]: report for report in reports}
+    assert set(by_file) == {"day1.csv", "day2.csv", "day3.json", "broken.csv"}
+    assert "Missing required columns" in by_file["broken.csv"]["error"]
+    assert by_file["day2.csv"]["rejected"] == 1
+    assert by_file["day1.csv"]["duplicates"] + by_file["day2.csv"]["duplicates"] == 2
+    assert by_file["day3.json"]["loaded"] == 1
+    assert count_rows(engine, stg_sales) == 9 # ORD0001-ORD0008 + ORD0010
+    assert count_rows(engine, stg_rejects) == 1
+
+
+def test_ingest_file_streams_a_json_array_in_chunks(engine, tmp_path):
+
+    # Arrange
+    path = tmp_path / "big.json"
+    path.write_text(json.dumps([
+        {"order_id": f"ORD{number:04d}", "order_date": "2024-04-12", "customer_id": "CUST1",
+         "product_category": "Books", "product_name": "Novel", "quantity": 2,
+         "unit_price": None if number == 7 else 12.5, "region": "West", "sales_person": "Bob"}
+        for number in range(25)
+    ]))
+
+    # Act
+    report = ingest_file(str(path), BulkLoader(engine), dedup=DedupIndex(engine), chunk_size=10)
+
+    # Assert
+    assert report.pop("run_id") # Every load gets a run id, for finding its report and load_audit rows
+    assert report == {"file": "big.json", "rows_read": 25, "loaded": 24, "rejected": 1, "duplicates": 0}
+    assert count_rows(engine, stg_sales) == 24
+
+
+class FailingRejectsLoader(BulkLoader):
+
+    def load_rejects(self, rejects, source=None, connection=None):
+        super().load_rejects(rejects, source, connection)
+        raise RuntimeError("disk full")
+
+
+def test_a_failed_load_leaves_nothing_half_committed(engine, tmp_path):
+
+    # Arrange - the valid rows and the rejects both get written, then the load fails
+    path = tmp_path / "day1.csv"
+    path.write_text(HEADER + "".join(order_line(n) for n in range(1, 6)) + order_line(6, ""))
+
+    # Act
+    failed = ingest_file(str(path), FailingRejectsLoader(engine), dedup=DedupIndex(engine))
+    retried = ingest_file(str(path), BulkLoader(engine), dedup=DedupIndex(engine))
+
+    # Assert - the first run rolled back entirely, so the retry loads every row exactly once
+    assert failed["error"] == "RuntimeError: disk full"
+    assert retried["loaded"] == 5
+    assert retried["duplicates"] == 0
+    assert count_rows(engine, stg_sales) == 5
+    assert count_rows(engine, stg_rejects) == 1
+    assert count_rows(engine, dedup_index) == 5
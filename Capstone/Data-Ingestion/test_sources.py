@@ -0,0 +1,201 @@
+# Tests for configured sources and the ingest.py entry point
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from ingest import main, run
+from sources import SourceRegistry, load_config
+from tables import create_tables, stg_rejects, stg_sales
+
+HEADER = "order_id,order_date,customer_id,product_category,product_name,quantity,unit_price,region,sales_person\n"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def order_line(number, unit_price="9.99"):
+    return f"ORD{number:04d},2024-04-12,CUST535,Electronics,Laptop,8,{unit_price},East,Diana\n"
+
+
+def count_rows(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    (drop / "day1.csv").write_text(HEADER + "".join(order_line(n) for n in range(1, 4)))
+    (drop / "day2.csv").write_text(HEADER + order_line(4) + order_line(5, ""))
+    (drop / "partner.jsonl").write_text(json.dumps({
+        "order_id": "ORD0010", "order_date": "2024-04-13", "customer_id": "CUST1", "product_category": "Books",
+        "product_name": "Novel", "quantity": 2, "unit_price": 12.5, "region": "West", "sales_person": "Bob",
+    }) + "\n")
+
+    # A legacy database with its own (looser) rules
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE orders (order_id TEXT, order_date TEXT, quantity INTEGER)")
+        connection.exec_driver_sql("INSERT INTO orders VALUES ('ORD0020', '2024-04-14', 1), "
+                                   "('ORD0021', '2024-04-14', NULL)")
+    legacy.dispose()
+
+    path = tmp_path / "sources.yaml"
+    path.write_text(f"""
+sources:
+  daily_sales:
+    type: csv
+    path: ./drop/*.csv
+  partner_feed:
+    type: json
+    path: ./drop/partner.jsonl
+  legacy_orders:
+    type: sql
+    url: sqlite:///{tmp_path / 'legacy.db'}
+    query: SELECT order_id, order_date, quantity FROM orders
+    rules:
+      order_id: [not_null]
+      order_date: [not_null, {{date: "%Y-%m-%d"}}]
+      quantity: [not_null, {{type: int}}]
+""")
+    return str(path)
+
+
+def test_registry_reads_yaml_and_json_configs(config_path, tmp_path):
+
+    # Arrange
+    json_path = tmp_path / "sources.json"
+    json_path.write_text(json.dumps(load_config(config_path)))
+
+    # Act
+    from_yaml = SourceRegistry.from_file(config_path)
+    from_json = SourceRegistry.from_file(str(json_path))
+
+    # Assert
+    assert from_yaml.names() == from_json.names() == ["daily_sales", "partner_feed", "legacy_orders"]
+    assert [os.path.basename(path) for path in from_yaml.get("daily_sales").paths] == ["day1.csv", "day2.csv"]
+    assert sum(len(chunk) for chunk in from_yaml.read_chunks("daily_sales", chunk_size=2)) == 5
+    assert next(iter(from_yaml.read_chunks("legacy_orders", chunk_size=10)))["order_id"].tolist() == \
+        ["ORD0020", "ORD0021"]
+
+
+def test_bad_configs_fail_early(config_path):
+
+    # Arrange
+    config = load_config(config_path)
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="No reader for source type"):
+        SourceRegistry.from_config({"sources": {"odd": {"type": "parquet"}}})
+    with pytest.raises(KeyError, match="No source named"):
+        SourceRegistry.from_config(config).get("daily_sale")
+
+
+def test_readers_plug_in_by_name(tmp_path, monkeypatch):
+
+    # Arrange - a reader module that only exists in this test
+    (tmp_path / "fake_readers.py").write_text(
+        "import pandas as pd\n"
+        "def read_numbers(source, chunk_size):\n"
+        "    yield pd.DataFrame({'n': range(source.settings['count'])})\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    registry = SourceRegistry.from_config({
+        "sources": {"numbers": {"type": "numbers", "count": 3}},
+        "readers": {"numbers": "fake_readers:read_numbers"},
+    })
+
+    # Act
+    chunks = list(registry.read_chunks("numbers", chunk_size=10))
+
+    # Assert
+    assert chunks[0]["n"].tolist() == [0, 1, 2]
+
+
+def test_startup_does_not_import_pandas():
+
+    # Act - a fresh interpreter, so nothing is already imported
+    result = subprocess.run(
+        [sys.executable, "-c", "import ingest, sys; ingest.build_parser(); print('pandas' in sys.modules, "
+                               "'sqlalchemy' in sys.modules)"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+
+    # Assert
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_run_loads_every_source(config_path, engine):
+
+    # Arrange
+    registry = SourceRegistry.from_file(config_path)
+
+    # Act
+    reports = run(registry, registry.names(), engine, chunk_size=2)
+
+    # Assert
+    by_source = {report["file"]: report for report in reports}
+    assert by_source["daily_sales"]["loaded"] == 4
+    assert by_source["daily_sales"]["rejected"] == 1 # ORD0005 has no unit_price
+    assert by_source["partner_feed"]["loaded"] == 1
+    assert by_source["legacy_orders"]["loaded"] == 1
+    assert by_source["legacy_orders"]["rejected"] == 1 # ORD0021 has no quantity
+    assert count_rows(engine, stg_sales) == 6
+    assert count_rows(engine, stg_rejects) == 2
+
+
+def test_list_prints_sources_without_loading(config_path, capsys):
+
+    # Act
+    status = main([config_path, "--list"])
+
+    # Assert
+    assert status == 0
+    assert capsys.readouterr().out.splitlines() == ["daily_sales\tcsv", "partner_feed\tjson", "legacy_orders\tsql"]
+
+
+def test_excel_sources_stream_in_chunks(tmp_path):
+
+    # Arrange - a header a couple of rows down, like the normalization demo's workbooks
+    import datetime
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("returns")
+    sheet.append([])
+    sheet.append(["order_id", "order_date", "quantity"])
+    for number in range(1, 6):
+        sheet.append([f"ORD{number:04d}", datetime.datetime(2024, 4, number), number])
+    workbook.save(tmp_path / "returns.xlsx")
+
+    registry = SourceRegistry.from_config({"sources": {"returns": {"type": "excel", "path": "returns.xlsx",
+                                                                   "sheet": "returns"}}}, base_dir=str(tmp_path))
+
+    # Act
+    chunks = list(registry.read_chunks("returns", chunk_size=2))
+
+    # Assert
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[0].columns.tolist() == ["order_id", "order_date", "quantity"]
+    assert chunks[0]["order_date"].tolist() == ["2024-04-01", "2024-04-02"]
+
+
+def test_sql_source_without_table_or_query_says_what_is_missing():
+
+    # Arrange
+    registry = SourceRegistry.from_config({"sources": {"legacy": {"type": "sql", "url": "sqlite://"}}})
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="needs a 'table'"):
+        next(registry.read_chunks("legacy", 10))
@@ -0,0 +1,75 @@
+# Tests for the validation engine
+
+import pandas as pd
+import pytest
+from validation import AllowedValues, InRange, IsDate, IsType, NotNull, Validator, build_rules
+
+
+@pytest.fixture
+def orders():
+    return pd.DataFrame({
+        "order_id": ["ORD0001", "ORD0002", "ORD0003", "ORD0004"],
+        "order_date": ["2024-04-12", "2024-13-45", "2024-05-10", None],
+        "quantity": ["8", "3", "2.5", "abc"],
+        "region": ["East", "North", "Mars", None],
+    })
+
+
+def test_validate_splits_valid_rows_from_rejects(orders):
+
+    # Arrange
+    validator = Validator({
+        "order_date": [NotNull(), IsDate()],
+        "quantity": [IsType("int"), InRange(1, 100)],
+        "region": [AllowedValues(["North", "South", "East", "West"])],
+    })
+
+    # Act
+    valid, rejects = validator.validate(orders)
+
+    # Assert
+    assert valid["order_id"].tolist() == ["ORD0001"]
+    assert valid["quantity"].tolist() == [8]
+    assert valid["order_date"].dtype.kind == "M" # Parsed into real datetimes
+    assert rejects["reason"].tolist() == [
+        "order_date:date",
+        "quantity:type; region:allowed",
+        "order_date:not_null; quantity:type",
+    ]
+    assert rejects["quantity"].tolist() == ["3", "2.5", "abc"] # Rejects keep their original values
+
+
+def test_validate_missing_column_raises(orders):
+
+    # Arrange
+    validator = Validator({"unit_price": [NotNull()]})
+
+    # Act - Assert
+    with pytest.raises(ValueError) as ex:
+        validator.validate(orders)
+
+    assert str(ex.value) == "Missing required columns: unit_price"
+
+
+def test_build_rules_from_config(orders):
+
+    # Arrange
+    rules = build_rules({
+        "order_id": ["not_null", {"regex": r"ORD\d{4}"}],
+        "quantity": [{"type": "float"}, {"range": [3, 10]}],
+        "region": [{"allowed": ["East", "North"]}],
+    })
+
+    # Act
+    valid, rejects = Validator(rules).validate(orders.drop(index=[3]))
+
+    # Assert
+    assert valid["order_id"].tolist() == ["ORD0001", "ORD0002"]
+    assert rejects["reason"].tolist() == ["quantity:range; region:allowed"]
+
+
+def test_build_rules_unknown_rule_raises():
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        build_rules({"quantity": ["positive"]})
@@ -0,0 +1,240 @@
+# Validation - splitting incoming records into valid rows and rejects
+
+# The obvious way to validate is a loop (or df.apply) that checks one row at a time in Python.
+# That's fine for a hundred rows, and painfully slow for a few million - every row pays for the
+# Python interpreter.
+
+# Instead, every rule here checks a WHOLE column at once and gives back a boolean mask: True for the
+# rows that fail. Those masks are computed by pandas/NumPy in C, the same way sales_df['quantity'] > 5
+# is. The only Python loop is over the rules themselves - a handful, no matter how many rows we have.
+
+# Rules are declared per column, either as Rule objects or as plain config (see build_rules), e.g.
+#   {"unit_price": ["not_null", {"type": "float"}, {"range": [0, 100000]}]}
+
+import re
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+
+class Rule(ABC):
+
+    code = None # Short name used in reject reasons, e.g. "unit_price:not_null"
+
+    # Returns a boolean Series - True where the value FAILS the rule.
+    # Apart from NotNull, rules don't fail missing values. Whether a column may be empty is
+    # NotNull's job, so "optional but must be a date if present" is just IsDate() on its own.
+    @abstractmethod
+    def failures(self, series):
+        pass
+
+    # Rules that parse values (numbers, dates) hand back the parsed column, so the clean frame
+    # comes out with real types and later rules (like InRange) can compare numbers, not strings.
+    def convert(self, series):
+        return series
+
+
+class NotNull(Rule):
+
+    code = "not_null"
+
+    def failures(self, series):
+        return series.isna()
+
+
+class IsType(Rule):
+
+    code = "type"
+
+    def __init__(self, kind):
+        if kind not in ("int", "float", "str"):
+            raise ValueError(f"Unknown type '{kind}' - expected int, float or str")
+        self.kind = kind
+
+    def _parse(self, series):
+        if self.kind == "str":
+            return series.astype("string")
+
+        # errors="coerce" turns anything that isn't a number into NaN instead of raising
+        return pd.to_numeric(series, errors="coerce")
+
+    def failures(self, series):
+        parsed = self._parse(series)
+        failed = series.notna() & parsed.isna()
+
+        if self.kind == "int":
+            failed |= parsed.notna() & (parsed % 1 != 0) # 2.5 is a number, but not an int
+
+        return failed
+
+    def convert(self, series):
+        parsed = self._parse(series)
+
+        if self.kind == "int":
+            # Bad values become missing - those rows are rejected anyway
+            return parsed.where(parsed % 1 == 0).astype("Int64")
+
+        return parsed
+
+
+class InRange(Rule):
+
+    code = "range"
+
+    def __init__(self, minimum=None, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def failures(self, series):
+        numbers = pd.to_numeric(series, errors="coerce")
+        failed = pd.Series(False, index=series.index)
+
+        if self.minimum is not None:
+            failed |= numbers < self.minimum
+        if self.maximum is not None:
+            failed |= numbers > self.maximum
+
+        return failed.fillna(False).astype(bool)
+
+
+class Matches(Rule):
+
+    code = "regex"
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+
+    def failures(self, series):
+        # fullmatch - the whole value has to match, not just part of it
+        matched = series.astype("string").str.fullmatch(self.pattern)
+
+        return series.notna() & ~matched.fillna(False).astype(bool)
+
+
+class IsDate(Rule):
+
+    code = "date"
+
+    def __init__(self, date_format="%Y-%m-%d"):
+        self.date_format = date_format
+
+    def _parse(self, series):
+        # Giving pandas the exact format is both stricter and much faster than letting it guess
+        return pd.to_datetime(series, format=self.date_format, errors="coerce")
+
+    def failures(self, series):
+        return series.notna() & self._parse(series).isna()
+
+    def convert(self, series):
+        return self._parse(series)
+
+
+class AllowedValues(Rule):
+
+    code = "allowed"
+
+    def __init__(self, values):
+        self.values = set(values)
+
+    def failures(self, series):
+        return series.notna() & ~series.isin(self.values)
+
+
+# Lets us declare rules as plain config - the names used in YAML/JSON config files
+RULE_TYPES = {
+    "not_null": NotNull,
+    "type": IsType,
+    "range": InRange,
+    "regex": Matches,
+    "date": IsDate,
+    "allowed": AllowedValues,
+}
+
+
+def build_rules(config):
+    # {"quantity": ["not_null", {"type": "int"}, {"range": [1, 1000]}]} -> {"quantity": [NotNull(), IsType("int"), InRange(1, 1000)]}
+    # A rule is either a bare name (no arguments), or {name: argument} - a list argument is spread out.
+    rules = {}
+
+    for column, column_rules in config.items():
+        rules[column] = []
+
+        for rule in column_rules:
+            if isinstance(rule, str):
+                name, args = rule, []
+            else:
+                (name, arg), = rule.items()
+                args = arg if isinstance(arg, list) and name != "allowed" else [arg]
+
+            if name not in RULE_TYPES:
+                raise ValueError(f"Unknown rule '{name}' for column '{column}'")
+
+            rules[column].append(RULE_TYPES[name](*args))
+
+    return rules
+
+
+# Our rules for the sales data set (Week2/Data-Foundations/Pandas_NumPy/data/sales_data.csv).
+# region/sales_person/product_name can be missing - cleaning fills those in later.
+SALES_RULES = {
+    "order_id": [NotNull(), Matches(r"ORD\d+")],
+    "order_date": [NotNull(), IsDate("%Y-%m-%d")],
+    "customer_id": [NotNull(), Matches(r"CUST\d+")],
+    "product_category": [NotNull(), AllowedValues(["Electronics", "Clothing", "Books", "Home"])],
+    "quantity": [NotNull(), IsType("int"), InRange(1, 10_000)],
+    "unit_price": [NotNull(), IsType("float"), InRange(0, 1_000_000)],
+    "region": [AllowedValues(["North", "South", "East", "West"])],
+}
+
+
+class Validator:
+
+    def __init__(self, rules=SALES_RULES):
+        self.rules = rules
+
+    def validate(self, df):
+        # Returns (valid_df, rejects_df). valid_df has the parsed columns (dates, numbers);
+        # rejects_df has the rows exactly as they came in, plus a "reason" column.
+        missing = [column for column in self.rules if column not in df.columns]
+        if missing:
+            # A missing column isn't a bad record, it's the wrong file - fail loudly
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        failures = {} # reason code -> mask
+        converted = {}
+
+        for column, column_rules in self.rules.items():
+            series = df[column]
+
+            for rule in column_rules:
+                failures[f"{column}:{rule.code}"] = rule.failures(series)
+                series = rule.convert(series)
+
+            converted[column] = series
+
+        if failures:
+            failed = pd.concat(failures, axis=1).any(axis=1)
+        else:
+            failed = pd.Series(False, index=df.index)
+
+        valid_df = df.assign(**converted)[~failed]
+        rejects_df = df[failed].copy()
+        rejects_df["reason"] = self._reasons(failures, failed).to_numpy()
+
+        return valid_df, rejects_df
+
+    def validate_chunks(self, chunks):
+        # Works with read_csv(chunksize=...) - yields (valid, rejects) one chunk at a time
+        for chunk in chunks:
+            yield self.validate(chunk)
+
+    def _reasons(self, failures, failed):
+        # Builds "quantity:type; unit_price:not_null" for each rejected row. Only the rejected rows
+        # are touched, and we still loop per rule, not per row.
+        reasons = pd.Series("", index=failed.index[failed], dtype="object")
+
+        for code, mask in failures.items():
+            hit = mask[failed].to_numpy()
+            reasons[hit] = reasons[hit] + code + "; "
+
+        return reasons.str.rstrip("; ")
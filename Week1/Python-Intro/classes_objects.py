@@ -25,9 +25,13 @@ class Dog:
         return f"My name is {self.name}, I am a {self.breed}."
     
 
-ellie = Dog("Maltese", 16, "white", "Ellie")
+# Anything at the top level of a module runs when the module is imported - file_handling.py only wants
+# Dog, but would get our demo printing too. __name__ is "__main__" only when we run this file directly,
+# so the demo code goes under this check and importing the module just defines the classes.
+if __name__ == "__main__":
+    ellie = Dog("Maltese", 16, "white", "Ellie")
 
-print(ellie)
+    print(ellie)
     
     
 # Inheritance - If I have a class that is based on another class (An "is a" relationship) I 
@@ -43,6 +47,7 @@ class Doodle(Dog):
         self.is_eldtrich_horror = is_eldritch_horror
         
 
-callie = Doodle("Labradoodle", 16, "yellow", "callie")
+if __name__ == "__main__":
+    callie = Doodle("Labradoodle", 16, "yellow", "callie")
 
-print(callie.bark())
+    print(callie.bark())
@@ -0,0 +1,172 @@
+# Compact record objects - for when we have millions of them
+
+# Every regular Python object (like our Dog in classes_objects.py or Car in oop_intermediate.py) keeps its
+# attributes in its own dictionary, obj.__dict__. That's what lets us add new attributes whenever we like,
+# but a dictionary per object is a lot of overhead when the object is just four small fields.
+
+# __slots__ tells Python up front exactly which attributes a class has. Instead of a dictionary, each
+# object gets a fixed set of slots - much smaller, and a little faster to read. The tradeoff: no __dict__,
+# and no adding attributes that aren't listed.
+
+# When we have LOTS of records, we can go one step further and flip the layout around. Instead of a list
+# of objects each holding one value per field (an "array of structs"), we keep one NumPy array per field
+# (a "struct of arrays"). That's the same layout a DataFrame uses - filtering becomes a NumPy mask over
+# a whole column, and converting to a DataFrame or JSON doesn't touch individual objects at all.
+
+from dataclasses import dataclass, fields
+from functools import cache
+
+import numpy as np
+import pandas as pd
+
+
+class SlottedDog:
+
+    # The same Dog as classes_objects.py - just with its attributes declared in __slots__
+    __slots__ = ("breed", "age", "color", "name")
+
+    def __init__(self, breed, age, color, name="default name"):
+        self.breed = breed
+        self.age = age
+        self.color = color
+        self.name = name
+
+    def bark(self):
+        return f"{self.name} is barking"
+
+    def __str__(self):
+        return f"My name is {self.name}, I am a {self.breed}."
+
+    # There's no __dict__ to hand to json.dumps, so we build the dictionary from the slots ourselves
+    def to_dict(self):
+        return {field: getattr(self, field) for field in record_fields(type(self))}
+
+
+class SlottedDoodle(SlottedDog):
+
+    # A subclass only lists the slots it ADDS - the parent's slots are inherited
+    __slots__ = ("is_eldritch_horror",)
+
+    def __init__(self, breed, age, color, name="default name", is_eldritch_horror=True):
+        super().__init__(breed, age, color, name)
+        self.is_eldritch_horror = is_eldritch_horror
+
+
+# dataclass writes __init__, __repr__ and __eq__ for us from the annotated fields, and slots=True
+# (Python 3.10+) gives us __slots__ too. A good fit for plain records, like rows coming from a database.
+@dataclass(slots=True)
+class CarRecord:
+    make: str
+    model: str
+    year: int
+    value: float
+    vin: str
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in record_fields(type(self))}
+
+
+@dataclass(slots=True)
+class AnimalRecord:
+    name: str
+    age: int
+    species: str
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in record_fields(type(self))}
+
+
+@cache # A class's fields never change, so we only work them out once per class
+def record_fields(record_type):
+    # The field names of a slotted class or dataclass, parents first
+    if hasattr(record_type, "__dataclass_fields__"):
+        return tuple(field.name for field in fields(record_type))
+
+    names = []
+    for cls in reversed(record_type.__mro__):
+        slots = cls.__dict__.get("__slots__", ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+
+    return tuple(names)
+
+
+def as_column(values):
+    # Numbers go in a regular NumPy array. Strings don't: a NumPy string array ("<U") gives EVERY slot
+    # room for the longest string, at 4 bytes a character - one long name and a million short ones all
+    # take up the long one's space. An object array just holds a pointer to each Python string.
+    if not isinstance(values, np.ndarray):
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        if any(isinstance(value, str) for value in values):
+            return np.array(values, dtype=object)
+        values = np.asarray(values)
+
+    return values.astype(object) if values.dtype.kind in "US" else values
+
+
+class RecordColumns:
+
+    # A "struct of arrays" collection of records: one NumPy array per field.
+    #   cars = RecordColumns.from_rows(CarRecord, rows_from_the_database)
+    #   pricey = cars[cars.value > 50_000]  # filtering is a NumPy mask, no Python loop
+    #   pricey.to_dataframe()
+    def __init__(self, record_type, columns):
+        self.record_type = record_type
+        self.fields = record_fields(record_type)
+        self.columns = {field: as_column(columns[field]) for field in self.fields}
+
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must be the same length")
+
+    @classmethod
+    def from_rows(cls, record_type, rows):
+        # rows are tuples in field order - exactly what a database cursor hands back.
+        # zip(*rows) turns a list of rows into one tuple per column.
+        field_names = record_fields(record_type)
+        rows = list(rows)
+        columns = list(zip(*rows)) if rows else [()] * len(field_names)
+
+        return cls(record_type, dict(zip(field_names, columns)))
+
+    @classmethod
+    def from_records(cls, record_type, records):
+        # From existing objects - e.g. a list of SlottedDog
+        field_names = record_fields(record_type)
+        rows = ((getattr(record, field) for field in field_names) for record in records)
+
+        return cls.from_rows(record_type, (tuple(row) for row in rows))
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getattr__(self, name):
+        # cars.year gives us the whole year column as an array
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        # An int gives back a single record object. A boolean mask, slice or list of positions
+        # gives back a smaller RecordColumns - without creating any record objects.
+        if isinstance(key, (int, np.integer)):
+            values = (self.columns[field][key] for field in self.fields)
+            # .item() turns NumPy scalars (np.int64, np.str_...) back into plain Python values
+            return self.record_type(*(value.item() if isinstance(value, np.generic) else value for value in values))
+
+        return RecordColumns(self.record_type, {field: column[key] for field, column in self.columns.items()})
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def filter(self, mask):
+        return self[np.asarray(mask, dtype=bool)]
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.columns)
+
+    def to_json(self, path=None, lines=True):
+        # Whole columns at once, straight from the arrays - no per-object __dict__.
+        # lines=True writes JSON Lines (one record per line); lines=False writes a single JSON array.
+        return self.to_dataframe().to_json(path, orient="records", lines=lines)
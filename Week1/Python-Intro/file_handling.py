@@ -3,7 +3,6 @@
 
 # Importing the json module
 import json
-from asciimatics.renderers import Scale
 # import classes_objects # I can import my own modules (.py files) for use in other files as needed
 # I can get more specific as to what I want to import from a module
 from classes_objects import Dog # Only pulling in the class I need for this demo. P.s. put imports before your code.
@@ -63,15 +62,27 @@ with open("./resources/json-test.json", "w") as jsonfile:
     
     print(jsonfile.__dict__)
     
-    jsonfile.write(json_names)
+    # Careful - a .json file can only hold ONE json document. If we write two back to back, like
+    # ["Jonathan", ...]{"breed": ...}, json.load() can't read the file back.
+    # The common fix is JSON Lines: one complete json document per line. Each line can be read
+    # back on its own with json.loads(), so we never need the whole file in memory either.
+    jsonfile.write(json_names + "\n")
     
     pancake = Dog("Malchi", 10, "white", "Pancake")
     
     # If we want to serialize anything beyond the aforementioned compatible types
     # we need to turn them into a dictionary first
-    jsonfile.write(json.dumps(pancake.__dict__))
+    jsonfile.write(json.dumps(pancake.__dict__) + "\n")
     
+# Reading our JSON Lines file back - one line, one document
+with open("./resources/json-test.json") as jsonfile:
+    for line in jsonfile:
+        print(json.loads(line))
+
+# For really big JSON files (too big for json.load) see Capstone/Data-Ingestion/json_stream.py - it reads
+# JSON Lines and even huge [...] arrays a record at a time.
     
+
 # Reading json from an existing file
 
 with open("./resources/ellie.json", "r") as ellie_json:
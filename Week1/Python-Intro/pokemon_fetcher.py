@@ -0,0 +1,211 @@
+# Looking up LOTS of pokemon at once
+
+# python_http_requests.py sends one request and waits for the answer before doing anything else.
+# For one lookup that's fine. For ten thousand, almost all of our time is spent waiting on the network -
+# at a quarter second a request, that's the better part of an hour doing nothing.
+
+# This module keeps several requests in flight at the same time, using asyncio. requests itself is a
+# "blocking" library (it waits), so each request runs on a worker thread while the event loop keeps
+# the others going. On top of that:
+
+# - One shared requests.Session, so connections to the API are reused instead of reopened every time
+# - A concurrency limit (asyncio.Semaphore) and an optional requests-per-second limit, to be polite to the API
+# - Retries with exponential backoff for timeouts, 429 (too many requests) and 5xx server errors
+# - An on-disk cache, so anything we've looked up recently never hits the network again
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POKEAPI_URL = "https://pokeapi.co/api/v2/pokemon"
+
+DEFAULT_CONCURRENCY = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5 # Seconds before the first retry - doubles every retry after that
+DEFAULT_TIMEOUT = 10
+DEFAULT_CACHE_DIR = "./resources/.cache/pokeapi"
+DEFAULT_CACHE_TTL = 24 * 60 * 60 # Pokemon don't change much - a day is plenty
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ResponseCache:
+
+    # One small JSON file per URL. The file name is a hash of the URL, so any URL makes a safe file name.
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self._path(url)) as cache_file:
+                entry = json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if time.time() - entry["fetched_at"] > self.ttl:
+            return None
+
+        return entry["body"]
+
+    def put(self, url, body):
+        # Write to a temp file, then rename - a crash mid-write never leaves a broken cache file behind.
+        # mkstemp gives every writer its own temp file, so two threads caching the same URL can't
+        # write over each other's half-written file.
+        path = self._path(url)
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+
+        try:
+            with os.fdopen(handle, "w") as cache_file:
+                json.dump({"fetched_at": time.time(), "body": body}, cache_file)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+class PokemonFetcher:
+
+    def __init__(self, base_url=POKEAPI_URL, concurrency=DEFAULT_CONCURRENCY, max_per_second=None,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT,
+                 cache_dir=DEFAULT_CACHE_DIR, cache_ttl=DEFAULT_CACHE_TTL):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.max_per_second = max_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = ResponseCache(cache_dir, cache_ttl) if cache_dir else None
+
+        # A Session keeps connections open between requests. By default it only keeps 10 per host,
+        # so we size its pool to match how many requests we run at once.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url_for(self, query):
+        # The API wants lowercase names - "Pikachu", " pikachu " and "pikachu" are the same lookup
+        return f"{self.base_url}/{str(query).strip().lower()}"
+
+    def fetch_one(self, query):
+        # Plain blocking lookup with retries. Returns the pokemon's JSON, or None if it doesn't exist.
+        url = self.url_for(query)
+
+        if self.cache:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._sleep_before_retry(attempt, response.headers.get("Retry-After"))
+                continue
+
+            if response.status_code == 404:
+                return None
+
+            response.raise_for_status() # Anything else that isn't a 2xx is an error
+
+            body = response.json()
+            if self.cache:
+                self.cache.put(url, body)
+
+            return body
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        # If the server told us how long to wait, do that. Otherwise back off exponentially:
+        # 0.5s, 1s, 2s... plus a little randomness so all our workers don't retry at the same instant.
+        if retry_after is not None and retry_after.isdigit():
+            delay = int(retry_after)
+        else:
+            delay = self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+        time.sleep(delay)
+
+    async def fetch_many(self, queries):
+        # Looks up every query concurrently. Returns (results, errors): results maps each query to its
+        # JSON (or None if there's no such pokemon), errors maps queries that failed to the exception.
+        # Queries that come out as the same URL ("Pikachu", " pikachu") are only fetched once, and every
+        # one of them gets the answer.
+        semaphore = asyncio.Semaphore(self.concurrency)
+        rate_lock = asyncio.Lock()
+        next_slot = [0.0]
+
+        async def wait_for_rate_limit():
+            if not self.max_per_second:
+                return
+
+            # Hands out start times spaced 1/max_per_second apart
+            async with rate_lock:
+                now = time.monotonic()
+                wait = next_slot[0] - now
+                next_slot[0] = max(now, next_slot[0]) + 1 / self.max_per_second
+
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        # One worker thread per request we allow in flight
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        async def fetch(query):
+            async with semaphore:
+                await wait_for_rate_limit()
+                return await loop.run_in_executor(executor, self.fetch_one, query)
+
+        # url -> the first query that asked for it. fetch_one works the URL out again from that query.
+        first_query = {}
+        for query in queries:
+            first_query.setdefault(self.url_for(query), query)
+
+        try:
+            outcomes = await asyncio.gather(*(fetch(query) for query in first_query.values()), return_exceptions=True)
+        finally:
+            executor.shutdown()
+
+        by_url = dict(zip(first_query, outcomes))
+
+        results, errors = {}, {}
+        for query in queries:
+            outcome = by_url[self.url_for(query)]
+            if isinstance(outcome, Exception):
+                errors[query] = outcome
+            else:
+                results[query] = outcome
+
+        return results, errors
+
+    def fetch_all(self, queries):
+        # For regular (non-async) code - runs fetch_many to completion
+        return asyncio.run(self.fetch_many(queries))
+
+    def close(self):
+        self.session.close()
+
+    # Lets us use the fetcher in a with block, so the session always gets closed
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
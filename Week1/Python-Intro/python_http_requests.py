@@ -1,6 +1,7 @@
 # In order to send HTTP requests and receive responses we need the requests module
 # We gotta pip install it first (MAKE SURE YOU ARE IN A VIRTUAL ENVIRONMENT)
 import requests
+from pokemon_fetcher import PokemonFetcher # Our concurrent, cached fetcher - see the end of this file
 
 # Unlike other languages (i.e. Java or C#, we don't have to do things like... set up 
 # some sort of HTTP client object, we don't need a model for the return, etc)
@@ -9,6 +10,15 @@ import requests
 print("Enter a pokemon to find (either name or dex number): ")
 query = input()
 
-found_pokemon = requests.get(f"https://pokeapi.co/api/v2/pokemon/645")
+found_pokemon = requests.get(f"https://pokeapi.co/api/v2/pokemon/{query.strip().lower()}")
 
-print(found_pokemon.json())
\ No newline at end of file
+print(found_pokemon.json())
+
+# One request at a time is fine for one pokemon. For a whole list, we want several requests in flight
+# at once - PokemonFetcher (see pokemon_fetcher.py) does that, and caches what it finds on disk.
+
+with PokemonFetcher(concurrency=10) as fetcher:
+    team, _ = fetcher.fetch_all(["pikachu", "bulbasaur", 645, "not-a-pokemon"])
+
+for name, pokemon in team.items():
+    print(name, "->", pokemon["name"] if pokemon else "not found")
\ No newline at end of file
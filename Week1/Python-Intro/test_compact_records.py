@@ -0,0 +1,111 @@
+# Tests for the slotted record types and the column-per-field RecordColumns collection
+
+import json
+
+import numpy as np
+import pytest
+from compact_records import AnimalRecord, CarRecord, RecordColumns, SlottedDog, SlottedDoodle, record_fields
+
+CAR_ROWS = [
+    ("Toyota", "Prius", 2020, 25_000.0, "VIN1"),
+    ("Kia", "EV6", 2023, 52_000.0, "VIN2"),
+    ("Ford", "F-150", 2018, 31_000.0, "VIN3"),
+]
+
+
+def test_slotted_objects_have_no_dict():
+    # Arrange
+    dog = SlottedDog("Maltese", 10, "white", "Ellie")
+
+    # Act / Assert
+    assert not hasattr(dog, "__dict__")
+    with pytest.raises(AttributeError):
+        dog.favorite_toy = "ball" # Not one of the slots
+
+
+def test_subclass_fields_include_parent_slots():
+    # Arrange
+    doodle = SlottedDoodle("Goldendoodle", 3, "gold", "Biscuit")
+
+    # Act
+    record = doodle.to_dict()
+
+    # Assert
+    assert record_fields(SlottedDoodle) == ("breed", "age", "color", "name", "is_eldritch_horror")
+    assert record == {"breed": "Goldendoodle", "age": 3, "color": "gold", "name": "Biscuit",
+                      "is_eldritch_horror": True}
+    assert str(doodle) == "My name is Biscuit, I am a Goldendoodle."
+
+
+def test_from_rows_builds_one_array_per_field():
+    # Arrange / Act
+    cars = RecordColumns.from_rows(CarRecord, CAR_ROWS)
+
+    # Assert
+    assert len(cars) == 3
+    assert cars.year.tolist() == [2020, 2023, 2018]
+    assert cars[1] == CarRecord("Kia", "EV6", 2023, 52_000.0, "VIN2")
+    assert type(cars[1].year) is int # Plain Python values, not NumPy scalars
+
+
+def test_mask_filters_without_building_records():
+    # Arrange
+    cars = RecordColumns.from_rows(CarRecord, CAR_ROWS)
+
+    # Act
+    pricey = cars[cars.value > 30_000]
+    newer = cars.filter([True, True, False])
+
+    # Assert
+    assert isinstance(pricey, RecordColumns)
+    assert pricey.make.tolist() == ["Kia", "Ford"]
+    assert [car.model for car in newer] == ["Prius", "EV6"]
+
+
+def test_from_records_round_trips_objects():
+    # Arrange
+    dogs = [SlottedDog("Maltese", 10, "white", "Ellie"), SlottedDog("Husky", 4, "grey", "Koda")]
+
+    # Act
+    columns = RecordColumns.from_records(SlottedDog, dogs)
+
+    # Assert
+    assert [dog.to_dict() for dog in columns] == [dog.to_dict() for dog in dogs]
+
+
+def test_to_dataframe_and_json():
+    # Arrange
+    cars = RecordColumns.from_rows(CarRecord, CAR_ROWS)
+
+    # Act
+    df = cars.to_dataframe()
+    lines = cars.to_json().splitlines()
+
+    # Assert
+    assert list(df.columns) == ["make", "model", "year", "value", "vin"]
+    assert df["year"].dtype == np.int64
+    assert json.loads(lines[0]) == CarRecord(*CAR_ROWS[0]).to_dict()
+    assert len(lines) == 3
+
+
+def test_empty_and_mismatched_columns():
+    # Arrange / Act / Assert
+    assert len(RecordColumns.from_rows(CarRecord, [])) == 0
+
+    with pytest.raises(ValueError):
+        RecordColumns(SlottedDog, {"breed": ["a", "b"], "age": [1], "color": ["c"], "name": ["d"]})
+
+
+def test_string_columns_are_not_padded_to_the_longest_value():
+    # Arrange
+    rows = [("Ellie", 10, "dog")] * 1_000 + [("Sir Reginald Fluffington the Third of Barkshire", 2, "dog")]
+
+    # Act
+    animals = RecordColumns.from_rows(AnimalRecord, rows)
+
+    # Assert - an object column, so one long name doesn't widen every other slot
+    assert animals.name.dtype == object
+    assert animals.age.dtype == np.int64
+    assert animals[animals.name == "Ellie"].age.sum() == 10_000
+    assert animals[1_000].to_dict() == {"name": "Sir Reginald Fluffington the Third of Barkshire", "age": 2,
+                                        "species": "dog"}
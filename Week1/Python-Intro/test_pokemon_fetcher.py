@@ -0,0 +1,160 @@
+# Tests for the concurrent pokemon fetcher, against a tiny local stand-in for the PokeAPI.
+# No real network calls - the stub server runs on localhost in a background thread.
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pokemon_fetcher import PokemonFetcher, ResponseCache
+
+POKEDEX = {"pikachu": 25, "bulbasaur": 1, "victini": 494}
+
+
+class StubPokeAPI(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.rsplit("/", 1)[-1]
+
+        with server.lock:
+            server.requests.append(name)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures_left.get(name, 0)
+            if fail:
+                server.failures_left[name] = fail - 1
+
+        time.sleep(0.05) # Pretend to be a slow network
+
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+        elif name in POKEDEX:
+            body = json.dumps({"name": name, "id": POKEDEX[name]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass # Keep the test output quiet
+
+
+@pytest.fixture
+def stub_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPokeAPI)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.failures_left = {}
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(stub_api, tmp_path):
+    base_url = f"http://127.0.0.1:{stub_api.server_address[1]}/api/v2/pokemon"
+    with PokemonFetcher(base_url, concurrency=3, backoff=0.01, cache_dir=str(tmp_path / "cache")) as fetcher:
+        yield fetcher
+
+
+def test_fetch_all_returns_results_and_not_found(fetcher):
+
+    # Act
+    results, errors = fetcher.fetch_all(["Pikachu", "bulbasaur", "missingno"])
+
+    # Assert
+    assert results["Pikachu"]["id"] == 25
+    assert results["bulbasaur"]["id"] == 1
+    assert results["missingno"] is None
+    assert errors == {}
+
+
+def test_fetch_all_runs_concurrently_up_to_the_limit(fetcher, stub_api):
+
+    # Act
+    fetcher.fetch_all([f"unknown-{number}" for number in range(12)])
+
+    # Assert
+    assert stub_api.max_in_flight == 3
+
+
+def test_fetch_all_retries_server_errors(fetcher, stub_api):
+
+    # Arrange - the first two attempts fail with a 503
+    stub_api.failures_left["victini"] = 2
+
+    # Act
+    results, errors = fetcher.fetch_all(["victini"])
+
+    # Assert
+    assert results["victini"]["id"] == 494
+    assert stub_api.requests.count("victini") == 3
+
+
+def test_fetch_all_reports_errors_after_retries_run_out(fetcher, stub_api):
+
+    # Arrange
+    stub_api.failures_left["victini"] = 10
+
+    # Act
+    results, errors = fetcher.fetch_all(["victini", "pikachu"])
+
+    # Assert
+    assert "victini" in errors
+    assert results["pikachu"]["id"] == 25
+
+
+def test_second_lookup_comes_from_disk_cache(fetcher, stub_api):
+
+    # Arrange
+    fetcher.fetch_all(["pikachu"])
+
+    # Act
+    results, _ = fetcher.fetch_all(["pikachu", "pikachu"])
+
+    # Assert
+    assert results["pikachu"]["id"] == 25
+    assert stub_api.requests == ["pikachu"]
+
+
+def test_queries_for_the_same_url_are_fetched_once(fetcher, stub_api):
+
+    # Act
+    results, errors = fetcher.fetch_all(["Pikachu", " pikachu ", "pikachu"])
+
+    # Assert - one request, and every spelling gets the answer
+    assert stub_api.requests == ["pikachu"]
+    assert [results[query]["id"] for query in ["Pikachu", " pikachu ", "pikachu"]] == [25, 25, 25]
+    assert errors == {}
+
+
+def test_cache_writes_from_many_threads_do_not_collide(tmp_path):
+
+    # Arrange
+    cache = ResponseCache(str(tmp_path / "cache"))
+    body = {"name": "pikachu", "moves": list(range(5_000))} # Big enough that the writes overlap
+
+    # Act - every thread caches the same URL at once
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.put("https://example/pikachu", body), range(32)))
+
+    # Assert - one complete cache file, and no temp files left over
+    assert cache.get("https://example/pikachu") == body
+    assert len(os.listdir(tmp_path / "cache")) == 1
@@ -1,6 +1,9 @@
 # This will be a simple module with arithmetic math methods
 # to write tests against. 
 
+import numpy as np
+import pandas as pd
+
 def add(x, y):
     return x + y
     
@@ -13,4 +16,60 @@ def multiply(x,y):
 def divide(x, y):
     if y == 0: # Checking for zero division
         raise ValueError("Cannot divide by zero") # manually raising exception
-    return x / y
\ No newline at end of file
+    return x / y
+
+
+# Array versions - for whole columns at once
+# The functions above work on one pair of numbers. To use them on a column we'd have to loop in Python,
+# one value at a time. These versions take NumPy arrays or pandas Series (or plain numbers) and let
+# NumPy do the work in compiled code. They broadcast just like the intro_to_numpy examples:
+# array + array works element by element, and array + number applies the number to every element.
+# A Series in gives a Series back, lined up by index the same way series_a + series_b would be.
+
+ZERO_DIVISION_POLICIES = ("raise", "nan", "mask")
+
+def add_array(x, y):
+    return np.add(x, y)
+
+def subtract_array(x, y):
+    return np.subtract(x, y)
+
+def multiply_array(x, y):
+    return np.multiply(x, y)
+
+def divide_array(x, y, zero_division="raise"):
+    # zero_division decides what happens where y is zero:
+    # "raise" - the same ValueError as divide(), if ANY divisor is zero
+    # "nan"   - those results become NaN, everything else is divided as normal
+    # "mask"  - those results are masked out: a NumPy masked array, or a Series with <NA> in those spots
+    if zero_division not in ZERO_DIVISION_POLICIES:
+        raise ValueError(f"zero_division must be one of {ZERO_DIVISION_POLICIES}")
+
+    # Two Series divide by matching index labels, not by position - so line them up first, or the zero
+    # check below would look at a different row than the one actually divided
+    if isinstance(x, pd.Series) and isinstance(y, pd.Series):
+        x, y = x.align(y)
+
+    zeros = np.asarray(y) == 0
+
+    if zero_division == "raise" and zeros.any():
+        raise ValueError("Cannot divide by zero")
+
+    # NumPy would warn about dividing by zero - we're handling those spots ourselves below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.divide(x, y)
+
+    if zero_division == "raise":
+        return result
+
+    zeros = np.broadcast_to(zeros, np.shape(result)) # y might be a single number
+
+    if isinstance(result, pd.Series):
+        if zero_division == "mask":
+            result = result.astype("Float64") # The nullable float type, so missing shows as <NA>
+        return result.mask(zeros)
+
+    if zero_division == "mask":
+        return np.ma.masked_array(result, mask=zeros)
+
+    return np.where(zeros, np.nan, result)
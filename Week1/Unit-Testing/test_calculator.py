@@ -11,8 +11,11 @@
 # some considerations when your code talks to other outside systems
 # like APIs or databases. For now we keep it simple. 
 
+import numpy as np
+import pandas as pd
 import pytest
 from calculator import add, subtract, multiply, divide
+from calculator import add_array, subtract_array, multiply_array, divide_array
 
 # Within our test.py module/file - we want to keep respecting naming conventions
 # These are just python methods. But we name them as follows
@@ -57,4 +60,97 @@ def test_add():
     result = add(x, y)
     
     # Assert
-    assert result == 10
\ No newline at end of file
+    assert result == 10
+
+# Tests for the array versions - same A-A-A pattern, but our data is whole arrays
+
+def test_array_math_broadcasts():
+    
+    # Arrange
+    x = np.array([1, 2, 3])
+    y = np.array([4, 5, 6])
+    
+    # Act / Assert - array with array, and array with a single number
+    assert add_array(x, y).tolist() == [5, 7, 9]
+    assert subtract_array(y, x).tolist() == [3, 3, 3]
+    assert multiply_array(x, 10).tolist() == [10, 20, 30]
+    assert divide_array(y, 2).tolist() == [2.0, 2.5, 3.0]
+    
+def test_array_math_keeps_series():
+    
+    # Arrange
+    quantity = pd.Series([2, 3], index=["a", "b"])
+    price = pd.Series([1.5, 2.0], index=["a", "b"])
+    
+    # Act
+    result = multiply_array(quantity, price)
+    
+    # Assert
+    assert isinstance(result, pd.Series)
+    assert result.to_dict() == {"a": 3.0, "b": 6.0}
+    
+def test_divide_array_raises_on_zero_by_default():
+    
+    # Arrange
+    x = np.array([4, 6])
+    y = np.array([2, 0])
+    
+    # Act - Assert
+    with pytest.raises(ValueError) as ex:
+        divide_array(x, y)
+        
+    assert str(ex.value) == "Cannot divide by zero"
+    
+def test_divide_array_nan_policy():
+    
+    # Arrange
+    x = np.array([4, 6, 0])
+    y = np.array([2, 0, 0])
+    
+    # Act
+    result = divide_array(x, y, zero_division="nan")
+    
+    # Assert - NaN where we divided by zero, no inf sneaking through
+    assert result[0] == 2
+    assert np.isnan(result[1:]).all()
+    
+def test_divide_array_mask_policy():
+    
+    # Arrange
+    x = np.array([4.0, 6.0])
+    series = pd.Series([4.0, 6.0])
+    y = np.array([2, 0])
+    
+    # Act
+    masked = divide_array(x, y, zero_division="mask")
+    series_result = divide_array(series, pd.Series([2, 0]), zero_division="mask")
+    
+    # Assert
+    assert masked.mask.tolist() == [False, True]
+    assert masked.sum() == 2 # Masked values are left out of the math
+    assert series_result[0] == 2
+    assert series_result[1] is pd.NA
+    
+def test_divide_array_lines_series_up_by_index():
+    
+    # Arrange - same labels in a different order, and a label only x has
+    x = pd.Series([4.0, 6.0, 8.0], index=["a", "b", "c"])
+    y = pd.Series([0, 2], index=["b", "a"])
+    
+    # Act
+    result = divide_array(x, y, zero_division="nan")
+    
+    # Assert - a is 4 / 2, b is 6 / 0, c has nothing to divide by
+    assert result["a"] == 2
+    assert np.isnan(result["b"])
+    assert np.isnan(result["c"])
+    assert not np.isinf(result).any()
+    
+    with pytest.raises(ValueError):
+        divide_array(x, y) # b's divisor is zero, wherever it sits in y
+    
+def test_divide_array_unknown_policy():
+    
+    # Act - Assert
+    with pytest.raises(ValueError):
+        divide_array(np.array([1]), np.array([1]), zero_division="infinity")
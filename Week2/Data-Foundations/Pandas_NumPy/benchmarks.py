@@ -0,0 +1,257 @@
+# Benchmarks for the sales data paths
+# %%time and %%timeit in the notebook tell us how long something took once, on our 100 row file.
+# That doesn't tell us much about 1 million rows, and nothing at all about whether yesterday's
+# change made things slower. This script:
+
+# 1. Generates synthetic sales data shaped like data/sales_data.csv, at whatever sizes we ask for
+# 2. Times each step of the notebook's pipeline - CSV load, cleaning, total_sale, the groupbys and a load
+#    into SQLite - and records how much memory each step allocated at its peak
+# 3. Saves the results as JSON, and compares them against a saved baseline. Anything that got slower
+#    (or hungrier) than the baseline allows fails the run.
+
+# Usage, from this folder:
+#   python benchmarks.py                          # 10k rows, compare against benchmark_baseline.json
+#   python benchmarks.py --sizes 10k 1m 10m       # The big sizes take a while (and a few GB of disk/RAM at 10m)
+#   python benchmarks.py --save-baseline          # Record this run as the new baseline
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from schemas import SALES_SCHEMA, read_with_schema
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+BASELINE_PATH = "./benchmark_baseline.json"
+RESULTS_DIR = "./benchmark_results"
+
+DEFAULT_REPEATS = 3
+DEFAULT_TIME_TOLERANCE = 0.25 # 25% slower than the baseline counts as a regression
+DEFAULT_MEMORY_TOLERANCE = 0.10
+MIN_SECONDS = 0.005 # Below this, timings are mostly noise - never flag them
+
+PRODUCTS = {
+    "Electronics": ["Laptop", "Phone", "Tablet", "Headphones"],
+    "Clothing": ["Jeans", "T-Shirt", "Jacket", "Shoes"],
+    "Home": ["Lamp", "Blender", "Rug", "Cookware"],
+    "Books": ["Novel", "Cookbook", "Textbook", "Comic"],
+}
+REGIONS = ["North", "South", "East", "West"]
+SALES_PEOPLE = ["Alice", "Bob", "Charlie", "Diana", "Eve", "Frank", "Grace", "Henry"]
+
+
+def make_sales_data(rows, seed=0, missing_rate=0.05):
+    # Every column is built as a whole array at once - generating 10 million rows one at a time
+    # in a Python loop would take longer than the benchmarks themselves
+    rng = np.random.default_rng(seed)
+
+    categories = np.array(list(PRODUCTS))
+    category_codes = rng.integers(0, len(categories), rows)
+    product_names = np.array([PRODUCTS[category] for category in categories]) # One row per category
+    names = product_names[category_codes, rng.integers(0, product_names.shape[1], rows)]
+
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 366, rows), unit="D")
+
+    unit_price = rng.uniform(5, 500, rows).round(2)
+    unit_price[rng.random(rows) < missing_rate] = np.nan
+
+    region = pd.Series(np.array(REGIONS)[rng.integers(0, len(REGIONS), rows)])
+    region[rng.random(rows) < missing_rate] = None
+
+    return pd.DataFrame({
+        "order_id": pd.Series(np.arange(1, rows + 1)).map("ORD{:07d}".format),
+        "order_date": dates.strftime("%Y-%m-%d"),
+        "customer_id": pd.Series(rng.integers(1, 1000, rows)).map("CUST{:03d}".format),
+        "product_category": categories[category_codes],
+        "product_name": names,
+        "quantity": rng.integers(1, 11, rows),
+        "unit_price": unit_price,
+        "region": region,
+        "sales_person": np.array(SALES_PEOPLE)[rng.integers(0, len(SALES_PEOPLE), rows)],
+    })
+
+
+# The steps we benchmark - the same code as sales_data_demo.ipynb
+
+def load_csv(path):
+    return read_with_schema(path, SALES_SCHEMA)
+
+
+def clean(df):
+    df["unit_price"] = df["unit_price"].fillna(df["unit_price"].mean())
+    df["region"] = df["region"].cat.add_categories("Unknown").fillna("Unknown")
+
+    return df.dropna()
+
+
+def add_total_sale(df):
+    df["total_sale"] = df["quantity"] * df["unit_price"]
+
+    return df
+
+
+def aggregate(df):
+    category_sales = df.groupby("product_category", observed=True)["total_sale"].sum()
+    region_avg = df.groupby("region", observed=True)["total_sale"].mean().round(2)
+    category_stats = df.groupby("product_category", observed=True).agg({
+        "total_sale": ["sum", "mean", "count", "std"],
+        "quantity": ["mean", "max"],
+    })
+
+    return category_sales, region_avg, category_stats
+
+
+def load_sqlite(df):
+    # A fresh in-memory database each time, so every repeat does the same amount of work
+    with sqlite3.connect(":memory:") as connection:
+        return df.to_sql("sales", connection, index=False, chunksize=10_000)
+
+
+def measure(function, setup, repeats=DEFAULT_REPEATS):
+    # setup() builds the step's input fresh for every repeat (most steps change the frame they're given),
+    # and isn't part of the timing. We keep the fastest time - the slower runs are the ones
+    # where something else on the machine got in the way.
+    timings = []
+    for _ in range(repeats):
+        args = setup()
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+
+    # Memory gets its own run - tracemalloc slows everything down, so it can't share a run with the timing.
+    # NumPy and pandas report their array allocations to tracemalloc, so this includes the data itself.
+    args = setup()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(min(timings), 6),
+        "mean_seconds": round(sum(timings) / len(timings), 6),
+        "peak_mb": round(peak / 1024 ** 2, 3),
+    }
+
+
+def run_size(rows, repeats=DEFAULT_REPEATS, seed=0, work_dir=None):
+    # Benchmarks every step at one size. Each step gets the output of the step before it as its input.
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        csv_path = os.path.join(temp_dir, "sales.csv")
+        make_sales_data(rows, seed).to_csv(csv_path, index=False)
+
+        results = {"csv_load": measure(load_csv, lambda: (csv_path,), repeats)}
+        loaded = load_csv(csv_path)
+
+    results["clean"] = measure(clean, lambda: (loaded.copy(),), repeats)
+    cleaned = clean(loaded.copy())
+
+    results["total_sale"] = measure(add_total_sale, lambda: (cleaned.copy(),), repeats)
+    with_totals = add_total_sale(cleaned.copy())
+
+    results["groupby"] = measure(aggregate, lambda: (with_totals,), repeats)
+    results["sqlite_load"] = measure(load_sqlite, lambda: (with_totals,), repeats)
+
+    return results
+
+
+def run_benchmarks(sizes, repeats=DEFAULT_REPEATS, seed=0):
+    # sizes are names from SIZES ("10k", "1m", "10m")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sizes": {},
+    }
+
+    for size in sizes:
+        print(f"Benchmarking {size} rows...", file=sys.stderr)
+        results["sizes"][size] = run_size(SIZES[size], repeats, seed)
+
+    return results
+
+
+def compare(results, baseline, time_tolerance=DEFAULT_TIME_TOLERANCE, memory_tolerance=DEFAULT_MEMORY_TOLERANCE):
+    # Returns a list of regressions - one message per step that got worse than the tolerance allows.
+    # Sizes/steps that aren't in the baseline yet are skipped, not failed.
+    regressions = []
+
+    for size, steps in results["sizes"].items():
+        for step, measured in steps.items():
+            expected = baseline.get("sizes", {}).get(size, {}).get(step)
+            if expected is None:
+                continue
+
+            if measured["seconds"] > max(expected["seconds"] * (1 + time_tolerance), MIN_SECONDS):
+                regressions.append(f"{size} {step}: {measured['seconds']:.4f}s "
+                                   f"(baseline {expected['seconds']:.4f}s)")
+
+            if measured["peak_mb"] > expected["peak_mb"] * (1 + memory_tolerance):
+                regressions.append(f"{size} {step}: {measured['peak_mb']:.1f} MB peak "
+                                   f"(baseline {expected['peak_mb']:.1f} MB)")
+
+    return regressions
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+def print_table(results):
+    print(f"{'size':>5} {'step':<12} {'seconds':>10} {'peak MB':>10}")
+    for size, steps in results["sizes"].items():
+        for step, measured in steps.items():
+            print(f"{size:>5} {step:<12} {measured['seconds']:>10.4f} {measured['peak_mb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sales data pipeline")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k"])
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to the baseline file")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeats)
+    print_table(results)
+
+    # Every run is kept, named by when it ran, so we can look back at how things have changed
+    stamp = results["created"].replace(":", "-")
+    save_results(results, os.path.join(RESULTS_DIR, f"{stamp}.json"))
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} - run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0 # A non-zero exit code fails a CI job
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# A tiny on-disk column store for numeric data
+
+# Even with a schema, every read_csv parses text: "298.32" has to be turned into a float, every row,
+# every time. The Parquet cache (parquet_cache.py) fixes that, but reading Parquet still decodes and
+# copies every value into memory before we can use it.
+
+# A NumPy array is just a block of memory: length * itemsize bytes. If we write that block to a file
+# as-is, we can get it back with np.memmap - the OS maps the file into memory, and bytes are only read
+# from disk when we actually touch them. Opening a column is instant whatever its size, a scan that only
+# uses unit_price never reads quantity at all, and nothing is copied - the array IS the file.
+
+# On disk, a store is a folder:
+#   manifest.json         the columns, their dtypes, and how many rows the store has
+#   000_quantity.values   the raw values - length * itemsize bytes, nothing else
+#   000_quantity.nulls    one bit per row, 1 = missing (np.packbits) - only for columns that have ever had one
+# Raw buffers instead of .npy files so we can append: a .npy file has the array's shape in its header,
+# so adding rows would mean rewriting it. Here the length lives in the manifest, and appending a batch is
+# "write the bytes on the end, then update the manifest".
+
+#   store = ColumnStore("data/.columns/sales")
+#   store.append(df)                            # Any number of times - the first batch sets the columns
+#   unit_price = store.column("unit_price")     # np.memmap - zero copy
+#   store.masked("quantity").mean()             # np.ma array - missing values are skipped
+
+import copy
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from schemas import dtypes_for
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def numpy_dtype(series):
+    # The plain NumPy dtype we store a column as. Nullable pandas types (Int16, Float32...) map to their
+    # NumPy version - their missing values go in the null bitmap instead.
+    dtype = series.dtype
+    dtype = getattr(dtype, "numpy_dtype", dtype)
+
+    if not isinstance(dtype, np.dtype) or dtype.kind not in "biuf":
+        raise ValueError(f"Column '{series.name}' is {series.dtype} - the column store only holds numbers and bools")
+
+    return dtype
+
+
+def _file_stem(number, name):
+    # "Electric Range" -> "003_electric_range". The number keeps two names that tidy up the same apart.
+    return f"{number:03d}_{re.sub(r'[^0-9a-z]+', '_', name.lower()).strip('_')}"
+
+
+class ColumnStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {"length": 0, "columns": {}}
+
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+
+    def __len__(self):
+        return self.manifest["length"]
+
+    @property
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    def _file(self, name, kind):
+        return os.path.join(self.path, self.manifest["columns"][name][kind])
+
+    # Reading
+
+    def column(self, name):
+        # The values, straight from disk. Read only - writes go through append(). Missing values hold
+        # whatever was filled in (0 for ints), so check null_mask() - or use masked() - if the column has any.
+        info = self.manifest["columns"][name]
+        if len(self) == 0:
+            return np.empty(0, dtype=info["dtype"])
+
+        return np.memmap(self._file(name, "values"), dtype=info["dtype"], mode="r", shape=(len(self),))
+
+    def null_mask(self, name):
+        # True where the value is missing. Columns with no missing values don't have a bitmap at all.
+        info = self.manifest["columns"][name]
+        if not info["null_count"]:
+            return np.zeros(len(self), dtype=bool)
+
+        packed = np.memmap(self._file(name, "nulls"), dtype=np.uint8, mode="r", shape=((len(self) + 7) // 8,))
+        return np.unpackbits(packed, count=len(self), bitorder="little").astype(bool)
+
+    def masked(self, name):
+        # A masked array - sum(), mean() etc skip the missing values (same idea as calculator.py's "mask")
+        values = self.column(name)
+        if not self.manifest["columns"][name]["null_count"]:
+            return np.ma.masked_array(values)
+
+        return np.ma.masked_array(values, mask=self.null_mask(name))
+
+    def read(self, columns=None):
+        # As a DataFrame with nullable pandas types, for when we want pandas after all.
+        # Only the columns asked for are read (and this one does copy them into memory).
+        data = {}
+        for name in columns or self.columns:
+            values = self.column(name)
+            data[name] = pd.array(np.asarray(values), dtype=_nullable(values.dtype))
+            data[name][self.null_mask(name)] = pd.NA
+
+        return pd.DataFrame(data)
+
+    # Writing
+
+    def append(self, df):
+        # Adds a batch of rows. The first batch decides the columns and their dtypes; later batches need the
+        # same columns, and are cast to the stored dtypes.
+        if not self.manifest["columns"]:
+            self._add_columns(df)
+
+        mismatched = set(self.columns) ^ set(df.columns)
+        if mismatched:
+            raise ValueError(f"Batch columns don't match the store - mismatched: {', '.join(sorted(mismatched))}")
+
+        os.makedirs(self.path, exist_ok=True)
+        length = len(self)
+        before = copy.deepcopy(self.manifest)
+
+        try:
+            for name, info in self.manifest["columns"].items():
+                series = df[name]
+                nulls = series.isna().to_numpy()
+                dtype = np.dtype(info["dtype"])
+                values = series.to_numpy(dtype=dtype, na_value=np.nan if dtype.kind == "f" else 0)
+
+                self._write_values(name, values, length)
+                if nulls.any() or info["null_count"]:
+                    self._write_nulls(name, nulls, length)
+                    info["null_count"] += int(nulls.sum())
+        except Exception:
+            self.manifest = before # The files may have extra bytes on the end now - the next append trims them
+            raise
+
+        # The manifest is written last, and swapped in in one step - until then, readers (and a crashed
+        # append) still see the old length, and anything past it in the files is ignored
+        self.manifest["length"] = length + len(df)
+        self._save_manifest()
+        return len(df)
+
+    def _add_columns(self, df):
+        for number, name in enumerate(df.columns):
+            stem = _file_stem(number, str(name))
+            self.manifest["columns"][name] = {
+                "dtype": numpy_dtype(df[name]).str, # e.g. "<i2" - includes the byte order
+                "values": f"{stem}.values",
+                "nulls": f"{stem}.nulls",
+                "null_count": 0,
+            }
+
+    def _write_values(self, name, values, length):
+        path = self._file(name, "values")
+        itemsize = np.dtype(self.manifest["columns"][name]["dtype"]).itemsize
+
+        with open(path, "ab") as values_file:
+            values_file.truncate(length * itemsize) # Drops anything a failed append left past the end
+            values_file.write(np.ascontiguousarray(values).tobytes())
+
+    def _write_nulls(self, name, nulls, length):
+        path = self._file(name, "nulls")
+
+        # Bits are packed 8 to a byte - if the last byte is only partly used, it's rewritten with the new bits
+        whole_bytes, tail_bits = divmod(length, 8)
+
+        if self.manifest["columns"][name]["null_count"]:
+            with open(path, "rb") as nulls_file:
+                nulls_file.seek(whole_bytes)
+                last_byte = np.frombuffer(nulls_file.read(1), dtype=np.uint8)
+            tail = np.unpackbits(last_byte, count=tail_bits, bitorder="little").astype(bool)
+        else:
+            # This column's first missing value - every row before it was present, so the bitmap starts as zeros
+            with open(path, "wb") as nulls_file:
+                nulls_file.write(bytes(whole_bytes))
+            tail = np.zeros(tail_bits, dtype=bool)
+
+        with open(path, "r+b") as nulls_file:
+            nulls_file.truncate(whole_bytes)
+            nulls_file.seek(whole_bytes)
+            nulls_file.write(np.packbits(np.concatenate([tail, nulls]), bitorder="little").tobytes())
+
+    def _save_manifest(self):
+        path = os.path.join(self.path, MANIFEST_NAME)
+        with open(path + ".tmp", "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+
+        os.replace(path + ".tmp", path) # Atomic - readers see the old manifest or the new one, never half of one
+
+
+def _nullable(dtype):
+    # int16 -> "Int16", float32 -> "Float32", bool -> "boolean"
+    return "boolean" if dtype.kind == "b" else dtype.name.capitalize()
+
+
+def build_store(csv_path, store_path, schema, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Converts the numeric columns of a CSV, chunk by chunk - so files bigger than memory work too.
+    # Starts from scratch: any store already at store_path is replaced.
+    if os.path.exists(os.path.join(store_path, MANIFEST_NAME)):
+        os.remove(os.path.join(store_path, MANIFEST_NAME))
+
+    store = ColumnStore(store_path)
+    dtypes = {column: dtype for column, dtype in dtypes_for(csv_path, schema).items() if column in columns}
+
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_size):
+        store.append(chunk[columns])
+
+    return store
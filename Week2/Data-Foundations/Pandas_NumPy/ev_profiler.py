@@ -0,0 +1,157 @@
+# Streaming profiler for the EV population data set
+
+# pd.read_csv() on its own pulls the ENTIRE file into memory before we can do anything with it.
+# That's fine for a demo sized CSV, but our full copy of Electric_Vehicle_Population_Data.csv is
+# several GB - the dataframe ends up even bigger than the file and the process gets killed.
+
+# The fix is to read the file in chunks. When we pass chunksize to read_csv we don't get a dataframe
+# back, we get an iterator that hands us one smaller dataframe at a time. If we only ever hold one
+# chunk at a time, and we keep running totals instead of the chunks themselves, our memory usage
+# depends on the chunk size - not on the size of the file.
+
+# The stats we care about (the ones describe(), isna().sum() and .shape give us) can all be built
+# up this way: counts and nulls just add up, min/max compare, and mean/std can be merged chunk by
+# chunk (see StreamingProfile.update() below).
+
+import numpy as np
+import pandas as pd
+from schemas import EV_SCHEMA
+
+EV_DATA_PATH = "./data/Electric_Vehicle_Population_Data.csv"
+
+DEFAULT_CHUNK_SIZE = 100_000 # Rows per chunk - this is the knob that controls our memory usage
+
+# We always read with explicit dtypes (declared in schemas.py). If we don't declare them, pandas has to
+# guess per chunk, which is slower AND can guess differently from one chunk to the next (a column that
+# is all integers in chunk 1 might have a null in chunk 2 and turn into floats).
+
+
+def read_in_chunks(path=EV_DATA_PATH, dtypes=EV_SCHEMA, chunk_size=DEFAULT_CHUNK_SIZE, usecols=None):
+    # A thin wrapper around read_csv that always streams. usecols lets us skip parsing
+    # columns we don't need at all - the cheapest column is the one we never read.
+    if usecols is not None:
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column in usecols}
+
+    return pd.read_csv(path, dtype=dtypes, chunksize=chunk_size, usecols=usecols)
+
+
+class StreamingProfile:
+
+    # Holds running totals for everything we'd normally get from describe(), isna().sum() and .shape.
+    # Nothing in here grows with the number of rows - only with the number of columns.
+    def __init__(self):
+        self.row_count = 0
+        self.columns = None
+        self.null_counts = None
+
+        # Per numeric column: how many non-null values we've seen, their mean, and M2 - the sum of
+        # squared differences from the mean. M2 is what lets us merge std deviations between chunks.
+        self._count = None
+        self._mean = None
+        self._m2 = None
+        self._min = None
+        self._max = None
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.null_counts = pd.Series(0, index=self.columns, dtype="int64")
+
+        self.row_count += len(chunk)
+        self.null_counts += chunk.isna().sum()
+
+        numeric = chunk.select_dtypes(include="number").astype("float64")
+        if numeric.empty and self._count is None:
+            return
+
+        count = numeric.count()
+        mean = numeric.mean()
+        m2 = ((numeric - mean) ** 2).sum()
+        chunk_min = numeric.min()
+        chunk_max = numeric.max()
+
+        if self._count is None:
+            self._count, self._mean, self._m2 = count, mean.fillna(0.0), m2
+            self._min, self._max = chunk_min, chunk_max
+            return
+
+        # Merging two sets of (count, mean, M2) - this is Chan's parallel variance formula.
+        # It gives the same answer as if we had computed mean/std over both chunks at once,
+        # without ever needing the two chunks in memory together.
+        total = self._count + count
+        delta = mean.fillna(0.0) - self._mean
+        safe_total = total.where(total > 0, 1) # Avoid dividing by zero for all-null columns
+
+        self._mean = self._mean + delta * count / safe_total
+        self._m2 = self._m2 + m2 + delta ** 2 * self._count * count / safe_total
+        self._count = total
+
+        # min()/max() skip over NaN, so an all-null chunk doesn't wipe out what we've already seen
+        self._min = pd.concat([self._min, chunk_min], axis=1).min(axis=1)
+        self._max = pd.concat([self._max, chunk_max], axis=1).max(axis=1)
+
+    @property
+    def shape(self):
+        return (self.row_count, len(self.columns or []))
+
+    def describe(self):
+        # Same layout as df.describe() - minus the percentiles. Exact quartiles need every value
+        # at once, which is exactly what we're trying to avoid.
+        if self._count is None:
+            return pd.DataFrame(index=["count", "mean", "std", "min", "max"])
+
+        # Sample standard deviation (ddof=1) to match pandas
+        variance = self._m2 / (self._count - 1).where(self._count > 1)
+        mean = self._mean.where(self._count > 0)
+
+        return pd.DataFrame({
+            "count": self._count.astype("float64"),
+            "mean": mean,
+            "std": np.sqrt(variance),
+            "min": self._min,
+            "max": self._max,
+        }).T
+
+
+def profile_chunks(chunks):
+    # One pass over any iterable of dataframes, one chunk in memory at a time
+    profile = StreamingProfile()
+
+    for chunk in chunks:
+        profile.update(chunk)
+
+    return profile
+
+
+def profile_csv(path=EV_DATA_PATH, dtypes=EV_SCHEMA, chunk_size=DEFAULT_CHUNK_SIZE, usecols=None):
+    return profile_chunks(read_in_chunks(path, dtypes, chunk_size, usecols))
+
+
+def clean_chunks(path=EV_DATA_PATH, dtypes=EV_SCHEMA, chunk_size=DEFAULT_CHUNK_SIZE, fill_value=None):
+    return clean(read_in_chunks(path, dtypes, chunk_size), fill_value)
+
+
+def clean(chunks, fill_value=None):
+    # Streaming version of our data cleaning step. fillna() and dropna() only look at one row
+    # at a time, so applying them chunk by chunk gives the same rows as running them on the full frame.
+    # Pass fill_value to fill nulls, leave it as None to drop rows that have any.
+    for chunk in chunks:
+        if fill_value is None:
+            yield chunk.dropna()
+            continue
+
+        # A category column can only hold values from its list of categories,
+        # so the fill value has to be added as a category before we can fill with it
+        for column in chunk.select_dtypes(include="category").columns:
+            if fill_value not in chunk[column].cat.categories:
+                chunk[column] = chunk[column].cat.add_categories([fill_value])
+
+        yield chunk.fillna(fill_value)
+
+
+if __name__ == "__main__":
+    ev_profile = profile_csv()
+
+    print(ev_profile.describe())
+    print(ev_profile.shape)
+    print(ev_profile.null_counts)
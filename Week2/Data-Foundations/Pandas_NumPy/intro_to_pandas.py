@@ -8,10 +8,25 @@
 # First step to working with data in Pandas: we have to read it in. 
 
 # Imports 
-import pandas as pd # Import-as: lets us alias the module/class with an easier to reference name
+from ev_profiler import EV_DATA_PATH, profile_chunks, clean # Our streaming helpers (see ev_profiler.py)
+from schemas import EV_SCHEMA, memory_report # Declared dtypes for each column (see schemas.py)
+from parquet_cache import iter_cached_chunks # Parquet copy of the CSV, built on first read (see parquet_cache.py)
 
 # Read our csv
-df = pd.read_csv("./data/Electric_Vehicle_Population_Data.csv")
+# Our full copy of the EV data set is several GB - reading it all at once with pd.read_csv() will
+# run us out of memory. For looking around at the data, the first 100,000 rows are plenty.
+# The first time this runs, the CSV gets converted to a Parquet file in data/.cache - after that we
+# skip CSV parsing entirely. next() just takes the first chunk from the iterator.
+df = next(iter_cached_chunks(EV_DATA_PATH, EV_SCHEMA, chunk_size=100_000))
+
+# Columns like Make and City only hold a few hundred distinct values, so our schema stores them as
+# "category" - each distinct value once, plus a small integer code per row. Lets see what that saves us
+# compared to the default object/float64 types.
+memory_report(EV_DATA_PATH, EV_SCHEMA, nrows=100_000)
+
+# For stats over the WHOLE file we stream it in chunks instead - one chunk in memory at a time,
+# keeping running totals as we go.
+ev_profile = profile_chunks(iter_cached_chunks(EV_DATA_PATH, EV_SCHEMA))
 
 # Pandas has built in methods for reading our data in - we don't need to go
 # through the File IO that we saw last week. 
@@ -39,6 +54,11 @@ print(df.describe()) # Gives us some summary info about the data in our data set
 # standard deviation, etc. 
 print(df.shape) # Gives us the total number of rows, as well as the total number of columns. 
 
+# The streamed equivalents over the full file - count, mean, std, min and max per numeric column,
+# plus the full shape. (Quartiles need every value at once, so the streamed version skips them)
+print(ev_profile.describe())
+print(ev_profile.shape)
+
 
 # Beyond inspecting, we can work with our data - we can select individual rows and columns, filter, etc. 
 
@@ -65,10 +85,26 @@ print(df.loc[ 0:5, ['City', "Postal Code"]]) # Example of df.loc - We need how m
 
 print(df.isna().sum()) # We ca use df.isna to select cells that contain null values
 
+print(ev_profile.null_counts) # Null counts per column across the full file, added up chunk by chunk
+
 # Beyond subbing in some default value, we can also just select drop rows that contain nulls. 
 
 # To replace missing values with some specific value use .fillna()
-df.fillna(0)  
+# Our category columns (Make, City, etc) can only hold values from their list of categories, so
+# we have to convert those to plain objects first. (clean(chunks, fill_value=0) handles this by adding 0 as a
+# category - below we call clean() without a fill_value, so it drops those rows instead.)
+df.astype({column: "object" for column in df.select_dtypes(include="category").columns}).fillna(0)
 
 # We can get more granular and go column by column if we need to - just depends on the data set and your use case. 
 df.dropna() # Dropping rows that contain any missing values - can be valid, you will lose data in the data frame. 
+
+# Both of these only look at one row at a time, so we can apply them to the full file chunk by chunk.
+# clean() hands back cleaned chunks one at a time - write them out, load them, etc.
+rows_kept = sum(len(chunk) for chunk in clean(iter_cached_chunks(EV_DATA_PATH, EV_SCHEMA)))
+print(f"{rows_kept} of {ev_profile.row_count} rows have no missing values")
+
+# Counts and averages by Make/Model/City/County over the WHOLE file are a job for every CPU core, not just
+# one - parallel_groupby.py splits the CSV into byte ranges, groups each range in its own process and adds
+# the partial totals together. Run it from this folder (it starts processes, so it has its own script):
+#   python parallel_groupby.py Make Model
+#   python parallel_groupby.py County --scaling    # how the time drops with 1, 2, 4... workers
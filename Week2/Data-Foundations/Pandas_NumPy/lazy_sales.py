@@ -0,0 +1,503 @@
+# A lazy pipeline for the sales analysis
+
+# In sales_data_demo.ipynb every line runs straight away: sales_df is the whole file, electronics_order_df
+# is a copy of a chunk of it, total_sale adds a column to every row... With 100 rows, who cares. With
+# 100 million, every one of those in-between frames is gigabytes of memory we only needed for a moment.
+
+# A LazyFrame doesn't run anything when we call filter/with_column/groupby - it just writes the steps down.
+# When we finally call collect(), it looks at ALL the steps at once and plans how to run them:
+# - Projection pushdown: only the columns the steps actually use are read from disk
+# - Predicate pushdown: filters are handed to the reader - pyarrow for our Parquet cache, a WHERE clause for
+#   a database - so rows we don't want are never turned into a DataFrame at all
+# - Fusion: the data is read in chunks, and each chunk goes through every remaining step (filter, new
+#   columns, partial group totals) before the next one is read. Only the result is ever whole.
+# This is the same idea as Polars' lazy API, or Spark - just small enough to read in one sitting.
+
+#   result = (
+#       scan_sales("data/sales_data.csv")
+#       .with_column("total_sale", col("quantity") * col("unit_price"))
+#       .filter(col("total_sale") > 100)
+#       .groupby("product_category")
+#       .agg(total=("total_sale", "sum"), orders=("total_sale", "count"))
+#       .collect()
+#   )
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import sqlalchemy as sa
+
+from parquet_cache import ensure_cache
+from rollups import merge_m2
+from schemas import SALES_SCHEMA
+
+SALES_DATA_PATH = "./data/sales_data.csv"
+DEFAULT_CHUNK_SIZE = 100_000
+
+AGGREGATIONS = ("size", "sum", "count", "mean", "min", "max", "std")
+
+
+# Expressions
+
+class Expr:
+
+    # A column expression, like col("quantity") * col("unit_price") > 100. It doesn't compute anything
+    # itself - build() turns it into whatever a backend understands: a pandas Series, a pyarrow filter
+    # expression, or a SQLAlchemy clause for a WHERE. Python's operators work the same way on all three,
+    # so one expression tree can be run by any of them.
+    def __init__(self, build, columns, text):
+        self.build = build # function(backend) -> that backend's version of this expression
+        self.columns = frozenset(columns) # Every column name it uses
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+    def _binary(self, other, symbol, function, reverse=False):
+        other = other if isinstance(other, Expr) else lit(other)
+        left, right = (other, self) if reverse else (self, other)
+
+        return Expr(lambda backend: function(left.build(backend), right.build(backend)),
+                    left.columns | right.columns, f"({left} {symbol} {right})")
+
+    def __eq__(self, other): return self._binary(other, "==", lambda a, b: a == b)
+    def __ne__(self, other): return self._binary(other, "!=", lambda a, b: a != b)
+    def __lt__(self, other): return self._binary(other, "<", lambda a, b: a < b)
+    def __le__(self, other): return self._binary(other, "<=", lambda a, b: a <= b)
+    def __gt__(self, other): return self._binary(other, ">", lambda a, b: a > b)
+    def __ge__(self, other): return self._binary(other, ">=", lambda a, b: a >= b)
+    def __add__(self, other): return self._binary(other, "+", lambda a, b: a + b)
+    def __sub__(self, other): return self._binary(other, "-", lambda a, b: a - b)
+    def __mul__(self, other): return self._binary(other, "*", lambda a, b: a * b)
+    def __truediv__(self, other): return self._binary(other, "/", lambda a, b: a / b)
+    def __radd__(self, other): return self._binary(other, "+", lambda a, b: a + b, reverse=True)
+    def __rsub__(self, other): return self._binary(other, "-", lambda a, b: a - b, reverse=True)
+    def __rmul__(self, other): return self._binary(other, "*", lambda a, b: a * b, reverse=True)
+    def __rtruediv__(self, other): return self._binary(other, "/", lambda a, b: a / b, reverse=True)
+    def __and__(self, other): return self._binary(other, "&", lambda a, b: a & b)
+    def __or__(self, other): return self._binary(other, "|", lambda a, b: a | b)
+
+    __hash__ = None # Defining == means Python can't hash these any more - and they shouldn't be dict keys anyway
+
+    def __invert__(self):
+        return Expr(lambda backend: ~self.build(backend), self.columns, f"~{self}")
+
+    def isin(self, values):
+        values = list(values)
+        return Expr(lambda backend: backend.isin(self.build(backend), values), self.columns, f"{self}.isin({values})")
+
+    def isna(self):
+        return Expr(lambda backend: backend.isna(self.build(backend)), self.columns, f"{self}.isna()")
+
+    def notna(self):
+        return ~self.isna()
+
+
+def col(name):
+    return Expr(lambda backend: backend.column(name), {name}, name)
+
+
+def lit(value):
+    return Expr(lambda backend: backend.literal(value), (), repr(value))
+
+
+def all_of(expressions):
+    # Joins filters with & - two filters in a row keep the rows that pass both
+    combined = expressions[0]
+    for expression in expressions[1:]:
+        combined = combined & expression
+    return combined
+
+
+# Backends - how each place we can run an expression spells columns, values and the few
+# operations that aren't Python operators
+
+class PandasBackend:
+
+    def __init__(self, df):
+        self.df = df
+
+    def column(self, name):
+        return self.df[name]
+
+    def literal(self, value):
+        return value
+
+    def isin(self, expression, values):
+        return expression.isin(values)
+
+    def isna(self, expression):
+        return expression.isna()
+
+
+class ArrowBackend:
+
+    # By the time a filter gets here it only uses columns in the file (see ScopedBackend) - a filter on
+    # total_sale has become quantity * unit_price > 100, which pyarrow evaluates while it reads
+    def column(self, name):
+        return pc.field(name)
+
+    def literal(self, value):
+        return pc.scalar(value)
+
+    def isin(self, expression, values):
+        return expression.isin(values)
+
+    def isna(self, expression):
+        return expression.is_null()
+
+
+class SQLBackend:
+
+    # Same idea, but the result is a SQLAlchemy clause - it becomes the query's WHERE
+    def column(self, name):
+        return sa.column(name)
+
+    def literal(self, value):
+        return sa.literal(value)
+
+    def isin(self, expression, values):
+        return expression.in_(values)
+
+    def isna(self, expression):
+        return expression.is_(None)
+
+
+class ScopedBackend:
+
+    # Wraps any of the backends above. Each column name is swapped for what it meant at one point in the
+    # pipeline (scope: name -> Expr over the source's columns), so an expression written against
+    # total_sale builds as quantity * unit_price - whatever total_sale gets redefined as later on.
+    def __init__(self, backend, scope):
+        self.backend = backend
+        self.scope = scope
+
+    def column(self, name):
+        return self.scope[name].build(self.backend)
+
+    def literal(self, value):
+        return self.backend.literal(value)
+
+    def isin(self, expression, values):
+        return self.backend.isin(expression, values)
+
+    def isna(self, expression):
+        return self.backend.isna(expression)
+
+
+def check_columns(names, scope):
+    # A column that doesn't exist at this point - never defined, defined by a later step, or dropped by
+    # an earlier select - is an error
+    missing = set(names) - set(scope)
+    if missing:
+        raise KeyError(f"Unknown columns at this step: {', '.join(sorted(missing))}")
+
+
+def resolve(expression, scope):
+    # expression, rewritten in terms of the source's columns
+    check_columns(expression.columns, scope)
+
+    return Expr(lambda backend: expression.build(ScopedBackend(backend, scope)),
+                {name for column in expression.columns for name in scope[column].columns}, expression.text)
+
+
+# Sources - where the rows come from. read() yields DataFrame chunks with just the requested columns,
+# with the pushed down filter already applied.
+
+class FrameSource:
+
+    # An in-memory frame. Nothing to push down to, but it lets us use the same pipeline on any DataFrame.
+    def __init__(self, df):
+        self.df = df
+        self.columns = list(df.columns)
+
+    def push_filter(self, predicate):
+        return None # Can't push anything - the filters run in pandas
+
+    def read(self, columns, pushed, chunk_size):
+        for start in range(0, len(self.df), chunk_size):
+            yield self.df.iloc[start:start + chunk_size][columns]
+
+    def __repr__(self):
+        return f"DataFrame ({len(self.df)} rows)"
+
+
+class ParquetSource:
+
+    # A CSV, read through its Parquet cache (parquet_cache.py). pyarrow's dataset scanner reads only the
+    # columns we ask for, applies the filter as it reads, and skips whole row groups the filter rules out.
+    def __init__(self, csv_path, schema=None, cache_dir=None):
+        self.csv_path = csv_path
+        self.dataset = ds.dataset(ensure_cache(csv_path, schema, cache_dir), format="parquet")
+        self.columns = self.dataset.schema.names
+
+    def push_filter(self, predicate):
+        return predicate.build(ArrowBackend())
+
+    def read(self, columns, pushed, chunk_size):
+        scanner = self.dataset.scanner(columns=columns, filter=pushed, batch_size=chunk_size)
+
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def __repr__(self):
+        return f"Parquet cache of {self.csv_path}"
+
+
+class SQLSource:
+
+    # A database table. The pushed filter becomes the WHERE clause, and the projection the SELECT list.
+    # The result is streamed in chunks, so it never has to fit in memory all at once.
+    def __init__(self, engine, table_name):
+        self.engine = engine
+        self.table_name = table_name
+        self.columns = [column["name"] for column in sa.inspect(engine).get_columns(table_name)]
+
+    def push_filter(self, predicate):
+        return predicate.build(SQLBackend())
+
+    def query(self, columns, pushed):
+        query = sa.select(*[sa.column(name) for name in columns]).select_from(sa.table(self.table_name))
+        return query.where(pushed) if pushed is not None else query
+
+    def read(self, columns, pushed, chunk_size):
+        with self.engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            yield from pd.read_sql(self.query(columns, pushed), connection, chunksize=chunk_size)
+
+    def __repr__(self):
+        return f"table {self.table_name}"
+
+
+# Partial aggregates - group totals we can work out chunk by chunk and add up at the end
+# (the same trick as rollups.py - including its merge_m2, so std stays accurate however big the values are)
+
+def partial_totals(df, keys, columns):
+    # Like pandas' groupby, rows with a missing key are left out
+    by = [df[key] for key in keys]
+    parts = {("", "rows"): df.groupby(by, observed=True).size()} # Rows per group, missing values and all
+
+    for column in columns:
+        values = df[column].astype("float64")
+        groups = values.groupby(by, observed=True)
+        parts[(column, "sum")] = groups.sum()
+        parts[(column, "count")] = groups.count()
+        # M2, the spread around this chunk's group mean - see rollups.py for why not the sum of squares
+        parts[(column, "m2")] = ((values - groups.transform("mean")) ** 2).groupby(by, observed=True).sum()
+        parts[(column, "min")] = groups.min()
+        parts[(column, "max")] = groups.max()
+
+    return pd.DataFrame(parts)
+
+
+def combine_totals(partials, keys):
+    combined = pd.concat(partials)
+    level = list(range(len(keys)))
+    how = {name: {"min": "min", "max": "max"}.get(name[1], "sum") for name in combined.columns}
+    totals = combined.groupby(level=level).agg(how)
+
+    # M2s don't just add up - they're merged with Chan's formula
+    by = [combined.index.get_level_values(position) for position in level]
+    for column, part in combined.columns:
+        if part == "m2":
+            totals[(column, "m2")] = merge_m2(combined, by, (column, "count"), (column, "sum"), (column, "m2"))
+
+    return totals
+
+
+def finish_aggregates(totals, aggregations):
+    # Turns the added-up totals into the aggregates that were asked for
+    result = {}
+
+    for output, (column, function) in aggregations.items():
+        total, count = totals.get((column, "sum")), totals.get((column, "count"))
+
+        if function == "size":
+            result[output] = totals[("", "rows")]
+        elif function == "sum":
+            result[output] = total
+        elif function == "count":
+            result[output] = count
+        elif function == "mean":
+            result[output] = (total / count).where(count > 0)
+        elif function in ("min", "max"):
+            result[output] = totals[(column, function)]
+        elif function == "std":
+            # Sample standard deviation (ddof=1), like pandas' .std()
+            result[output] = (totals[(column, "m2")] / (count - 1)).pow(0.5).where(count > 1)
+
+    return pd.DataFrame(result, index=totals.index)
+
+
+def keep_rows(df, filters):
+    if not filters:
+        return df
+
+    mask = all_of(filters).build(PandasBackend(df))
+    return df[mask.fillna(False).astype(bool)] # A missing value never passes a filter, same as SQL
+
+
+# The lazy frame itself
+
+class LazyFrame:
+
+    def __init__(self, source, steps=()):
+        self.source = source
+        self.steps = tuple(steps) # Each step is a tuple: ("filter", expr), ("with_column", name, expr), ...
+
+    def _then(self, *step):
+        # Every method returns a NEW LazyFrame with one more step - the original is never changed,
+        # so a half-built pipeline can be reused as the start of several others
+        if any(existing[0] == "groupby" for existing in self.steps):
+            raise ValueError("A grouped aggregation has to be the last step")
+        return LazyFrame(self.source, self.steps + (step,))
+
+    def filter(self, predicate):
+        return self._then("filter", predicate)
+
+    def with_column(self, name, expression):
+        return self._then("with_column", name, expression)
+
+    def select(self, *columns):
+        return self._then("select", list(columns))
+
+    def groupby(self, keys):
+        return GroupedLazyFrame(self, [keys] if isinstance(keys, str) else list(keys))
+
+    def plan(self):
+        # Works out what collect() will actually do, without reading anything. The steps are walked in
+        # order, keeping track of which columns exist at each point and what they mean in terms of the
+        # source's columns - so every step sees the columns as they were when it was added:
+        #   .filter(col("a") > 8).with_column("a", col("a") * 0.1)   the filter is on the original a
+        source_columns = {name: col(name) for name in self.source.columns}
+        scope = dict(source_columns)
+        filters, keys, aggregations = [], None, None
+
+        for step in self.steps:
+            if step[0] == "filter":
+                filters.append(resolve(step[1], scope))
+            elif step[0] == "with_column":
+                scope = {**scope, step[1]: resolve(step[2], scope)} # A redefined column keeps its place
+            elif step[0] == "select":
+                check_columns(step[1], scope)
+                scope = {name: scope[name] for name in step[1]}
+            else: # groupby - always the last step
+                _, keys, aggregations = step
+                check_columns(list(keys) + [column for column, _ in aggregations.values()], scope)
+
+        # What the result needs
+        if aggregations is not None:
+            outputs = list(keys) + list(dict.fromkeys(column for column, _ in aggregations.values()))
+        else:
+            outputs = list(scope)
+        columns = [(name, scope[name]) for name in outputs]
+
+        # Predicate pushdown: try all the filters as one, then one at a time. Anything the source
+        # can't take runs in pandas after reading.
+        pushed, residual = None, []
+        if filters:
+            pushed = self._try_push(all_of(filters))
+            if pushed is None:
+                pushable = [f for f in filters if self._try_push(f) is not None]
+                # "is", not "in" - "in" uses ==, and == on an Expr builds another Expr
+                residual = [f for f in filters if not any(f is p for p in pushable)]
+                pushed = self._try_push(all_of(pushable)) if pushable else None
+
+        # Projection pushdown: the source columns that the outputs and leftover filters are made from
+        used = {name for _, expression in columns for name in expression.columns}
+        used |= {name for f in residual for name in f.columns}
+
+        return {
+            "read_columns": [column for column in self.source.columns if column in used],
+            "pushed": pushed,
+            "pushed_filters": [f for f in filters if not any(f is r for r in residual)],
+            "residual": residual,
+            "columns": columns,
+            # New (or redefined) columns - everything else is passed through as it was read
+            "derived": [(name, expression) for name, expression in columns
+                        if source_columns.get(name) is not expression],
+            "outputs": outputs,
+            "keys": keys,
+            "aggregations": aggregations,
+        }
+
+    def _try_push(self, predicate):
+        try:
+            return self.source.push_filter(predicate)
+        except Exception: # The source can't express this filter - it'll run in pandas instead
+            return None
+
+    def explain(self):
+        plan = self.plan()
+        lines = [f"read {plan['read_columns']} from {self.source}"]
+        lines += [f"  filter while reading: {f}" for f in plan["pushed_filters"]]
+        lines += [f"  filter in pandas: {f}" for f in plan["residual"]]
+        lines += [f"  new column {name} = {expression}" for name, expression in plan["derived"]]
+
+        if plan["aggregations"]:
+            lines.append(f"  group by {plan['keys']}: {plan['aggregations']}")
+        else:
+            lines.append(f"  keep {plan['outputs']}")
+
+        return "\n".join(lines)
+
+    def collect(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        plan = self.plan()
+        results = []
+
+        for chunk in self.source.read(plan["read_columns"], plan["pushed"], chunk_size):
+            # Every step, fused, on one chunk at a time. The leftover filters only use columns we read, so
+            # they all go first - new columns are only worked out for rows that make it through.
+            chunk = keep_rows(chunk, plan["residual"])
+            backend = PandasBackend(chunk)
+            chunk = chunk[[]].assign(**{name: expression.build(backend) for name, expression in plan["columns"]})
+
+            if plan["aggregations"]:
+                columns = list(dict.fromkeys(column for column, _ in plan["aggregations"].values()))
+                results.append(partial_totals(chunk, plan["keys"], columns))
+            else:
+                results.append(chunk[plan["outputs"]])
+
+        if plan["aggregations"]:
+            if not results:
+                return pd.DataFrame(columns=list(plan["aggregations"]))
+            totals = combine_totals(results, plan["keys"])
+            return finish_aggregates(totals, plan["aggregations"]).sort_index()
+
+        if not results:
+            return pd.DataFrame(columns=plan["outputs"])
+        return pd.concat(results, ignore_index=True)
+
+
+class GroupedLazyFrame:
+
+    def __init__(self, frame, keys):
+        self.frame = frame
+        self.keys = keys
+
+    def agg(self, **aggregations):
+        # Named aggregations, like pandas: .agg(total=("total_sale", "sum"), orders=("total_sale", "count"))
+        for output, (column, function) in aggregations.items():
+            if function not in AGGREGATIONS:
+                raise ValueError(f"{output}: unsupported aggregation '{function}' - use one of {AGGREGATIONS}")
+
+        return self.frame._then("groupby", self.keys, aggregations)
+
+
+# Starting points
+
+def scan_frame(df):
+    return LazyFrame(FrameSource(df))
+
+
+def scan_csv(csv_path, schema=None, cache_dir=None):
+    return LazyFrame(ParquetSource(csv_path, schema, cache_dir))
+
+
+def scan_sales(csv_path=SALES_DATA_PATH, cache_dir=None):
+    return scan_csv(csv_path, SALES_SCHEMA, cache_dir)
+
+
+def scan_sql(engine, table_name):
+    return LazyFrame(SQLSource(engine, table_name))
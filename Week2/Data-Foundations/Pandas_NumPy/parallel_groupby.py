@@ -0,0 +1,180 @@
+# Group-bys over the whole EV data set, on every CPU core
+
+# ev_profiler.py streams the file so it fits in memory - but it's still ONE Python process reading
+# the file top to bottom, so it uses one core however many the machine has. Parsing CSV is the slow
+# part, and it's pure CPU work.
+
+# Split-apply-combine, across processes:
+# - Split: cut the file into byte ranges - "bytes 0 to 500MB", "500MB to 1GB"... Each cut is moved
+#   forward to the next newline, so every range holds whole lines and no line is in two ranges.
+#   Finding the cuts only reads a few bytes around each one - nothing is parsed up front.
+# - Apply: each worker process seeks to its range, parses just those lines (in chunks, so its memory
+#   stays flat too) and works out partial totals per group - count, sum, sum of squares, min, max.
+# - Combine: partial totals just add up (min/max take the min/max), so the main process merges what
+#   the workers send back and turns it into counts, means and standard deviations. What comes back
+#   from a worker is one row per group - tiny next to the rows it read.
+# Nothing is shared between workers while they run, so the work scales with the number of cores
+# until the disk can't keep up.
+
+# One assumption: no line breaks inside quoted values. That's true of the EV data set (and most
+# machine-written CSVs), but a CSV with multi-line text fields can't be split on newlines like this.
+
+#   by_make = parallel_groupby(EV_DATA_PATH, "Make", {
+#       "vehicles": ("Make", "size"),
+#       "avg_range": ("Electric Range", "mean"),
+#   })
+
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from ev_profiler import DEFAULT_CHUNK_SIZE, EV_DATA_PATH
+from lazy_sales import AGGREGATIONS, combine_totals, finish_aggregates, partial_totals
+from schemas import EV_SCHEMA
+
+PARTITIONS_PER_WORKER = 4 # More, smaller ranges than workers - a worker that finishes early picks up another
+
+
+def byte_ranges(path, partitions):
+    # Returns (start, end) byte offsets for up to `partitions` ranges of whole lines, after the header
+    size = os.path.getsize(path)
+
+    with open(path, "rb") as csv_file:
+        csv_file.readline() # The header
+        data_start = csv_file.tell()
+
+        cuts = [data_start]
+        for number in range(1, partitions):
+            cut = data_start + (size - data_start) * number // partitions
+
+            # Back up one byte and read to the end of that line - if the cut was already at the start
+            # of a line, we land right back on it
+            csv_file.seek(max(cut - 1, data_start))
+            csv_file.readline()
+            cuts.append(csv_file.tell())
+
+        cuts.append(size)
+
+    # Two cuts can land on the same line in a file with very long lines - drop the empty ranges
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+class ByteRangeFile(io.RawIOBase):
+
+    # A file that reads only bytes [start, end) of another file. read_csv can stream from it like any
+    # other file, so a worker only ever touches its own part of the CSV.
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._left = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._left)
+        if size <= 0:
+            return 0
+
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._left -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def read_range(path, start, end, columns, dtypes, usecols=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Like read_in_chunks in ev_profiler.py, for one byte range. The range has no header line,
+    # so the column names (and types) come from the caller.
+    with io.BufferedReader(ByteRangeFile(path, start, end)) as range_file:
+        yield from pd.read_csv(range_file, header=None, names=columns, dtype=dtypes, usecols=usecols,
+                               chunksize=chunk_size)
+
+
+def aggregate_range(path, start, end, columns, dtypes, keys, value_columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Runs in a worker process. Returns the range's partial totals per group - already combined
+    # across its chunks, so only one small frame goes back to the main process.
+    usecols = list(dict.fromkeys(keys + value_columns))
+    partials = [partial_totals(chunk, keys, value_columns)
+                for chunk in read_range(path, start, end, columns, dtypes, usecols, chunk_size)]
+
+    return combine_totals(partials, keys) if partials else None
+
+
+def parallel_groupby(path, keys, aggregations, workers=None, partitions=None, dtypes=EV_SCHEMA,
+                     chunk_size=DEFAULT_CHUNK_SIZE):
+    # aggregations are pandas-style named aggregations: {"output": (column, function)}, where function
+    # is one of AGGREGATIONS. workers=None means one process per CPU core; workers=1 runs everything in
+    # this process (handy for timing the difference, or debugging).
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    for output, (column, function) in aggregations.items():
+        if function not in AGGREGATIONS:
+            raise ValueError(f"{output}: unsupported aggregation '{function}' - use one of {AGGREGATIONS}")
+
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * PARTITIONS_PER_WORKER
+
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    missing = [column for column in keys + [column for column, _ in aggregations.values()] if column not in columns]
+    if missing:
+        raise KeyError(f"Columns not in {path}: {', '.join(dict.fromkeys(missing))}")
+
+    value_columns = list(dict.fromkeys(column for column, function in aggregations.values() if function != "size"))
+
+    # The totals are added up as float64 anyway, and read_csv parses straight to float64 far faster than
+    # to the nullable Int types in our schema - so value columns are read as float64 (missing values and all)
+    dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+    dtypes.update({column: "float64" for column in value_columns if column not in keys})
+    tasks = [(path, start, end, columns, dtypes, keys, value_columns, chunk_size)
+             for start, end in byte_ranges(path, partitions)]
+
+    if workers == 1:
+        partials = [aggregate_range(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(aggregate_range, *zip(*tasks))) if tasks else []
+
+    partials = [partial for partial in partials if partial is not None]
+    if not partials:
+        return pd.DataFrame(columns=list(aggregations))
+
+    # Each worker built its own categories for Make, City... - concat lines them up as plain values
+    return finish_aggregates(combine_totals(partials, keys), aggregations).sort_index()
+
+
+EV_AGGREGATIONS = {
+    "vehicles": ("DOL Vehicle ID", "size"),
+    "avg_range": ("Electric Range", "mean"),
+    "avg_msrp": ("Base MSRP", "mean"),
+    "newest_model_year": ("Model Year", "max"),
+}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Counts and averages by group over the EV data set")
+    parser.add_argument("keys", nargs="+", help="columns to group by, e.g. Make Model")
+    parser.add_argument("--path", default=EV_DATA_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--scaling", action="store_true", help="time 1, 2, 4... workers up to --workers")
+    args = parser.parse_args()
+
+    if args.scaling:
+        most = args.workers or os.cpu_count() or 1
+        counts = sorted({min(2 ** power, most) for power in range(most.bit_length() + 1)})
+        baseline = None
+
+        for count in counts:
+            started = time.perf_counter()
+            parallel_groupby(args.path, args.keys, EV_AGGREGATIONS, workers=count)
+            seconds = time.perf_counter() - started
+            baseline = baseline or seconds
+            print(f"{count:>3} workers: {seconds:8.2f}s  ({baseline / seconds:.1f}x)")
+    else:
+        result = parallel_groupby(args.path, args.keys, EV_AGGREGATIONS, workers=args.workers)
+        print(result.sort_values("vehicles", ascending=False).head(20).round(1).to_string())
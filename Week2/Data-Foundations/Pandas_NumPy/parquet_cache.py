@@ -0,0 +1,144 @@
+# A Parquet cache in front of our CSV files
+
+# CSV is a text format - every time we call read_csv, pandas has to scan every character of the file,
+# split it on commas and convert each piece of text into a number/date/string. It has to do that for
+# EVERY column, even if the cell we're running only looks at two of them.
+
+# Parquet is a columnar, binary format. The values are already stored as their real types, and each
+# column is stored separately - so we can ask for just the columns we need and skip the rest of the
+# file entirely (this is called column projection).
+
+# The first time we read a CSV through this module we convert it to Parquet and save it in a .cache
+# folder next to the CSV. Every read after that goes straight to the Parquet file. If the CSV changes
+# (its modified time or size is different from when we cached it) the cache is rebuilt. Same goes for
+# reading it with a different schema, since the cached column types come from the schema.
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from schemas import dtypes_for
+
+CACHE_DIR_NAME = ".cache"
+
+DEFAULT_CHUNK_SIZE = 100_000 # Rows converted at a time - large CSVs are cached without loading them whole
+
+
+def cache_paths(csv_path, cache_dir=None):
+    # data/sales_data.csv -> data/.cache/sales_data.parquet (+ a small .json file describing the source)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(csv_path), CACHE_DIR_NAME)
+
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+
+    return os.path.join(cache_dir, f"{name}.parquet"), os.path.join(cache_dir, f"{name}.json")
+
+
+def _source_signature(csv_path, schema):
+    # What we compare to decide if the cache is stale. st_mtime_ns is the modified time in nanoseconds.
+    stats = os.stat(csv_path)
+
+    return {"mtime_ns": stats.st_mtime_ns, "size": stats.st_size, "schema": schema or {}}
+
+
+def is_fresh(csv_path, schema=None, cache_dir=None):
+    parquet_path, meta_path = cache_paths(csv_path, cache_dir)
+
+    if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+        return False
+
+    with open(meta_path) as meta_file:
+        cached_signature = json.load(meta_file)
+
+    return cached_signature == _source_signature(csv_path, schema)
+
+
+def build_cache(csv_path, schema=None, cache_dir=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Converts the CSV chunk by chunk, so this works for files bigger than memory.
+    parquet_path, meta_path = cache_paths(csv_path, cache_dir)
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+
+    signature = _source_signature(csv_path, schema) # Taken BEFORE reading, so a write mid-conversion marks us stale
+    dtypes = dtypes_for(csv_path, schema) if schema else None
+
+    # We write to a temporary file and then rename it into place. If we crash halfway through,
+    # the half-written file never gets mistaken for a finished cache.
+    temp_path = parquet_path + ".tmp"
+    writer = None
+
+    try:
+        for chunk in pd.read_csv(csv_path, dtype=dtypes, chunksize=chunk_size):
+            # Each chunk works out its own list of categories, so the categories don't match between chunks.
+            # Parquet dictionary-encodes strings on its own anyway, so we store them as plain strings
+            # and turn them back into categories when reading (see read_cached).
+            for column in chunk.select_dtypes(include="category").columns:
+                chunk[column] = chunk[column].astype("string")
+
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(temp_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    os.replace(temp_path, parquet_path)
+
+    with open(meta_path, "w") as meta_file:
+        json.dump(signature, meta_file)
+
+    return parquet_path
+
+
+def ensure_cache(csv_path, schema=None, cache_dir=None):
+    # Builds (or rebuilds) the cache if it's missing or stale, and returns the Parquet file's path
+    if not is_fresh(csv_path, schema, cache_dir):
+        build_cache(csv_path, schema, cache_dir)
+
+    return cache_paths(csv_path, cache_dir)[0]
+
+
+def _category_columns(schema, columns):
+    if not schema:
+        return None
+
+    return [
+        column for column, dtype in schema.items()
+        if dtype == "category" and (columns is None or column in columns)
+    ]
+
+
+def read_cached(csv_path, schema=None, columns=None, filters=None, cache_dir=None):
+    # Drop-in replacement for read_csv/read_with_schema. Only the listed columns are read from disk.
+    # filters are passed to pyarrow - e.g. [("region", "==", "East")] - and let it skip whole row groups.
+    parquet_path = ensure_cache(csv_path, schema, cache_dir)
+
+    table = pq.read_table(
+        parquet_path,
+        columns=columns,
+        filters=filters,
+        read_dictionary=_category_columns(schema, columns), # Read these straight back in as categories
+    )
+
+    df = table.to_pandas()
+
+    # Parquet hands categories back in the order it first saw them - sort them so group-by
+    # output comes out in the same order read_csv would give us
+    for column in df.select_dtypes(include="category").columns:
+        df[column] = df[column].cat.reorder_categories(sorted(df[column].cat.categories))
+
+    return df
+
+
+def iter_cached_chunks(csv_path, schema=None, columns=None, chunk_size=DEFAULT_CHUNK_SIZE, cache_dir=None):
+    # The streaming version of read_cached - one chunk in memory at a time, like read_csv(chunksize=...)
+    parquet_path = ensure_cache(csv_path, schema, cache_dir)
+    parquet_file = pq.ParquetFile(parquet_path, read_dictionary=_category_columns(schema, columns))
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
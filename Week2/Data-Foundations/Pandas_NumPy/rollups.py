@@ -0,0 +1,188 @@
+# Precomputed rollups for the sales dashboard
+
+# Every time the dashboard is drawn, the notebook runs its groupbys over every order we've ever had.
+# With 100 orders nobody notices. With 100 million, every refresh is a full scan of the data.
+
+# The trick: sum, count, mean and standard deviation can all be worked out from a few running totals -
+# how many values there were (n), their sum, and M2, the sum of squared distances from their mean:
+#   mean = sum / n
+#   variance = M2 / (n - 1)
+# n and sum just ADD UP - the totals for East + the totals for West are the totals for both regions. M2
+# nearly does: see merge_m2 below for the one extra term it needs.
+
+# (The textbook shortcut - keep the sum of squares and use (sum_sq - sum**2 / n) / (n - 1) - subtracts two
+# huge, nearly equal numbers once the values are large, and the answer is mostly rounding error.)
+
+# So we keep those totals (the "partials") for each (product_category, region, sales_person, day).
+# New orders only need their own partials worked out, which are then added to what we already have.
+# Any question about category, region, sales person or month is answered from the partials - a few
+# thousand rows at most, however many orders are behind them.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_KEYS = ["product_category", "region", "sales_person", "day"]
+DEFAULT_ROLLUP_PATH = "./data/.cache/sales_rollup.parquet"
+
+MISSING_KEY = "Unknown" # Same default the notebook uses for a missing region
+
+# What we add up for each group. quantity_max isn't a sum, but max is just as easy to combine.
+SUM_COLUMNS = ["orders", "sale_count", "sale_sum", "quantity_count", "quantity_sum"]
+MAX_COLUMNS = ["quantity_max"]
+M2_COLUMNS = {"sale_m2": ("sale_count", "sale_sum")} # M2 column -> the count and sum that go with it
+
+
+def merge_m2(parts, keys, count, total, m2):
+    # Combines the M2s of several parts into one M2 per group - Chan et al.'s parallel formula:
+    #   M2 = sum(M2_i) + sum(n_i * (mean_i - mean)**2)
+    # Each part's own spread, plus how far each part's mean sits from the mean of the whole group. Both are
+    # sums of squared differences, so they stay small and accurate however big the values themselves are.
+    # parts has one row per part; keys are what to group those rows by (Series lined up with parts).
+    grouped_count = parts[count].groupby(keys, dropna=False, observed=True)
+    group_mean = parts[total].groupby(keys, dropna=False, observed=True).transform("sum") / grouped_count.transform("sum")
+
+    part_mean = parts[total] / parts[count]
+    spread = (parts[count] * (part_mean - group_mean) ** 2).where(parts[count] > 0, 0.0)
+
+    return (parts[m2] + spread).groupby(keys, dropna=False, observed=True).sum()
+
+
+def combine_partials(parts, by):
+    # Combines rows of partials into one row per group of the `by` columns
+    grouped = parts.groupby(by, dropna=False)
+    result = grouped[SUM_COLUMNS].sum().join(grouped[MAX_COLUMNS].max())
+
+    for m2, (count, total) in M2_COLUMNS.items():
+        result[m2] = merge_m2(parts, [parts[column] for column in by], count, total, m2)
+
+    return result
+
+
+def partials_for(df):
+    # Works out the partials for a frame of orders - this is the only part that looks at raw rows
+    keys = pd.DataFrame({
+        column: df[column].astype("string").fillna(MISSING_KEY)
+        for column in ROLLUP_KEYS[:-1]
+    })
+    # Orders with dates that won't parse still count - they just land on a missing day
+    keys["day"] = pd.to_datetime(df["order_date"], errors="coerce").dt.normalize()
+
+    total_sale = df["total_sale"] if "total_sale" in df.columns else df["quantity"] * df["unit_price"]
+    total_sale = total_sale.astype("float64")
+    quantity = df["quantity"].astype("float64")
+
+    values = pd.DataFrame({
+        "orders": 1,
+        "sale_count": total_sale.notna().astype("int64"),
+        "sale_sum": total_sale.fillna(0),
+        "sale_m2": 0.0, # A single value has no spread - merging the rows works out the groups' M2s
+        "quantity_count": quantity.notna().astype("int64"),
+        "quantity_sum": quantity.fillna(0),
+        "quantity_max": quantity,
+    }, index=df.index)
+
+    return combine_partials(pd.concat([keys, values], axis=1), ROLLUP_KEYS)
+
+
+def combine(left, right):
+    # Adds two sets of partials together - groups only in one side are kept as they are
+    return combine_partials(pd.concat([left, right]).reset_index(), ROLLUP_KEYS)
+
+
+def stats_from_partials(partials, prefix):
+    # sum / mean / count / std for one measured column ("sale" or "quantity")
+    count = partials[f"{prefix}_count"]
+    total = partials[f"{prefix}_sum"]
+
+    result = pd.DataFrame({"sum": total, "count": count})
+    result["mean"] = (total / count).where(count > 0)
+
+    if f"{prefix}_m2" in partials.columns:
+        # ddof=1, the same sample std pandas' .std() gives
+        result["std"] = np.sqrt(partials[f"{prefix}_m2"] / (count - 1)).where(count > 1)
+
+    return result
+
+
+class SalesRollup:
+
+    def __init__(self, partials=None):
+        if partials is None:
+            index = pd.MultiIndex.from_arrays([[], [], [], pd.DatetimeIndex([])], names=ROLLUP_KEYS)
+            partials = pd.DataFrame({column: pd.Series(dtype="float64")
+                                     for column in SUM_COLUMNS + MAX_COLUMNS + list(M2_COLUMNS)},
+                                    index=index)
+        self.partials = partials
+
+    @classmethod
+    def from_frame(cls, df):
+        rollup = cls()
+        rollup.add(df)
+        return rollup
+
+    def add(self, df):
+        # Appends new orders. Only the new rows are grouped - the existing partials are just added to.
+        if len(df) == 0:
+            return self
+
+        new_partials = partials_for(df)
+        self.partials = new_partials if self.partials.empty else combine(self.partials, new_partials)
+
+        return self
+
+    def __len__(self):
+        # How many orders are behind the rollup
+        return int(self.partials["orders"].sum())
+
+    def rollup(self, by):
+        # Combines the partials up to coarser groups, e.g. by="region" or by=["product_category", "month"].
+        # "month" is worked out from the day.
+        by = [by] if isinstance(by, str) else list(by)
+        partials = self.partials.reset_index()
+
+        if "month" in by:
+            partials["month"] = partials["day"].dt.month
+
+        return combine_partials(partials, by)
+
+    def sales_stats(self, by):
+        # sum / mean / count / std of total_sale for each group
+        return stats_from_partials(self.rollup(by), "sale")
+
+    # The dashboard's questions - same answers as the groupbys in sales_data_demo.ipynb
+
+    def category_sales(self):
+        return self.sales_stats("product_category")["sum"].rename("total_sale")
+
+    def region_avg(self):
+        return self.sales_stats("region")["mean"].round(2).rename("total_sale")
+
+    def monthly_sales(self):
+        return self.sales_stats("month")["sum"].rename("total_sale")
+
+    def category_stats(self):
+        # Same shape as .agg({'total_sale': ['sum', 'mean', 'count', 'std'], 'quantity': ['mean', 'max']})
+        partials = self.rollup("product_category")
+        sales = stats_from_partials(partials, "sale")
+        quantity = stats_from_partials(partials, "quantity")
+
+        return pd.concat({
+            "total_sale": sales[["sum", "mean", "count", "std"]],
+            "quantity": pd.DataFrame({"mean": quantity["mean"], "max": partials["quantity_max"]}),
+        }, axis=1)
+
+    def save(self, path=DEFAULT_ROLLUP_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        self.partials.to_parquet(temp_path)
+        os.replace(temp_path, path) # Readers never see a half written file
+
+    @classmethod
+    def load(cls, path=DEFAULT_ROLLUP_PATH):
+        # Picks up a saved rollup, or starts an empty one if there isn't one yet
+        if not os.path.exists(path):
+            return cls()
+
+        return cls(pd.read_parquet(path))
@@ -0,0 +1,100 @@
+# Declared schemas for the data sets we load in this folder
+
+# By default read_csv stores every text column as a Python string object and every number as a
+# 64 bit int/float. That's the safest choice for pandas, but it is also the biggest one.
+
+# Most of our text columns only hold a handful of distinct values - there are maybe a few dozen
+# car makes, four regions, eight sales people. Storing "Electronics" as a full string on every row
+# is a waste. The "category" dtype stores each distinct value once and then just keeps a small
+# integer code per row. Group-bys on a category column work on those integer codes, which is
+# a lot faster than hashing strings over and over.
+
+# Same idea for numbers - quantity is never going to be bigger than a few hundred, so it doesn't
+# need 8 bytes per row. int16 covers it with 2. Capitalized "Int" types are pandas nullable integers,
+# they can hold missing values without being converted to float.
+
+import pandas as pd
+
+# The Electric Vehicle Population data set
+EV_SCHEMA = {
+    "VIN (1-10)": "string",
+    "County": "category",
+    "City": "category",
+    "State": "category",
+    "Postal Code": "Int32",
+    "Model Year": "Int16",
+    "Make": "category",
+    "Model": "category",
+    "Electric Vehicle Type": "category",
+    "Clean Alternative Fuel Vehicle (CAFV) Eligibility": "category",
+    "Electric Range": "Int32",
+    "Base MSRP": "Int32",
+    "Legislative District": "Int16",
+    "DOL Vehicle ID": "Int64",
+    "Vehicle Location": "string",
+    "Electric Utility": "category",
+    "2020 Census Tract": "Int64",
+}
+
+# sales_data.csv and the electronics_sales_data.csv we export from it
+SALES_SCHEMA = {
+    "order_id": "string",
+    "order_date": "string", # Parsed separately - some rows have dates that won't parse
+    "customer_id": "string",
+    "product_category": "category",
+    "product_name": "category",
+    "quantity": "Int16",
+    "unit_price": "float32",
+    "region": "category",
+    "sales_person": "category",
+}
+
+
+def dtypes_for(path, schema):
+    # The part of a schema that applies to one file. Only the header row is read.
+    # Columns that aren't in the file (or extra ones, like the unnamed index column in our
+    # exported CSVs) are left for pandas to handle.
+    header = pd.read_csv(path, nrows=0).columns
+
+    return {column: dtype for column, dtype in schema.items() if column in header}
+
+
+def read_with_schema(path, schema, **read_csv_kwargs):
+    # Reading with a schema means the compact types are created while parsing - we never
+    # hold the big object/float64 version of the frame in memory at all.
+    return pd.read_csv(path, dtype=dtypes_for(path, schema), **read_csv_kwargs)
+
+
+def apply_schema(df, schema):
+    # For frames that have already been loaded (or built in code) - convert them in place
+    # of re-reading the file. Returns a new frame, the original is left alone.
+    converted = df.copy()
+
+    for column, dtype in schema.items():
+        if column in converted.columns:
+            converted[column] = converted[column].astype(dtype)
+
+    return converted
+
+
+def memory_usage_mb(df):
+    # deep=True makes pandas count the actual string contents, not just the 8 byte pointers
+    # to them - without it object columns look much smaller than they really are.
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def memory_report(path, schema, **read_csv_kwargs):
+    # Loads the file both ways and prints how much memory each version takes up.
+    # Handy for checking a schema is actually paying off - pass nrows to check a sample of a large file.
+    default_df = pd.read_csv(path, **read_csv_kwargs)
+    before = memory_usage_mb(default_df)
+    del default_df # Let go of the big version before we load the compact one
+
+    compact_df = read_with_schema(path, schema, **read_csv_kwargs)
+    after = memory_usage_mb(compact_df)
+
+    print(f"Default dtypes: {before:.2f} MB")
+    print(f"Declared schema: {after:.2f} MB")
+    print(f"{before / after:.1f}x smaller")
+
+    return compact_df
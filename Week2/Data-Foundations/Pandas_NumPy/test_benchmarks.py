@@ -0,0 +1,66 @@
+# Tests for the benchmark script - a tiny run to check every step works, and the baseline comparison
+
+import json
+
+import benchmarks
+from benchmarks import compare, make_sales_data, run_size
+
+
+def test_make_sales_data_matches_the_real_file():
+
+    # Act
+    df = make_sales_data(500, seed=1)
+
+    # Assert - same columns as data/sales_data.csv, with some missing values to clean
+    assert list(df.columns) == list(benchmarks.SALES_SCHEMA)
+    assert len(df) == 500
+    assert df["unit_price"].isna().any()
+    assert df["order_id"].is_unique
+
+
+def test_run_size_measures_every_step(tmp_path):
+
+    # Act
+    results = run_size(1_000, repeats=1, work_dir=tmp_path)
+
+    # Assert
+    assert list(results) == ["csv_load", "clean", "total_sale", "groupby", "sqlite_load"]
+    for measured in results.values():
+        assert measured["seconds"] >= 0
+        assert measured["peak_mb"] >= 0
+
+
+def test_compare_flags_slower_and_bigger_steps():
+
+    # Arrange
+    baseline = {"sizes": {"1m": {"clean": {"seconds": 1.0, "peak_mb": 100.0},
+                                 "groupby": {"seconds": 1.0, "peak_mb": 100.0}}}}
+    results = {"sizes": {"1m": {"clean": {"seconds": 1.5, "peak_mb": 100.0},
+                                "groupby": {"seconds": 1.1, "peak_mb": 150.0},
+                                "sqlite_load": {"seconds": 9.0, "peak_mb": 900.0}}}} # Not in the baseline
+
+    # Act
+    regressions = compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.10)
+
+    # Assert
+    assert len(regressions) == 2
+    assert regressions[0].startswith("1m clean")
+    assert "MB peak" in regressions[1]
+
+
+def test_main_fails_on_regression(tmp_path, monkeypatch):
+
+    # Arrange - a baseline that no real run could ever beat
+    monkeypatch.setattr(benchmarks, "SIZES", {"tiny": 200})
+    monkeypatch.setattr(benchmarks, "RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setattr(benchmarks, "MIN_SECONDS", 0)
+    baseline_path = tmp_path / "baseline.json"
+    step = {"seconds": 1e-9, "peak_mb": 1e-9}
+    baseline_path.write_text(json.dumps({"sizes": {"tiny": {"clean": step, "csv_load": step}}}))
+
+    # Act
+    exit_code = benchmarks.main(["--sizes", "tiny", "--repeats", "1", "--baseline", str(baseline_path)])
+
+    # Assert
+    assert exit_code == 1
+    assert len(list((tmp_path / "results").iterdir())) == 1
@@ -0,0 +1,107 @@
+# Tests for the memory-mapped column store - what we read back should be exactly what we appended
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks import make_sales_data
+from column_store import ColumnStore, build_store
+from schemas import SALES_SCHEMA
+
+
+def batch(rows, seed):
+    rng = np.random.default_rng(seed)
+    quantity = pd.array(rng.integers(1, 10, rows), dtype="Int16")
+    quantity[rng.random(rows) < 0.2] = pd.NA
+    unit_price = rng.uniform(1, 500, rows).astype("float32")
+    return pd.DataFrame({"quantity": quantity, "unit_price": unit_price, "in_stock": rng.random(rows) < 0.5})
+
+
+def test_appends_read_back_exactly(tmp_path):
+
+    # Arrange - batch sizes that don't line up with the 8 bits in a byte of the null bitmap
+    batches = [batch(rows, seed) for seed, rows in enumerate([5, 13, 1, 0, 30])]
+    store = ColumnStore(tmp_path / "store")
+
+    # Act
+    for frame in batches:
+        store.append(frame)
+    reopened = ColumnStore(tmp_path / "store")
+
+    # Assert
+    expected = pd.concat(batches, ignore_index=True)
+    assert len(reopened) == len(expected)
+    pd.testing.assert_frame_equal(reopened.read(), expected, check_dtype=False)
+    assert reopened.null_mask("quantity").tolist() == expected["quantity"].isna().tolist()
+    assert reopened.masked("quantity").sum() == expected["quantity"].sum()
+
+
+def test_columns_are_memory_mapped_and_read_only(tmp_path):
+
+    # Arrange
+    store = ColumnStore(tmp_path / "store")
+    store.append(batch(100, seed=1))
+
+    # Act
+    unit_price = store.column("unit_price")
+
+    # Assert
+    assert isinstance(unit_price, np.memmap)
+    assert unit_price.dtype == np.float32
+    with pytest.raises(ValueError):
+        unit_price[0] = 1.0
+
+
+def test_nulls_appear_after_clean_batches(tmp_path):
+
+    # Arrange - the first 11 rows have no missing values, so no bitmap exists until the second batch
+    store = ColumnStore(tmp_path / "store")
+    store.append(pd.DataFrame({"quantity": pd.array(range(11), dtype="Int16")}))
+
+    # Act
+    store.append(pd.DataFrame({"quantity": pd.array([None, 3], dtype="Int16")}))
+
+    # Assert
+    assert store.null_mask("quantity").tolist() == [False] * 11 + [True, False]
+
+
+def test_failed_append_leaves_store_as_it_was(tmp_path):
+
+    # Arrange
+    store = ColumnStore(tmp_path / "store")
+    store.append(batch(10, seed=1))
+    before = store.read()
+
+    # Act - a batch with a column missing is refused, and junk past the end (like a crashed append
+    # would leave) is trimmed by the next append
+    with pytest.raises(ValueError, match="in_stock"):
+        store.append(batch(5, seed=2).drop(columns=["in_stock"]))
+    with open(tmp_path / "store" / store.manifest["columns"]["unit_price"]["values"], "ab") as values_file:
+        values_file.write(b"junk")
+    store.append(batch(3, seed=3))
+
+    # Assert
+    pd.testing.assert_frame_equal(store.read().iloc[:10], before)
+    assert len(ColumnStore(tmp_path / "store").read()) == 13
+
+
+def test_build_store_from_csv(tmp_path):
+
+    # Arrange
+    path = tmp_path / "sales.csv"
+    make_sales_data(1_000, seed=4).to_csv(path, index=False)
+
+    # Act
+    store = build_store(path, tmp_path / "sales_store", SALES_SCHEMA, ["quantity", "unit_price"], chunk_size=128)
+
+    # Assert
+    expected = pd.read_csv(path, dtype=SALES_SCHEMA)[["quantity", "unit_price"]]
+    assert store.column("quantity").dtype == np.int16
+    # read() hands back nullable types - a missing unit_price is <NA>, not NaN
+    pd.testing.assert_frame_equal(store.read(), expected.astype({"unit_price": "Float32"}))
+
+
+def test_text_columns_are_refused(tmp_path):
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="only holds numbers"):
+        ColumnStore(tmp_path / "store").append(pd.DataFrame({"region": ["East", "West"]}))
@@ -0,0 +1,53 @@
+# Tests for the streaming profiler - the streamed stats should match what pandas
+# gives us when it loads the whole file at once.
+
+import numpy as np
+import pandas as pd
+import pytest
+from ev_profiler import profile_csv, clean_chunks
+
+DTYPES = {"Make": "string", "Electric Range": "Int32", "Base MSRP": "Int32"}
+
+
+@pytest.fixture
+def ev_csv(tmp_path):
+    rng = np.random.default_rng(7)
+    rows = 1_000
+    df = pd.DataFrame({
+        "Make": rng.choice(["TESLA", "NISSAN", "KIA"], rows),
+        "Electric Range": rng.integers(0, 350, rows).astype("float64"),
+        "Base MSRP": rng.integers(0, 90_000, rows).astype("float64"),
+    })
+    df.loc[rng.choice(rows, 50, replace=False), "Electric Range"] = np.nan
+    df.loc[rng.choice(rows, 20, replace=False), "Make"] = None
+
+    path = tmp_path / "ev.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_profile_csv_matches_full_load(ev_csv):
+
+    # Arrange
+    full_df = pd.read_csv(ev_csv, dtype=DTYPES)
+    expected = full_df.describe().loc[["count", "mean", "std", "min", "max"]]
+
+    # Act - a chunk size that doesn't divide the row count evenly
+    profile = profile_csv(ev_csv, dtypes=DTYPES, chunk_size=97)
+
+    # Assert
+    pd.testing.assert_frame_equal(profile.describe(), expected.astype("float64"), check_dtype=False)
+    assert profile.shape == full_df.shape
+    pd.testing.assert_series_equal(profile.null_counts, full_df.isna().sum(), check_names=False)
+
+
+def test_clean_chunks_drops_same_rows_as_dropna(ev_csv):
+
+    # Arrange
+    expected_rows = len(pd.read_csv(ev_csv, dtype=DTYPES).dropna())
+
+    # Act
+    rows_kept = sum(len(chunk) for chunk in clean_chunks(ev_csv, dtypes=DTYPES, chunk_size=97))
+
+    # Assert
+    assert rows_kept == expected_rows
@@ -0,0 +1,197 @@
+# Tests for the lazy sales pipeline - every result should match doing the same steps eagerly in pandas
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks import make_sales_data
+from lazy_sales import col, scan_csv, scan_frame, scan_sql
+from schemas import SALES_SCHEMA
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def orders():
+    return make_sales_data(2_000, seed=11)
+
+
+@pytest.fixture
+def sales_csv(tmp_path, orders):
+    path = tmp_path / "sales.csv"
+    orders.to_csv(path, index=False)
+    return str(path)
+
+
+def electronics_by_region(frame):
+    return (
+        frame
+        .with_column("total_sale", col("quantity") * col("unit_price"))
+        .filter(col("product_category") == "Electronics")
+        .filter(col("total_sale") > 100)
+        .groupby("region")
+        .agg(total=("total_sale", "sum"), orders=("total_sale", "count"), average=("total_sale", "mean"),
+             spread=("total_sale", "std"), most=("quantity", "max"))
+    )
+
+
+def eager_electronics_by_region(df):
+    df = df.assign(total_sale=df["quantity"] * df["unit_price"])
+    df = df[(df["product_category"] == "Electronics") & (df["total_sale"] > 100)]
+    return df.groupby("region").agg(total=("total_sale", "sum"), orders=("total_sale", "count"),
+                                    average=("total_sale", "mean"), spread=("total_sale", "std"),
+                                    most=("quantity", "max"))
+
+
+def assert_same_groups(result, expected):
+    result = result.rename(index=str).sort_index()
+    expected = expected.rename(index=str).sort_index()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_names=False, check_index_type=False,
+                                  rtol=1e-5)
+
+
+def test_parquet_groupby_matches_pandas(sales_csv, tmp_path):
+
+    # Act
+    result = electronics_by_region(scan_csv(sales_csv, SALES_SCHEMA, cache_dir=tmp_path / "cache")).collect()
+    expected = eager_electronics_by_region(pd.read_csv(sales_csv))
+
+    # Assert
+    assert_same_groups(result, expected)
+
+
+def test_chunked_groupby_matches_one_chunk(orders):
+
+    # Arrange
+    query = electronics_by_region(scan_frame(orders))
+
+    # Act
+    in_one_go = query.collect(chunk_size=len(orders))
+    in_small_chunks = query.collect(chunk_size=37)
+
+    # Assert
+    assert_same_groups(in_small_chunks, in_one_go)
+    assert_same_groups(in_small_chunks, eager_electronics_by_region(orders))
+
+
+def test_chunked_std_stays_accurate_for_large_values(orders):
+
+    # Arrange - prices around a billion that only differ by a few cents
+    rng = np.random.default_rng(5)
+    orders["unit_price"] = 1e9 + rng.normal(0, 0.05, len(orders))
+    expected = orders.groupby("region")["unit_price"].std()
+
+    # Act
+    result = scan_frame(orders).groupby("region").agg(spread=("unit_price", "std")).collect(chunk_size=37)
+
+    # Assert
+    pd.testing.assert_series_equal(result["spread"].rename(index=str).sort_index(),
+                                   expected.rename(index=str).sort_index(), check_names=False,
+                                   check_index_type=False, rtol=1e-6)
+
+
+def test_explain_shows_pushdown(sales_csv, tmp_path):
+
+    # Act
+    plan = electronics_by_region(scan_csv(sales_csv, SALES_SCHEMA, cache_dir=tmp_path / "cache")).explain()
+
+    # Assert - product_category is only used by a filter that runs inside the reader, so it's never read at all
+    assert "read ['quantity', 'unit_price', 'region']" in plan
+    assert "filter while reading: (product_category == 'Electronics')" in plan
+    assert "filter while reading: (total_sale > 100)" in plan
+    assert "filter in pandas" not in plan
+
+
+def test_sql_filters_go_into_where(orders):
+
+    # Arrange
+    engine = create_engine("sqlite://")
+    orders.to_sql("sales", engine, index=False)
+    query = (
+        scan_sql(engine, "sales")
+        .with_column("total_sale", col("quantity") * col("unit_price"))
+        .filter(col("region").isin(["East", "West"]) & (col("total_sale") > 100))
+        .select("order_id", "total_sale")
+    )
+
+    # Act
+    plan = query.plan()
+    sql = str(query.source.query(plan["read_columns"], plan["pushed"]))
+    result = query.collect(chunk_size=100)
+
+    # Assert
+    assert plan["read_columns"] == ["order_id", "quantity", "unit_price"]
+    assert "WHERE region IN" in sql and "quantity * unit_price >" in sql
+    expected = orders.assign(total_sale=orders["quantity"] * orders["unit_price"])
+    expected = expected[expected["region"].isin(["East", "West"]) & (expected["total_sale"] > 100)]
+    assert sorted(result["order_id"]) == sorted(expected["order_id"])
+
+
+def test_filters_and_new_columns_without_groupby(orders):
+
+    # Act
+    result = (
+        scan_frame(orders)
+        .filter(col("region").isna())
+        .with_column("double_quantity", col("quantity") * 2)
+        .select("order_id", "double_quantity")
+        .collect(chunk_size=50)
+    )
+
+    # Assert
+    expected = orders[orders["region"].isna()]
+    assert list(result.columns) == ["order_id", "double_quantity"]
+    assert result["order_id"].tolist() == expected["order_id"].tolist()
+    assert result["double_quantity"].tolist() == (expected["quantity"] * 2).tolist()
+
+
+def test_nothing_runs_until_collect(orders):
+
+    # Arrange
+    base = scan_frame(orders)
+
+    # Act
+    filtered = base.filter(col("quantity") > 5)
+
+    # Assert - each step is a new frame, and the original is unchanged
+    assert base.steps == ()
+    assert len(filtered.steps) == 1
+    with pytest.raises(KeyError):
+        scan_frame(orders).filter(col("not_a_column") > 1).collect()
+    with pytest.raises(ValueError):
+        scan_frame(orders).groupby("region").agg(total=("quantity", "median"))
+
+
+def test_steps_see_columns_as_they_were_when_added(tmp_path):
+
+    # Arrange
+    df = pd.DataFrame({"a": [5.0, 9.0, 12.0], "b": [1, 2, 3]})
+    df.to_csv(tmp_path / "ab.csv", index=False)
+
+    def steps(frame):
+        return (
+            frame
+            .filter(col("a") > 8) # The original a
+            .with_column("a", col("a") * 0.1)
+            .with_column("a", col("a") + 1) # Built on the a from the line above
+            .filter(col("a") < 2.1) # a is now original * 0.1 + 1
+        )
+
+    # Act
+    in_pandas = steps(scan_frame(df)).collect()
+    in_pyarrow = steps(scan_csv(str(tmp_path / "ab.csv"), cache_dir=tmp_path / "cache")).collect()
+
+    # Assert - 9 passes both filters (9 > 8, 1.9 < 2.1); 12 passes the first but not the second (2.2)
+    for result in (in_pandas, in_pyarrow):
+        assert list(result.columns) == ["a", "b"]
+        assert result["a"].tolist() == pytest.approx([1.9])
+        assert result["b"].tolist() == [2]
+
+
+def test_columns_only_exist_between_where_they_are_made_and_dropped(orders):
+
+    # Act / Assert - used before it's defined, and used after a select dropped it
+    with pytest.raises(KeyError, match="total_sale"):
+        scan_frame(orders).filter(col("total_sale") > 1).with_column("total_sale", col("quantity") * 2).plan()
+    with pytest.raises(KeyError, match="region"):
+        scan_frame(orders).select("order_id", "quantity").filter(col("region") == "East").plan()
+    with pytest.raises(KeyError, match="region"):
+        scan_frame(orders).select("quantity").groupby("region").agg(total=("quantity", "sum")).plan()
@@ -0,0 +1,105 @@
+# Tests for the parallel group-by - splitting the file across workers should give exactly the
+# same answer as pandas reading the whole file and grouping it in one go.
+
+import numpy as np
+import pandas as pd
+import pytest
+from parallel_groupby import byte_ranges, parallel_groupby, read_range
+
+DTYPES = {"Make": "category", "Model": "category", "City": "category", "Electric Range": "Int32",
+          "Base MSRP": "Int32"}
+
+AGGREGATIONS = {
+    "vehicles": ("Make", "size"),
+    "with_range": ("Electric Range", "count"),
+    "avg_range": ("Electric Range", "mean"),
+    "range_std": ("Electric Range", "std"),
+    "max_msrp": ("Base MSRP", "max"),
+}
+
+
+@pytest.fixture
+def ev_csv(tmp_path):
+    rng = np.random.default_rng(3)
+    rows = 3_000
+    df = pd.DataFrame({
+        "Make": rng.choice(["TESLA", "NISSAN", "KIA", "FORD"], rows),
+        "Model": rng.choice(["MODEL 3", "LEAF", "NIRO"], rows),
+        "City": rng.choice(["Seattle", "Bothell, North", "Yakima"], rows), # A comma inside a quoted value
+        "Electric Range": rng.integers(0, 350, rows).astype("float64"),
+        "Base MSRP": rng.integers(0, 90_000, rows).astype("float64"),
+        "Vehicle Location": [f"POINT (-122.{n} 47.{n})" for n in range(rows)],
+    })
+    df.loc[rng.choice(rows, 200, replace=False), "Electric Range"] = np.nan
+
+    path = tmp_path / "ev.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def expected_groupby(path, keys):
+    df = pd.read_csv(path, dtype=DTYPES)
+    return df.groupby(keys, observed=True).agg(**AGGREGATIONS)
+
+
+def test_byte_ranges_cover_every_line_once(ev_csv):
+
+    # Arrange
+    columns = list(pd.read_csv(ev_csv, nrows=0).columns)
+
+    # Act
+    ranges = byte_ranges(ev_csv, partitions=7)
+    parts = [pd.concat(read_range(ev_csv, start, end, columns, DTYPES, chunk_size=100)) for start, end in ranges]
+
+    # Assert
+    assert len(ranges) == 7
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    combined = pd.concat(parts, ignore_index=True)
+    pd.testing.assert_frame_equal(combined, pd.read_csv(ev_csv, dtype=DTYPES), check_categorical=False)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_groupby_matches_pandas(ev_csv, workers):
+
+    # Act
+    result = parallel_groupby(ev_csv, "Make", AGGREGATIONS, workers=workers, partitions=5, dtypes=DTYPES,
+                              chunk_size=250)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, expected_groupby(ev_csv, "Make"), check_dtype=False,
+                                  check_index_type=False, check_names=False)
+
+
+def test_parallel_groupby_by_several_keys(ev_csv):
+
+    # Act
+    result = parallel_groupby(ev_csv, ["City", "Model"], AGGREGATIONS, workers=2, dtypes=DTYPES, chunk_size=333)
+
+    # Assert
+    expected = expected_groupby(ev_csv, ["City", "Model"])
+    assert result.index.names == ["City", "Model"]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_index_type=False,
+                                  check_names=False)
+
+
+def test_more_partitions_than_lines(tmp_path):
+
+    # Arrange
+    path = tmp_path / "tiny.csv"
+    path.write_text("Make,Electric Range\nKIA,100\nKIA,200\n")
+
+    # Act
+    result = parallel_groupby(str(path), "Make", {"avg_range": ("Electric Range", "mean")}, workers=1,
+                              partitions=50, dtypes=DTYPES)
+
+    # Assert
+    assert result.loc["KIA", "avg_range"] == 150
+
+
+def test_unknown_columns_and_aggregations_fail_fast(ev_csv):
+
+    # Act / Assert
+    with pytest.raises(KeyError, match="County"):
+        parallel_groupby(ev_csv, "County", AGGREGATIONS, workers=1, dtypes=DTYPES)
+    with pytest.raises(ValueError, match="median"):
+        parallel_groupby(ev_csv, "Make", {"mid": ("Electric Range", "median")}, workers=1, dtypes=DTYPES)
@@ -0,0 +1,67 @@
+# Tests for the Parquet cache - reads should come from the cache until the CSV changes
+
+import os
+
+import pandas as pd
+import pytest
+import parquet_cache
+from parquet_cache import read_cached, is_fresh, cache_paths
+from schemas import SALES_SCHEMA
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({
+        "order_id": ["ORD0001", "ORD0002", "ORD0003"],
+        "product_category": ["Home", "Books", "Home"],
+        "quantity": [1, 2, 3],
+        "unit_price": [9.99, None, 4.5],
+        "region": ["East", "West", None],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_read_cached_matches_csv(sales_csv):
+
+    # Act
+    result = read_cached(sales_csv, SALES_SCHEMA)
+
+    # Assert
+    assert is_fresh(sales_csv, SALES_SCHEMA)
+    assert result["order_id"].tolist() == ["ORD0001", "ORD0002", "ORD0003"]
+    assert result["quantity"].tolist() == [1, 2, 3]
+    assert result["unit_price"].isna().tolist() == [False, True, False]
+    assert result["product_category"].dtype == "category"
+    assert list(result["product_category"].cat.categories) == ["Books", "Home"]
+
+
+def test_read_cached_only_reads_requested_columns(sales_csv):
+
+    # Act
+    result = read_cached(sales_csv, SALES_SCHEMA, columns=["order_id", "quantity"])
+
+    # Assert
+    assert list(result.columns) == ["order_id", "quantity"]
+
+
+def test_read_cached_rebuilds_when_source_changes(sales_csv, monkeypatch):
+
+    # Arrange - first read builds the cache, second should not touch it
+    builds = []
+    original_build = parquet_cache.build_cache
+    monkeypatch.setattr(parquet_cache, "build_cache", lambda *args: builds.append(args) or original_build(*args))
+
+    read_cached(sales_csv, SALES_SCHEMA)
+    read_cached(sales_csv, SALES_SCHEMA)
+    assert len(builds) == 1
+
+    # Act - append a row, which changes both size and mtime
+    with open(sales_csv, "a") as csv_file:
+        csv_file.write("ORD0004,Books,4,1.0,North\n")
+    result = read_cached(sales_csv, SALES_SCHEMA)
+
+    # Assert
+    assert len(builds) == 2
+    assert len(result) == 4
+    assert os.path.exists(cache_paths(sales_csv)[0])
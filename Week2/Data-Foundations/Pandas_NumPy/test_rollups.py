@@ -0,0 +1,109 @@
+# Tests for the sales rollups - every answer should match running the groupby on the raw orders
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks import make_sales_data
+from rollups import SalesRollup
+
+
+@pytest.fixture
+def orders():
+    df = make_sales_data(2_000, seed=7)
+    df["total_sale"] = df["quantity"] * df["unit_price"]
+    return df
+
+
+def with_unknown_region(df):
+    # The rollup files orders with no region under "Unknown", like the notebook's cleaning step
+    df = df.copy()
+    df["region"] = df["region"].fillna("Unknown")
+    return df
+
+
+def test_stats_match_groupby(orders):
+
+    # Act
+    rollup = SalesRollup.from_frame(orders)
+    expected = orders.groupby("product_category").agg({
+        "total_sale": ["sum", "mean", "count", "std"],
+        "quantity": ["mean", "max"],
+    })
+
+    # Assert
+    pd.testing.assert_frame_equal(rollup.category_stats(), expected, check_dtype=False, check_names=False,
+                                  check_index_type=False)
+
+
+def test_incremental_adds_match_one_big_add(orders):
+
+    # Arrange
+    all_at_once = SalesRollup.from_frame(orders)
+
+    # Act - the same orders, arriving in three batches
+    incremental = SalesRollup()
+    for batch in np.array_split(orders.index, 3):
+        incremental.add(orders.loc[batch])
+
+    # Assert
+    assert len(incremental) == len(orders)
+    pd.testing.assert_frame_equal(incremental.partials, all_at_once.partials, check_like=True)
+    pd.testing.assert_series_equal(incremental.region_avg(), all_at_once.region_avg())
+
+
+def test_region_and_month(orders):
+
+    # Arrange
+    cleaned = with_unknown_region(orders)
+    months = pd.to_datetime(cleaned["order_date"]).dt.month
+
+    # Act
+    rollup = SalesRollup.from_frame(orders)
+
+    # Assert
+    expected_region = cleaned.groupby("region")["total_sale"].mean().round(2)
+    pd.testing.assert_series_equal(rollup.region_avg(), expected_region, check_index_type=False)
+    expected_month = cleaned.groupby(months.rename("month"))["total_sale"].sum()
+    assert np.allclose(rollup.monthly_sales().to_numpy(), expected_month.to_numpy())
+
+
+def test_total_sale_is_computed_when_missing(orders):
+
+    # Act
+    rollup = SalesRollup.from_frame(orders.drop(columns=["total_sale"]))
+
+    # Assert
+    assert rollup.category_sales().sum() == pytest.approx(orders["total_sale"].sum())
+
+
+def test_save_and_load(orders, tmp_path):
+
+    # Arrange
+    path = str(tmp_path / "rollup.parquet")
+    rollup = SalesRollup.from_frame(orders.iloc[:1_000])
+    rollup.save(path)
+
+    # Act - pick it back up and add the rest
+    loaded = SalesRollup.load(path).add(orders.iloc[1_000:])
+
+    # Assert
+    assert len(loaded) == len(orders)
+    assert len(SalesRollup.load(str(tmp_path / "missing.parquet"))) == 0
+
+
+def test_std_stays_accurate_for_large_values(orders):
+
+    # Arrange - sales around a billion, varying by a few cents. Sum-of-squares variance loses every
+    # digit of that variation to rounding.
+    rng = np.random.default_rng(3)
+    orders["total_sale"] = 1e9 + rng.normal(0, 0.05, len(orders))
+    expected = orders.groupby("product_category")["total_sale"].std()
+
+    # Act - in batches, so the per-batch M2s have to be merged too
+    rollup = SalesRollup()
+    for batch in np.array_split(orders.index, 4):
+        rollup.add(orders.loc[batch])
+
+    # Assert
+    actual = rollup.sales_stats("product_category")["std"]
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-6)
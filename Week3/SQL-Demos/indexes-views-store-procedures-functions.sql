@@ -141,6 +141,10 @@ SELECT track_name, unit_price FROM rock_tracks_view; -- Lets see the prices of r
 
 CALL update_track_prices('Rock', 10.0);
 
+-- One UPDATE in one transaction means every track in the genre stays locked until it's done.
+-- Fine for our demo database - on a big live catalog, see Week4/Sqlalchemy/batch_reprice.py, which does
+-- the same update in small, resumable batches (one short transaction + SAVEPOINT per batch).
+
 
 /* 
 
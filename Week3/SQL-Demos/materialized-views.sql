@@ -0,0 +1,123 @@
+/*
+    Materialized Views
+
+    rock_tracks_view (in indexes-views-store-procedures-functions.sql) is a regular view - a saved query.
+    Every time we SELECT from it, Postgres runs the whole four table join again.
+
+    A MATERIALIZED view runs the query once and stores the result like a table. Reading it is as fast
+    as reading a table, and we can put indexes on it. The catch: it's a snapshot. When track or genre
+    changes, the materialized view doesn't know until we REFRESH it.
+
+    This file sets up:
+    1. rock_tracks_mv - the materialized version of rock_tracks_view, with indexes
+    2. mv_source - which tables each materialized view reads from
+    3. mv_pending_change - a log of changes to those tables that a view hasn't been refreshed for yet,
+       written by triggers
+    4. mv_refresh_state - when each view was last refreshed
+
+    Week4/Sqlalchemy/view_refresher.py uses these to only refresh when something actually changed.
+*/
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS rock_tracks_mv AS
+SELECT
+    t.track_id,
+    t.name as track_name,
+    a.title as album_title,
+    ar.name as artist_name,
+    t.milliseconds,
+    t.unit_price
+FROM track t
+JOIN album a ON t.album_id = a.album_id
+JOIN artist ar ON a.artist_id = ar.artist_id
+JOIN genre g ON t.genre_id = g.genre_id
+WHERE g.name = 'Rock';
+
+-- REFRESH ... CONCURRENTLY needs a UNIQUE index. It builds the new result off to the side and swaps in
+-- only the rows that changed, matching old and new rows up by this index - so reads aren't blocked
+-- while the refresh runs.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rock_tracks_mv_track_id ON rock_tracks_mv(track_id);
+
+-- Our dashboards look tracks up by album and artist - with these indexes that's an index lookup
+CREATE INDEX IF NOT EXISTS idx_rock_tracks_mv_album_title ON rock_tracks_mv(album_title);
+CREATE INDEX IF NOT EXISTS idx_rock_tracks_mv_artist_name ON rock_tracks_mv(artist_name);
+
+
+-- Change tracking
+
+-- Each materialized view and the tables it reads from. album and artist are in the view too
+-- (album_title, artist_name), so they're watched as well.
+CREATE TABLE IF NOT EXISTS mv_source (
+    view_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    PRIMARY KEY (view_name, table_name)
+);
+
+INSERT INTO mv_source (view_name, table_name)
+VALUES ('rock_tracks_mv', 'track'), ('rock_tracks_mv', 'genre'),
+       ('rock_tracks_mv', 'album'), ('rock_tracks_mv', 'artist')
+ON CONFLICT (view_name, table_name) DO NOTHING;
+
+-- One row per change a view hasn't caught up with yet. Writers only ever INSERT here - each one adds
+-- its own new row, so two transactions changing track at the same time never wait on each other (a
+-- shared counter row that every write UPDATEs would make them queue up, one at a time).
+-- The refresher DELETEs a view's rows in the same transaction as its REFRESH, so the table stays small.
+CREATE TABLE IF NOT EXISTS mv_pending_change (
+    change_id BIGSERIAL PRIMARY KEY,
+    view_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_mv_pending_change_view_name ON mv_pending_change(view_name);
+
+CREATE TABLE IF NOT EXISTS mv_refresh_state (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
+
+-- The trigger function. TG_TABLE_NAME is filled in by Postgres with the table that fired the trigger,
+-- so one function works for every table - it logs a change for each view that reads from it.
+CREATE OR REPLACE FUNCTION log_source_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO mv_pending_change (view_name, table_name)
+    SELECT view_name, TG_TABLE_NAME
+    FROM mv_source
+    WHERE table_name = TG_TABLE_NAME;
+
+    RETURN NULL; -- The return value of an AFTER ... FOR EACH STATEMENT trigger is ignored
+END;
+$$;
+
+-- FOR EACH STATEMENT fires once per INSERT/UPDATE/DELETE, not once per row. An UPDATE that touches
+-- 1000 tracks logs one change - we only need to know THAT something changed, not how much.
+-- (CREATE OR REPLACE TRIGGER needs Postgres 14, so we drop and re-create them to keep this re-runnable.)
+DROP TRIGGER IF EXISTS track_changed ON track;
+CREATE TRIGGER track_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON track
+FOR EACH STATEMENT EXECUTE FUNCTION log_source_change();
+
+DROP TRIGGER IF EXISTS genre_changed ON genre;
+CREATE TRIGGER genre_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON genre
+FOR EACH STATEMENT EXECUTE FUNCTION log_source_change();
+
+DROP TRIGGER IF EXISTS album_changed ON album;
+CREATE TRIGGER album_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON album
+FOR EACH STATEMENT EXECUTE FUNCTION log_source_change();
+
+DROP TRIGGER IF EXISTS artist_changed ON artist;
+CREATE TRIGGER artist_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON artist
+FOR EACH STATEMENT EXECUTE FUNCTION log_source_change();
+
+
+-- Refreshing by hand. Without CONCURRENTLY, the refresh locks the view and every read waits for it.
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY rock_tracks_mv;
+
+-- Reading it is the same as reading the view - but now it's an index lookup on stored rows
+-- SELECT * FROM rock_tracks_mv
+-- WHERE album_title = 'Restless and Wild';
@@ -0,0 +1,195 @@
+# Repricing a whole genre without locking the whole genre
+
+# update_track_prices (Week3/SQL-Demos/indexes-views-store-procedures-functions.sql) is one UPDATE in one
+# transaction. Every row it touches stays locked until it commits - on a big live catalog that's every
+# track in the genre, locked for the whole run, and anyone trying to buy or edit one of them waits.
+
+# This does the same update in small batches, each in its own short transaction:
+# - Keyset pagination: each batch is "the next N tracks with a track_id after the last one we did".
+#   Unlike OFFSET, that's an index range scan on the primary key however far through the table we are.
+# - The batch's UPDATE runs inside a SAVEPOINT (like the transactions demo). If it fails, we roll back
+#   to the savepoint and still record the failure in the same transaction.
+# - Progress (the last track_id done) is saved in reprice_jobs in the SAME transaction as the batch.
+#   Either both commit or neither does, so after a crash, running the same job again picks up exactly
+#   where it stopped - no track is repriced twice, none is skipped.
+# - Each batch starts by re-reading the job row with SELECT ... FOR UPDATE, and takes last_track_id from
+#   there rather than from memory. If a scheduler retry starts while the original run is still going, the
+#   two take turns on the row lock, and each batch carries on from wherever the other one got to.
+
+# Usage, from this folder (DATABASE_URL in .env):
+#   python batch_reprice.py Rock 10 --job rock-autumn-sale --batch-size 500
+
+import argparse
+import time
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, Numeric, String, Table, Text, func, insert, select, text,
+                        update)
+
+from chinook_db import create_pooled_engine
+
+DEFAULT_BATCH_SIZE = 1_000
+
+metadata = MetaData()
+
+# One row per repricing job - what it's doing, and how far it has got
+reprice_jobs = Table(
+    "reprice_jobs",
+    metadata,
+    Column("job_id", String(100), primary_key=True),
+    Column("genre_name", String(120), nullable=False),
+    Column("percent", Numeric(6, 2, asdecimal=False), nullable=False),
+    Column("last_track_id", Integer, nullable=False, default=0),
+    Column("rows_updated", Integer, nullable=False, default=0),
+    Column("status", String(20), nullable=False), # running / failed / done
+    Column("error", Text),
+    Column("started_at", DateTime, server_default=func.now()),
+    Column("updated_at", DateTime, server_default=func.now()),
+)
+
+GENRE_TRACKS = "genre_id IN (SELECT genre_id FROM genre WHERE name = :genre_name)"
+
+# The next batch's upper bound: the batch_size-th track_id after the last one we did
+NEXT_BATCH_END = text(f"""
+    SELECT MAX(track_id) FROM (
+        SELECT track_id FROM track
+        WHERE track_id > :last_track_id AND {GENRE_TRACKS}
+        ORDER BY track_id
+        LIMIT :batch_size
+    ) AS batch
+""")
+
+# Same price change as update_track_prices. 100.0 so the division is never integer division.
+UPDATE_BATCH = text(f"""
+    UPDATE track
+    SET unit_price = unit_price * (1 + (CAST(:percent AS NUMERIC) / 100.0))
+    WHERE track_id > :last_track_id AND track_id <= :batch_end AND {GENRE_TRACKS}
+""")
+
+REMAINING_TRACKS = text(f"SELECT COUNT(*) FROM track WHERE track_id > :last_track_id AND {GENRE_TRACKS}")
+
+
+def create_job_table(engine):
+    metadata.create_all(engine, tables=[reprice_jobs])
+
+
+def start_or_resume(connection, job_id, genre_name, percent):
+    # Returns the job's row, creating it if this is a new job. A job id always means the same
+    # repricing - reusing one with a different genre or percent is a mistake, not a new job.
+    job = connection.execute(select(reprice_jobs).where(reprice_jobs.c.job_id == job_id)).mappings().first()
+
+    if job is None:
+        connection.execute(insert(reprice_jobs).values(
+            job_id=job_id, genre_name=genre_name, percent=percent, last_track_id=0, rows_updated=0, status="running",
+        ))
+        return {"job_id": job_id, "last_track_id": 0, "rows_updated": 0, "status": "running"}
+
+    if job["genre_name"] != genre_name or float(job["percent"]) != float(percent):
+        raise ValueError(f"Job {job_id} already exists for {job['genre_name']} at {job['percent']}%")
+
+    return dict(job)
+
+
+def print_progress(progress):
+    print(f"{progress['job_id']}: {progress['rows_updated']}/{progress['total_rows']} tracks "
+          f"({progress['percent_done']:.1f}%), {progress['rows_per_second']:.0f} rows/s")
+
+
+def reprice_genre(engine, genre_name, percent, job_id, batch_size=DEFAULT_BATCH_SIZE, pause=0,
+                  on_progress=print_progress):
+    # Raises every price in a genre by percent, batch_size tracks per transaction. pause is a sleep (in
+    # seconds) between batches, to leave the database some room for everyone else.
+    # Returns the job's final progress.
+    params = {"genre_name": genre_name, "percent": percent, "batch_size": batch_size}
+
+    with engine.begin() as connection:
+        job = start_or_resume(connection, job_id, genre_name, percent)
+        if job["status"] == "done":
+            return job
+
+        last_track_id = job["last_track_id"]
+        already_done = job["rows_updated"]
+        remaining = connection.execute(REMAINING_TRACKS, {**params, "last_track_id": last_track_id}).scalar()
+        total_rows = already_done + remaining
+
+        connection.execute(update(reprice_jobs).where(reprice_jobs.c.job_id == job_id)
+                           .values(status="running", error=None, updated_at=func.now()))
+
+    started = time.perf_counter()
+
+    while True:
+        with engine.begin() as connection: # One short transaction per batch
+            # Lock the job row until this batch commits, and start from the progress saved there - another
+            # runner of the same job may have done some batches since we last looked
+            job = connection.execute(
+                select(reprice_jobs.c.last_track_id, reprice_jobs.c.rows_updated, reprice_jobs.c.status)
+                .where(reprice_jobs.c.job_id == job_id)
+                .with_for_update()
+            ).mappings().one()
+            last_track_id, rows_updated = job["last_track_id"], job["rows_updated"]
+            if job["status"] == "done": # Another runner finished it
+                break
+
+            batch_end = connection.execute(NEXT_BATCH_END, {**params, "last_track_id": last_track_id}).scalar()
+            job_row = update(reprice_jobs).where(reprice_jobs.c.job_id == job_id)
+
+            if batch_end is None: # Nothing left
+                connection.execute(job_row.values(status="done", updated_at=func.now()))
+                break
+
+            savepoint = connection.begin_nested()
+            try:
+                result = connection.execute(UPDATE_BATCH, {**params, "last_track_id": last_track_id,
+                                                           "batch_end": batch_end})
+                savepoint.commit()
+            except Exception as error:
+                # Undo the half-done batch, but keep the transaction going so the failure gets saved.
+                # We raise once the with block has committed it.
+                savepoint.rollback()
+                connection.execute(job_row.values(status="failed", error=str(error), updated_at=func.now()))
+                failure = error
+            else:
+                failure = None
+                rows_updated += result.rowcount
+                last_track_id = batch_end
+                connection.execute(job_row.values(last_track_id=last_track_id, rows_updated=rows_updated,
+                                                  updated_at=func.now()))
+
+        if failure is not None:
+            raise failure
+
+        # Throughput only counts this run - rows from before a resume didn't take any of our time
+        elapsed = time.perf_counter() - started
+        progress = {
+            "job_id": job_id,
+            "last_track_id": last_track_id,
+            "rows_updated": rows_updated,
+            "total_rows": total_rows,
+            "percent_done": 100 * rows_updated / total_rows if total_rows else 100.0,
+            "rows_per_second": (rows_updated - already_done) / elapsed if elapsed else 0.0,
+        }
+        if on_progress:
+            on_progress(progress)
+
+        if pause:
+            time.sleep(pause)
+
+    return {"job_id": job_id, "last_track_id": last_track_id, "rows_updated": rows_updated, "status": "done",
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raise prices for a genre in small, resumable batches")
+    parser.add_argument("genre")
+    parser.add_argument("percent", type=float)
+    parser.add_argument("--job", required=True, help="job id - run again with the same id to resume")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0, help="seconds to wait between batches")
+    args = parser.parse_args()
+
+    engine = create_pooled_engine(pool_size=1, max_overflow=0)
+
+    try:
+        create_job_table(engine)
+        print(reprice_genre(engine, args.genre, args.percent, args.job, args.batch_size, args.pause))
+    finally:
+        engine.dispose()
@@ -0,0 +1,197 @@
+# A small data-access module for the Chinook database
+
+# sql-pandas.py shows the basics: create an engine, hand it to pd.read_sql. This module wraps that up
+# so every script/dashboard shares the same setup, with two additions:
+
+# 1. Connection pooling. Opening a database connection is slow (network round trips, authentication).
+#    A pool keeps a few connections open and lends them out, so a query borrows an open connection
+#    instead of opening a new one. SQLAlchemy engines already pool - here we make the settings explicit.
+
+# 2. An optional query result cache. Lookup tables like genre and album almost never change, but our
+#    dashboards ask for them hundreds of times a minute. With cache=True, the result of a query is kept
+#    in memory for a while (the TTL, time-to-live) and repeated calls skip the database entirely.
+#    The cache holds a limited number of results and throws out the least recently used one when full (LRU).
+
+# It also has a streaming read (stream_sql) for big tables like invoice_line or track. A plain
+# pd.read_sql pulls the ENTIRE result over to our side before building the frame. Streaming asks the
+# database for a server-side cursor - the result stays on the server and we fetch it a chunk at a time.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, make_url, text
+
+# Pool settings:
+# pool_size - connections kept open and ready
+# max_overflow - extra connections allowed during busy spikes (closed again once returned)
+# pool_pre_ping - test a connection with a cheap "SELECT 1" before lending it out, so we never get handed
+#                 one the server already dropped
+# pool_recycle - replace connections older than this many seconds, before the server/firewall times them out
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_RECYCLE = 1800
+
+DEFAULT_CACHE_SIZE = 128 # Results kept
+DEFAULT_CACHE_TTL = 300 # Seconds before a cached result counts as stale
+
+DEFAULT_CHUNK_SIZE = 10_000 # Rows per chunk when streaming
+
+
+def create_pooled_engine(database_url=None, pool_size=DEFAULT_POOL_SIZE, max_overflow=DEFAULT_MAX_OVERFLOW,
+                         pool_pre_ping=True, pool_recycle=DEFAULT_POOL_RECYCLE, **engine_kwargs):
+    if database_url is None:
+        load_dotenv()
+        database_url = os.getenv("DATABASE_URL")
+
+    url = make_url(database_url)
+
+    # An in-memory SQLite database lives inside a single connection, so SQLAlchemy uses a special
+    # one-connection pool for it that doesn't take size settings
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return create_engine(url, **engine_kwargs)
+
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        **engine_kwargs,
+    )
+
+
+class QueryCache:
+
+    # An OrderedDict remembers insertion order, and move_to_end() lets us bump an entry to the back
+    # whenever it's used - so the front of the dict is always the least recently used entry.
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock() # Dashboards query from several threads at once
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False) # Drop the least recently used
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cache_key(sql, params):
+    # Same SQL + same parameters = same result. Parameters are sorted so {"a": 1, "b": 2} and
+    # {"b": 2, "a": 1} share an entry, and lists become tuples so the key can be hashed.
+    frozen = tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in (params or {}).items()
+    ))
+
+    return (sql, frozen)
+
+
+class ChinookDB:
+
+    def __init__(self, engine=None, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL):
+        self.engine = engine if engine is not None else create_pooled_engine()
+        self.cache = QueryCache(cache_size, cache_ttl)
+
+    def read_sql(self, sql, params=None, cache=False):
+        # Always use :named parameters for values - never build SQL with f-strings (SQL injection!)
+        #   db.read_sql("SELECT * FROM album WHERE artist_id = :artist_id", {"artist_id": 1})
+        key = _cache_key(sql, params)
+
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.copy() # A copy, so callers can't change what's in the cache
+
+        # The with block hands the connection back to the pool when we're done
+        with self.engine.connect() as connection:
+            df = pd.read_sql(text(sql), connection, params=params)
+
+        if cache:
+            self.cache.put(key, df.copy())
+
+        return df
+
+    def read_table(self, table_name, cache=False):
+        # Table names can't be bound parameters, so quote it as an identifier instead
+        quoted = self.engine.dialect.identifier_preparer.quote(table_name)
+
+        return self.read_sql(f"SELECT * FROM {quoted}", cache=cache)
+
+    def stream_sql(self, sql, params=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        # Yields DataFrames of up to chunk_size rows. Only one chunk is ever held on our side.
+        # stream_results=True asks for a server-side cursor (PostgreSQL), and yield_per tells SQLAlchemy
+        # how many rows to fetch from it per round trip. Databases without server-side cursors (SQLite)
+        # just ignore it and still hand us the result in chunks.
+        # The connection stays checked out of the pool until the loop over the chunks finishes.
+        with self.engine.connect() as connection:
+            streaming = connection.execution_options(stream_results=True, yield_per=chunk_size)
+
+            for chunk in pd.read_sql(text(sql), streaming, params=params, chunksize=chunk_size):
+                yield chunk
+
+    def clear_cache(self):
+        self.cache.clear()
+
+    def dispose(self):
+        # Closes every pooled connection - call this when the app shuts down
+        self.engine.dispose()
+
+
+def fold_chunks(chunks, function, initial):
+    # The streaming version of "load everything, then compute": carry a running result through the
+    # chunks, one at a time. function(result_so_far, chunk) returns the new result.
+    #   row_count = fold_chunks(db.stream_sql("SELECT * FROM track"), lambda total, chunk: total + len(chunk), 0)
+    result = initial
+
+    for chunk in chunks:
+        result = function(result, chunk)
+
+    return result
+
+
+def grouped_totals(chunks, by, columns):
+    # groupby(by)[columns] sum/count/mean over a stream of chunks. Each chunk is grouped on its own,
+    # and the small per-group results are added together - sums and counts add up across chunks,
+    # and the mean is just sum / count at the end.
+    def add_chunk(totals, chunk):
+        grouped = chunk.groupby(by)[columns]
+        partial = pd.concat({"sum": grouped.sum(), "count": grouped.count()}, axis=1)
+
+        return partial if totals is None else totals.add(partial, fill_value=0)
+
+    totals = fold_chunks(chunks, add_chunk, None)
+    if totals is None:
+        return None
+
+    means = totals["sum"] / totals["count"]
+
+    return pd.concat({"sum": totals["sum"], "count": totals["count"].astype("int64"), "mean": means}, axis=1)
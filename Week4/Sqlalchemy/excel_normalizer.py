@@ -0,0 +1,363 @@
+# Turning the normalization demo's raw spreadsheet into 3NF tables - by streaming it
+
+# Week3/SQL-Demos/Data Normalization/raw_data.xlsx is the "before" picture: one row per order, with the
+# customer's details repeated on every order and a list of books crammed into single cells:
+#   1003 | Alice Green | 555-1234 | "Learning SQL; Advanced Databases; Python for All" | "J. Smith; R. Davis; ..."
+# NormalizationDemo.xlsx walks through fixing that by hand. This does it in code:
+#   customers, salespeople, payment_methods, authors    one row per distinct value, with a surrogate key
+#   books                                               title + author_id
+#   orders                                              one row per order - foreign keys instead of repeated details
+#   order_items                                         one row per book per order (1NF: the repeating group
+#                                                       becomes rows) with the quantity and price paid
+
+# pd.read_excel loads the whole workbook into a DataFrame first - at a million rows that's gigabytes.
+# Here openpyxl's read-only mode hands us one row at a time, and we never keep the rows:
+# - Surrogate keys come from dictionaries (KeyEncoder) filled in a single pass - the first time we see
+#   "Alice Green" she gets customer_id 1, and every later order just looks that up. The dictionaries grow
+#   with the number of DISTINCT customers/books, not with the number of rows.
+# - New rows for every table are buffered and bulk inserted every batch_size orders (executemany, one
+#   transaction per batch), so memory stays flat however long the sheet is.
+# - The dictionaries start out with what's already in the database, so a second workbook (or the same one
+#   again) reuses the existing customers, books... and their keys. Orders that are already there are skipped.
+
+# Usage, from this folder (DATABASE_URL in .env, or pass --database-url):
+#   python excel_normalizer.py "../../Week3/SQL-Demos/Data Normalization/raw_data.xlsx"
+
+import argparse
+import datetime
+
+from openpyxl import load_workbook
+from sqlalchemy import Column, Date, ForeignKey, Integer, MetaData, Numeric, String, Table, insert, select
+
+from chinook_db import create_pooled_engine
+
+WORKBOOK_PATH = "../../Week3/SQL-Demos/Data Normalization/raw_data.xlsx"
+DEFAULT_BATCH_SIZE = 5_000 # Orders per transaction
+LOOKUP_BATCH_SIZE = 900 # Order ids per "WHERE order_id IN (...)" - older SQLite allows 999 parameters
+
+# Spreadsheet header -> what we call it. The multi-valued columns have "(multiple per order)" in the header,
+# so they're matched on how the header starts.
+COLUMNS = {
+    "OrderID": "order_id",
+    "OrderDate": "order_date",
+    "CustomerName": "customer_name",
+    "CustomerPhone": "customer_phone",
+    "CustomerAddress": "customer_address",
+    "BookTitles": "titles",
+    "BookAuthors": "authors",
+    "BookQty": "quantities",
+    "BookPriceEach": "prices",
+    "PaymentMethod": "payment_method",
+    "Salesperson": "salesperson",
+}
+
+LIST_SEPARATOR = ";"
+QUOTES = "\"“”"
+
+metadata = MetaData()
+
+customers = Table(
+    "customers", metadata,
+    Column("customer_id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("phone", String(30)),
+    Column("address", String(200)),
+)
+
+salespeople = Table(
+    "salespeople", metadata,
+    Column("salesperson_id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False, unique=True),
+)
+
+payment_methods = Table(
+    "payment_methods", metadata,
+    Column("payment_method_id", Integer, primary_key=True),
+    Column("name", String(50), nullable=False, unique=True),
+)
+
+authors = Table(
+    "authors", metadata,
+    Column("author_id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False, unique=True),
+)
+
+books = Table(
+    "books", metadata,
+    Column("book_id", Integer, primary_key=True),
+    Column("title", String(200), nullable=False),
+    Column("author_id", Integer, ForeignKey("authors.author_id"), nullable=False),
+)
+
+orders = Table(
+    "orders", metadata,
+    Column("order_id", Integer, primary_key=True), # The spreadsheet's own OrderID - it's already a key
+    Column("order_date", Date),
+    Column("customer_id", Integer, ForeignKey("customers.customer_id"), nullable=False),
+    Column("payment_method_id", Integer, ForeignKey("payment_methods.payment_method_id")),
+    Column("salesperson_id", Integer, ForeignKey("salespeople.salesperson_id")),
+)
+
+order_items = Table(
+    "order_items", metadata,
+    Column("order_id", Integer, ForeignKey("orders.order_id"), primary_key=True),
+    Column("book_id", Integer, ForeignKey("books.book_id"), primary_key=True),
+    Column("quantity", Integer, nullable=False),
+    Column("unit_price", Numeric(10, 2, asdecimal=False), nullable=False), # What was paid - prices change
+)
+
+# Parents before children, so foreign keys always point at rows that are already there
+LOAD_ORDER = [customers, salespeople, payment_methods, authors, books, orders, order_items]
+
+
+class KeyEncoder:
+
+    # Dictionary encoding: value -> surrogate key, handed out in the order values are first seen.
+    # pending holds the rows for values we haven't inserted yet.
+    def __init__(self, key_column, value_columns):
+        self.key_column = key_column
+        self.value_columns = value_columns
+        self.keys = {}
+        self.next_key = 1
+        self.pending = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def seed(self, rows):
+        # rows are (key, *values) for values that are already in the database - they keep their keys,
+        # and new values carry on from the highest key
+        for key, *values in rows:
+            self.keys[tuple(values)] = key
+            self.next_key = max(self.next_key, key + 1)
+
+    def key_for(self, *values):
+        key = self.keys.get(values)
+
+        if key is None:
+            key = self.keys[values] = self.next_key
+            self.next_key += 1
+            self.pending.append({self.key_column: key, **dict(zip(self.value_columns, values))})
+
+        return key
+
+    def take_pending(self):
+        rows, self.pending = self.pending, []
+        return rows
+
+
+def clean_text(value):
+    if value is None:
+        return None
+
+    value = str(value).strip().strip(QUOTES).strip()
+    return value or None
+
+
+def split_list(value):
+    # '“Learning SQL; Data Modeling Basics”' -> ["Learning SQL", "Data Modeling Basics"]
+    value = clean_text(value)
+    return [] if value is None else [part.strip() for part in value.split(LIST_SEPARATOR)]
+
+
+def as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime): # Check this first - a datetime is also a date
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value.strip())
+    raise ValueError(f"not a date: {value!r}")
+
+
+def iter_records(path, sheet=None):
+    # One dict per spreadsheet row, read in openpyxl's streaming mode. The header can be anywhere - the
+    # demo sheets start a few rows and columns in - so we skip ahead to the first row with an OrderID cell.
+    workbook = load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        positions = None
+
+        for row in worksheet.iter_rows(values_only=True):
+            if positions is None:
+                headers = [clean_text(cell) for cell in row]
+                if "OrderID" in headers:
+                    positions = {name: index for index, header in enumerate(headers) if header
+                                 for prefix, name in COLUMNS.items() if header.split(" (")[0] == prefix}
+                    missing = set(COLUMNS.values()) - set(positions)
+                    if missing:
+                        raise ValueError(f"{path}: missing columns {', '.join(sorted(missing))}")
+                continue
+
+            record = {name: row[index] if index < len(row) else None for name, index in positions.items()}
+            if record["order_id"] is not None:
+                yield record
+    finally:
+        workbook.close() # Read-only workbooks keep the file open until closed
+
+
+class Normalizer:
+
+    def __init__(self):
+        self.customers = KeyEncoder("customer_id", ["name", "phone", "address"])
+        self.salespeople = KeyEncoder("salesperson_id", ["name"])
+        self.payment_methods = KeyEncoder("payment_method_id", ["name"])
+        self.authors = KeyEncoder("author_id", ["name"])
+        self.books = KeyEncoder("book_id", ["title", "author_id"])
+        self.orders = []
+        self.order_items = []
+        self.batch_order_ids = set() # Orders in the current batch - a repeated OrderID is skipped
+        self.rejects = [] # (order_id, reason)
+        self.skipped = [] # order_ids that were already loaded
+
+    def load_existing(self, connection):
+        # Seeds every encoder with the rows already in the database, so their keys are reused
+        for encoder, table in [(self.customers, customers), (self.salespeople, salespeople),
+                               (self.payment_methods, payment_methods), (self.authors, authors),
+                               (self.books, books)]:
+            columns = [table.c[encoder.key_column]] + [table.c[name] for name in encoder.value_columns]
+            encoder.seed(connection.execute(select(*columns)))
+
+    def add(self, record):
+        # Splits one spreadsheet row into rows for each table. A row with anything wrong with it is
+        # rejected whole - e.g. 3 titles but 2 prices, where we can't tell which book goes with which price.
+        # Everything is checked BEFORE any keys are handed out, so a rejected order leaves no new
+        # customers, authors or books behind.
+        try:
+            order_id = int(record["order_id"])
+        except (TypeError, ValueError):
+            self.rejects.append((record["order_id"], "bad OrderID"))
+            return
+
+        if order_id in self.batch_order_ids:
+            self.skipped.append(order_id)
+            return
+
+        lists = [split_list(record[name]) for name in ("titles", "authors", "quantities", "prices")]
+
+        if len({len(values) for values in lists}) != 1:
+            self.rejects.append((order_id, "titles/authors/quantities/prices have different lengths"))
+            return
+
+        try:
+            lines = [(title, author, int(quantity), float(price)) for title, author, quantity, price in zip(*lists)]
+        except ValueError as error:
+            self.rejects.append((order_id, f"bad quantity or price: {error}"))
+            return
+
+        try:
+            order_date = as_date(record["order_date"])
+        except ValueError as error:
+            self.rejects.append((order_id, f"bad order date: {error}"))
+            return
+
+        items = {}
+        for title, author, quantity, price in lines:
+            book_id = self.books.key_for(title, self.authors.key_for(author))
+            if book_id in items: # The same book twice on one order - add the quantities up
+                items[book_id]["quantity"] += quantity
+            else:
+                items[book_id] = {"order_id": order_id, "book_id": book_id, "quantity": quantity, "unit_price": price}
+
+        salesperson, payment_method = clean_text(record["salesperson"]), clean_text(record["payment_method"])
+        self.batch_order_ids.add(order_id)
+        self.orders.append({
+            "order_id": order_id,
+            "order_date": order_date,
+            "customer_id": self.customers.key_for(clean_text(record["customer_name"]),
+                                                  clean_text(record["customer_phone"]),
+                                                  clean_text(record["customer_address"])),
+            "salesperson_id": self.salespeople.key_for(salesperson) if salesperson else None,
+            "payment_method_id": self.payment_methods.key_for(payment_method) if payment_method else None,
+        })
+        self.order_items.extend(items.values())
+
+    def take_batch(self):
+        # Everything new since the last batch, table by table, parents first
+        batch = {
+            customers: self.customers.take_pending(),
+            salespeople: self.salespeople.take_pending(),
+            payment_methods: self.payment_methods.take_pending(),
+            authors: self.authors.take_pending(),
+            books: self.books.take_pending(),
+            orders: self.orders,
+            order_items: self.order_items,
+        }
+        self.orders, self.order_items, self.batch_order_ids = [], [], set()
+        return batch
+
+
+def loaded_order_ids(connection, order_ids):
+    found = set()
+    for start in range(0, len(order_ids), LOOKUP_BATCH_SIZE):
+        batch = order_ids[start:start + LOOKUP_BATCH_SIZE]
+        found.update(connection.execute(select(orders.c.order_id).where(orders.c.order_id.in_(batch))).scalars())
+    return found
+
+
+def load_batch(connection, batch):
+    # One executemany per table - a single INSERT sent with every row's parameters. Orders that are already
+    # in the database (from an earlier run) are left out, and their order_ids returned as skipped.
+    skipped = loaded_order_ids(connection, [order["order_id"] for order in batch[orders]])
+    if skipped:
+        batch = {**batch, orders: [order for order in batch[orders] if order["order_id"] not in skipped],
+                 order_items: [item for item in batch[order_items] if item["order_id"] not in skipped]}
+
+    loaded = {}
+    for table in LOAD_ORDER:
+        if batch[table]:
+            connection.execute(insert(table), batch[table])
+        loaded[table.name] = len(batch[table])
+    return loaded, sorted(skipped)
+
+
+def normalize_workbook(path, engine, sheet=None, batch_size=DEFAULT_BATCH_SIZE):
+    # Returns how many rows went into each table, any rejected orders, and the order_ids skipped
+    # because they were already loaded
+    metadata.create_all(engine)
+    normalizer = Normalizer()
+    totals = {table.name: 0 for table in LOAD_ORDER}
+
+    with engine.connect() as connection:
+        normalizer.load_existing(connection)
+
+    def flush():
+        with engine.begin() as connection: # One transaction per batch
+            loaded, skipped = load_batch(connection, normalizer.take_batch())
+            normalizer.skipped.extend(skipped)
+            for name, count in loaded.items():
+                totals[name] += count
+
+    for record in iter_records(path, sheet):
+        normalizer.add(record)
+        if len(normalizer.orders) >= batch_size:
+            flush()
+
+    flush()
+    return {"rows": totals, "rejects": normalizer.rejects, "skipped": normalizer.skipped}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a denormalized orders workbook into 3NF tables")
+    parser.add_argument("workbook", nargs="?", default=WORKBOOK_PATH)
+    parser.add_argument("--sheet", default=None, help="sheet name (default: the first sheet)")
+    parser.add_argument("--database-url", default=None, help="default: DATABASE_URL from .env")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    engine = create_pooled_engine(args.database_url, pool_size=1, max_overflow=0)
+
+    try:
+        result = normalize_workbook(args.workbook, engine, args.sheet, args.batch_size)
+    finally:
+        engine.dispose()
+
+    for name, count in result["rows"].items():
+        print(f"{name}: {count}")
+    for order_id, reason in result["rejects"]:
+        print(f"rejected order {order_id}: {reason}")
+    if result["skipped"]:
+        print(f"skipped {len(result['skipped'])} orders that were already loaded")
@@ -0,0 +1,419 @@
+# Index advisor for the Chinook workload
+
+# In indexes-views-store-procedures-functions.sql we ran EXPLAIN ANALYZE, saw a "Seq Scan" (Postgres reading
+# the whole table, row by row) and added an index by hand. This script does the same thing for every
+# query in our SQL files, and measures whether each index actually helps instead of guessing:
+
+# 1. Pull the SELECT queries out of the .sql files and run each one with EXPLAIN (ANALYZE, FORMAT JSON).
+#    That runs the query for real and hands back the plan as JSON, with actual timings.
+# 2. Walk each plan looking for Seq Scans, and note which columns that table was filtered or joined on.
+# 3. Each of those columns (and each group of columns filtered together) is a candidate index.
+# 4. For every candidate: create the index, re-run the queries that scanned that table, then throw the
+#    index away again. In Postgres even CREATE INDEX can be rolled back, so we do all of this in a
+#    transaction and roll it back - nothing we try is ever left behind in the database.
+# 5. Rank the candidates by how much time they actually saved.
+
+# Usage, from this folder (DATABASE_URL in .env pointing at the Chinook database from chinook_pg.sql):
+#   python index_advisor.py
+#   python index_advisor.py ../../Week3/Chinook-Psql/SQLChallenges.sql --repeats 5 --output report.json
+
+import argparse
+import json
+import os
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from chinook_db import create_pooled_engine
+
+WORKLOAD_FILES = [
+    "../../Week3/SQL-Demos/intro-to-DQL.sql",
+    "../../Week3/SQL-Demos/joins-and-subqueries.sql",
+    "../../Week3/Chinook-Psql/SQLChallenges.sql",
+]
+
+DEFAULT_REPEATS = 3 # Each query is timed this many times, and we keep the fastest
+DEFAULT_MIN_SPEEDUP = 1.1 # Candidates have to make their queries at least 10% faster to be recommended
+MAX_INDEX_COLUMNS = 3
+MAX_NAME_LENGTH = 63 # Postgres' limit on identifier length
+
+JOIN_CONDITIONS = ("Hash Cond", "Merge Cond", "Join Filter", "Index Cond")
+
+_DOLLAR_QUOTE = re.compile(r"\$(?:[A-Za-z_]\w*)?\$")
+_EXPLAIN_PREFIX = re.compile(r"^EXPLAIN\s+(?:\([^)]*\)\s*|ANALY[SZ]E\s+|VERBOSE\s+)*", re.IGNORECASE)
+_QUERY_START = re.compile(r"^(?:SELECT|WITH)\b", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_COLUMN_REFERENCE = re.compile(r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\b")
+
+
+# Reading the workload
+
+def split_statements(sql):
+    # Splits a .sql file on semicolons, returning (line number, statement) pairs. Comments are dropped,
+    # and semicolons inside 'strings' or $$ function bodies $$ don't count.
+    statements = []
+    current = []
+    start_line = None
+    i = 0
+
+    def finish():
+        statement = "".join(current).strip()
+        if statement:
+            statements.append((start_line, statement))
+        current.clear()
+
+    while i < len(sql):
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end == -1 else end + 2
+            current.append(" ")
+            continue
+
+        character = sql[i]
+
+        if not "".join(current).strip() and not character.isspace() and character != ";":
+            start_line = sql.count("\n", 0, i) + 1
+
+        if character in "'\"":
+            # Find the closing quote - a doubled quote ('') is an escaped quote inside the string
+            end = i + 1
+            while True:
+                end = sql.find(character, end)
+                if end == -1:
+                    end = len(sql)
+                    break
+                if sql[end + 1:end + 2] == character:
+                    end += 2
+                    continue
+                break
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+
+        dollar = _DOLLAR_QUOTE.match(sql, i) if character == "$" else None
+        if dollar:
+            end = sql.find(dollar.group(), dollar.end())
+            end = len(sql) if end == -1 else end + len(dollar.group())
+            current.append(sql[i:end])
+            i = end
+            continue
+
+        if character == ";":
+            finish()
+        else:
+            current.append(character)
+        i += 1
+
+    finish()
+
+    return statements
+
+
+def workload_queries(paths):
+    # The queries we can safely replay - SELECT and WITH only. Any EXPLAIN already in front of a query
+    # is dropped (we add our own). Returns a list of (label, sql), where label is file:line.
+    queries = []
+    seen = set()
+
+    for path in paths:
+        with open(path) as sql_file:
+            statements = split_statements(sql_file.read())
+
+        for line, statement in statements:
+            statement = _EXPLAIN_PREFIX.sub("", statement).strip()
+            normalized = " ".join(statement.lower().split())
+
+            if not _QUERY_START.match(statement) or normalized in seen:
+                continue
+
+            seen.add(normalized)
+            queries.append((f"{os.path.basename(path)}:{line}", statement))
+
+    return queries
+
+
+# Reading plans
+
+def walk(node):
+    # Every node in a plan tree, parents before children
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def uses_index(plan, index_name):
+    return any(node.get("Index Name") == index_name for node in walk(plan))
+
+
+def referenced_columns(condition, relation, alias, columns, qualified_only=False):
+    # The columns of one table that show up in a plan condition like
+    #   ((composer)::text ~~ '%John%'::text)   or   (a.artist_id = ar.artist_id)
+    # Returns (column, used_with_like) pairs, in the order they appear.
+    condition = _STRING_LITERAL.sub("''", condition) # Words inside string literals aren't columns
+    found = {}
+
+    for match in _COLUMN_REFERENCE.finditer(condition):
+        qualifier, name = match.groups()
+
+        if name not in columns or name in found:
+            continue
+        if qualifier is None and qualified_only:
+            continue
+        if qualifier is not None and qualifier not in (alias, relation):
+            continue
+
+        # "~~" is how Postgres writes LIKE (and "~~*" is ILIKE, which a plain index can't help with)
+        rest = condition[match.end():]
+        found[name] = re.match(r"\)?(?:::[\w ]+?)?\)?\s*~~(?!\*)", rest) is not None
+
+    return list(found.items())
+
+
+def seq_scans(plan, table_columns):
+    # Finds every Seq Scan in a plan, with the columns that table was filtered on (its own Filter)
+    # or joined on (the join conditions above it, which name the table by its alias)
+    join_conditions = [node[key] for node in walk(plan) for key in JOIN_CONDITIONS if key in node]
+    scans = []
+
+    for node in walk(plan):
+        if node.get("Node Type") != "Seq Scan" or node.get("Relation Name") not in table_columns:
+            continue
+
+        relation = node["Relation Name"]
+        alias = node.get("Alias", relation)
+        columns = table_columns[relation]
+
+        filtered = referenced_columns(node.get("Filter", ""), relation, alias, columns)
+        joined = [reference for condition in join_conditions
+                  for reference in referenced_columns(condition, relation, alias, columns, qualified_only=True)]
+
+        if filtered or joined:
+            scans.append({
+                "table": relation,
+                "filtered": filtered,
+                "joined": joined,
+                "rows_removed": node.get("Rows Removed by Filter", 0),
+            })
+
+    return scans
+
+
+# Candidate indexes
+
+def index_name(table, columns):
+    return f"advisor_{table}_{'_'.join(columns)}"[:MAX_NAME_LENGTH]
+
+
+def make_candidate(table, columns, pattern_columns=()):
+    # pattern_columns get the text_pattern_ops operator class - that's what lets a btree index
+    # answer LIKE 'abc%' under any collation (it still can't help with LIKE '%abc')
+    columns = tuple(columns)
+    name = index_name(table, columns)
+    column_sql = ", ".join(f"{column} text_pattern_ops" if column in pattern_columns else column
+                           for column in columns)
+
+    return {
+        "name": name,
+        "table": table,
+        "columns": columns,
+        "sql": f"CREATE INDEX {name} ON {table} ({column_sql})",
+        "queries": [],
+    }
+
+
+def candidates_for(scans, existing_indexes):
+    # One candidate per filtered/joined column, plus one covering all the columns a query filters
+    # that table on together. Skips anything an existing index (or the primary key) already covers.
+    candidates = []
+
+    for scan in scans:
+        table = scan["table"]
+        pattern_columns = {column for column, like in scan["filtered"] if like}
+        column_sets = [(column,) for column, _ in scan["filtered"] + scan["joined"]]
+
+        filtered = [column for column, _ in scan["filtered"]]
+        if len(filtered) > 1:
+            column_sets.append(tuple(filtered[:MAX_INDEX_COLUMNS]))
+
+        for columns in column_sets:
+            covered = any(tuple(existing[:len(columns)]) == columns for existing in existing_indexes.get(table, []))
+            if covered and not pattern_columns.intersection(columns):
+                continue
+            candidates.append(make_candidate(table, columns, pattern_columns))
+
+    return candidates
+
+
+def existing_indexes(engine, tables):
+    # table -> list of column tuples, for every index and primary key already in the database
+    inspector = inspect(engine)
+    indexes = {}
+
+    for table in tables:
+        column_sets = [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+        primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+        if primary_key:
+            column_sets.append(tuple(primary_key))
+        indexes[table] = column_sets
+
+    return indexes
+
+
+# Measuring
+
+def explain(connection, sql, repeats=DEFAULT_REPEATS):
+    # Runs the query with EXPLAIN ANALYZE and returns (plan, fastest execution time in ms)
+    best_plan, best_ms = None, None
+
+    for _ in range(repeats):
+        result = connection.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+        result = json.loads(result) if isinstance(result, str) else result
+        milliseconds = result[0]["Execution Time"]
+
+        if best_ms is None or milliseconds < best_ms:
+            best_plan, best_ms = result[0]["Plan"], milliseconds
+
+    return best_plan, best_ms
+
+
+def profile_workload(engine, queries, repeats=DEFAULT_REPEATS):
+    # Baseline plans and timings. Every query runs inside a transaction we roll back, and a query that
+    # fails (e.g. a table from a different demo database) is recorded and skipped.
+    profiles = []
+
+    with engine.connect() as connection:
+        for label, sql in queries:
+            transaction = connection.begin()
+            try:
+                plan, milliseconds = explain(connection, sql, repeats)
+                profiles.append({"query": label, "sql": sql, "plan": plan, "ms": milliseconds})
+            except SQLAlchemyError as error:
+                profiles.append({"query": label, "sql": sql, "error": str(error.orig or error).strip()})
+            finally:
+                transaction.rollback()
+
+    return profiles
+
+
+def measure_candidate(engine, candidate, profiles, repeats=DEFAULT_REPEATS):
+    # Creates the index, re-runs the queries that might use it, and rolls everything back
+    affected = [profile for profile in profiles if profile["query"] in candidate["queries"]]
+    results = []
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(text(candidate["sql"]))
+            connection.execute(text(f"ANALYZE {candidate['table']}")) # Fresh statistics for the planner
+
+            for profile in affected:
+                plan, milliseconds = explain(connection, profile["sql"], repeats)
+                results.append({
+                    "query": profile["query"],
+                    "before_ms": profile["ms"],
+                    "after_ms": milliseconds,
+                    "speedup": round(profile["ms"] / milliseconds, 2) if milliseconds else None,
+                    "uses_index": uses_index(plan, candidate["name"]),
+                })
+        finally:
+            transaction.rollback() # Drops the index again
+
+    return results
+
+
+def summarize(candidate, results, min_speedup=DEFAULT_MIN_SPEEDUP):
+    before = sum(result["before_ms"] for result in results)
+    after = sum(result["after_ms"] for result in results)
+    speedup = before / after if after else None
+
+    return {
+        "index": candidate["name"],
+        "sql": candidate["sql"],
+        "queries": results,
+        "before_ms": round(before, 3),
+        "after_ms": round(after, 3),
+        "saved_ms": round(before - after, 3),
+        "speedup": round(speedup, 2) if speedup else None,
+        # Only worth keeping if the planner actually picked it AND it made things faster
+        "recommended": bool(speedup and speedup >= min_speedup and any(result["uses_index"] for result in results)),
+    }
+
+
+def rank(summaries):
+    # Recommended indexes first, then by total time saved
+    return sorted(summaries, key=lambda summary: (not summary["recommended"], -summary["saved_ms"]))
+
+
+def advise(engine, paths=WORKLOAD_FILES, repeats=DEFAULT_REPEATS, min_speedup=DEFAULT_MIN_SPEEDUP):
+    queries = workload_queries(paths)
+    profiles = profile_workload(engine, queries, repeats)
+
+    inspector = inspect(engine)
+    table_columns = {table: {column["name"] for column in inspector.get_columns(table)}
+                     for table in inspector.get_table_names()}
+    indexes = existing_indexes(engine, table_columns)
+
+    # Collect candidates from every plan - the same index suggested by several queries is measured once,
+    # against all of them
+    candidates = {}
+    for profile in profiles:
+        if "plan" not in profile:
+            continue
+        for candidate in candidates_for(seq_scans(profile["plan"], table_columns), indexes):
+            candidate = candidates.setdefault(candidate["sql"], candidate)
+            candidate["queries"].append(profile["query"])
+
+    summaries = []
+    for candidate in candidates.values():
+        results = measure_candidate(engine, candidate, profiles, repeats)
+        summaries.append(summarize(candidate, results, min_speedup))
+
+    return {
+        "queries": [{key: value for key, value in profile.items() if key not in ("plan", "sql")} for profile in profiles],
+        "candidates": rank(summaries),
+    }
+
+
+def print_report(report):
+    failed = [profile for profile in report["queries"] if "error" in profile]
+    print(f"Profiled {len(report['queries']) - len(failed)} queries ({len(failed)} failed)")
+    print(f"Measured {len(report['candidates'])} candidate indexes\n")
+
+    for summary in report["candidates"]:
+        marker = "RECOMMENDED" if summary["recommended"] else "skip"
+        print(f"[{marker}] {summary['sql']}")
+        print(f"    {summary['before_ms']:.3f} ms -> {summary['after_ms']:.3f} ms "
+              f"(saved {summary['saved_ms']:.3f} ms, {summary['speedup']}x)")
+        for result in summary["queries"]:
+            used = "uses index" if result["uses_index"] else "index not used"
+            print(f"      {result['query']}: {result['before_ms']:.3f} -> {result['after_ms']:.3f} ms, {used}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suggest and measure indexes for the Chinook SQL workload")
+    parser.add_argument("files", nargs="*", default=WORKLOAD_FILES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--min-speedup", type=float, default=DEFAULT_MIN_SPEEDUP)
+    parser.add_argument("--output", help="also save the full report as JSON")
+    args = parser.parse_args()
+
+    engine = create_pooled_engine()
+    if engine.dialect.name != "postgresql":
+        parser.error("the index advisor needs PostgreSQL (EXPLAIN ANALYZE with FORMAT JSON)")
+
+    try:
+        report = advise(engine, args.files, args.repeats, args.min_speedup)
+    finally:
+        engine.dispose()
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
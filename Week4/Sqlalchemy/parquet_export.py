@@ -0,0 +1,239 @@
+# Exporting query results to partitioned Parquet
+
+# The pattern we've used so far - pd.read_sql() the whole result, then .to_csv() - holds every row in
+# memory at once, writes the slowest possible format to read back, and leaves the reader no choice but
+# to parse the entire file even if they only want 2013's invoices.
+
+# This streams the query instead (ChinookDB.stream_sql - a chunk at a time) and writes a Parquet
+# *dataset*: a folder per value of the partition column, hive style:
+#   exports/invoice_lines/invoice_year=2021/part-0.parquet
+#   exports/invoice_lines/invoice_year=2022/part-0.parquet
+# A reader that filters on invoice_year == 2022 never opens the other folders (partition pruning), and
+# within a file Parquet's per row group min/max stats let it skip more. pyarrow, pandas, Spark and DuckDB
+# all understand this layout:
+#   pd.read_parquet("exports/invoice_lines", filters=[("invoice_year", "=", 2022)])
+
+# Memory stays bounded: rows are buffered per partition and written out as a row group once a
+# partition has row_group_size of them, so at most (partitions x row_group_size) rows are held.
+# Writing is parallel: compressing and encoding happen inside pyarrow's C++ code, which releases the
+# GIL, so a small thread pool writes several partitions' row groups at the same time.
+
+# Usage, from this folder (DATABASE_URL in .env):
+#   python parquet_export.py invoice_lines ./exports/invoice_lines --partition-by billing_country
+#   python parquet_export.py --sql "SELECT * FROM track" ./exports/tracks --partition-by genre_id --compression zstd
+
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from chinook_db import ChinookDB, create_pooled_engine
+
+DEFAULT_CHUNK_SIZE = 50_000 # Rows fetched from the database at a time
+DEFAULT_ROW_GROUP_SIZE = 100_000 # Rows per partition buffered before they're written out
+DEFAULT_WRITERS = 4 # Threads writing partitions at the same time
+DEFAULT_MAX_OPEN_FILES = 256 # Past this, the least recently used partition file is closed (and a new part started later)
+
+COMPRESSIONS = ("snappy", "zstd", "gzip", "brotli", "lz4", "none")
+
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__" # What hive-style readers expect for a missing value
+
+# Ready made exports - the joins from Week3/SQL-Demos/joins-and-subqueries.sql, flattened for analysis
+EXPORTS = {
+    "invoice_lines": """
+        SELECT i.invoice_id, i.invoice_date, CAST(EXTRACT(YEAR FROM i.invoice_date) AS INTEGER) AS invoice_year,
+               i.billing_country, c.customer_id, c.first_name, c.last_name,
+               t.track_id, t.name AS track_name, il.unit_price, il.quantity,
+               il.unit_price * il.quantity AS line_total
+        FROM invoice i
+        JOIN customer c ON c.customer_id = i.customer_id
+        JOIN invoice_line il ON il.invoice_id = i.invoice_id
+        JOIN track t ON t.track_id = il.track_id
+    """,
+    "invoices": """
+        SELECT i.invoice_id, i.invoice_date, CAST(EXTRACT(YEAR FROM i.invoice_date) AS INTEGER) AS invoice_year,
+               i.billing_country, i.billing_city, i.total, c.customer_id, c.first_name, c.last_name
+        FROM invoice i
+        JOIN customer c ON c.customer_id = i.customer_id
+    """,
+}
+
+
+def widen_decimals(schema):
+    # pyarrow sizes a decimal column to the values in front of it: a chunk of 0.99s becomes decimal(3, 2),
+    # and a later chunk with 123.45 in it wouldn't fit. PostgreSQL NUMERIC columns (unit_price, total...)
+    # come back as Decimal, so give every decimal column the most digits a decimal128 can hold, keeping
+    # its scale (the digits after the point).
+    return pa.schema([field.with_type(pa.decimal128(38, field.type.scale)) if pa.types.is_decimal128(field.type)
+                      else field for field in schema], metadata=schema.metadata)
+
+
+def partition_dir(column, value):
+    # invoice_year=2021, billing_country=United%20Kingdom - quoted so any value makes a safe folder name
+    # (hive readers decode it again)
+    return f"{column}={NULL_PARTITION if value is None else quote(str(value), safe='')}"
+
+
+class PartitionedWriter:
+
+    def __init__(self, root, partition_by, compression="snappy", compression_level=None,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, writers=DEFAULT_WRITERS, max_open_files=DEFAULT_MAX_OPEN_FILES):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}' - use one of {COMPRESSIONS}")
+
+        self.root = root
+        self.partition_by = partition_by
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        # Set by the first chunk - every file in the dataset has the same columns and types. (So a column
+        # that's entirely NULL in the first chunk needs a CAST in the query to give it a real type.)
+        self.schema = None
+        self.buffers = {} # partition value -> [tables waiting to be written]
+        self.buffered_rows = {}
+        self.open_files = {} # partition value -> ParquetWriter, least recently used first
+        self.parts = {} # partition value -> how many part files it has had
+        self.files = []
+        self.rows = 0
+        self.pool = ThreadPoolExecutor(max_workers=writers)
+
+    def write(self, df):
+        # Adds one chunk of rows, split up by partition
+        if self.partition_by not in df.columns:
+            raise KeyError(f"Partition column '{self.partition_by}' isn't in the query result")
+
+        table = pa.Table.from_pandas(df.drop(columns=[self.partition_by]), preserve_index=False)
+        if self.schema is None:
+            self.schema = widen_decimals(table.schema)
+
+        try:
+            table = table.cast(self.schema)
+        except pa.ArrowInvalid as error:
+            # e.g. a NUMERIC column with more digits after the point than in the first chunk - CAST it to
+            # a fixed NUMERIC(p, s) in the query so every chunk agrees
+            raise ValueError(f"Rows don't fit the columns' types from the first chunk: {error}") from error
+
+        # groupby(dropna=False) - rows with no partition value still get exported, to the null partition
+        for value, positions in df.groupby(self.partition_by, dropna=False, sort=False).indices.items():
+            value = None if value != value else value # NaN -> None
+            value = value.item() if hasattr(value, "item") else value
+            self.buffers.setdefault(value, []).append(table.take(positions))
+            self.buffered_rows[value] = self.buffered_rows.get(value, 0) + len(positions)
+
+        self.rows += len(df)
+        self._flush([value for value, rows in self.buffered_rows.items() if rows >= self.row_group_size])
+
+    def close(self):
+        self._flush(list(self.buffers), final=True)
+        for writer in self.open_files.values():
+            writer.close()
+        self.open_files = {}
+        self.pool.shutdown()
+        return {"rows": self.rows, "partitions": len(self.parts), "files": sorted(self.files)}
+
+    def _flush(self, values, final=False):
+        # Opening/closing files happens here, one at a time - only the writing itself is spread over the threads.
+        # Done max_open_files partitions at a time, so opening a file never closes one that's still being written.
+        for start in range(0, len(values), self.max_open_files):
+            jobs = []
+            for value in values[start:start + self.max_open_files]:
+                table = pa.concat_tables(self.buffers.pop(value))
+                self.buffered_rows.pop(value)
+
+                # Only whole row groups until the end - the leftover rows wait for the next chunk, so files
+                # aren't littered with tiny row groups (each one costs a read and a set of min/max stats)
+                if not final:
+                    whole = len(table) - len(table) % self.row_group_size
+                    if whole < len(table):
+                        self.buffers[value] = [table.slice(whole)]
+                        self.buffered_rows[value] = len(table) - whole
+                    table = table.slice(0, whole)
+
+                jobs.append((self._writer_for(value), table))
+
+            for future in [self.pool.submit(writer.write_table, table, row_group_size=self.row_group_size)
+                           for writer, table in jobs]:
+                future.result() # Re-raises anything that went wrong in a thread
+
+    def _writer_for(self, value):
+        if value in self.open_files:
+            self.open_files[value] = self.open_files.pop(value) # Most recently used goes to the end
+            return self.open_files[value]
+
+        if len(self.open_files) >= self.max_open_files:
+            oldest = next(iter(self.open_files))
+            self.open_files.pop(oldest).close()
+
+        # A partition that had its file closed gets a new part file - Parquet files can't be appended to
+        part = self.parts.get(value, 0)
+        self.parts[value] = part + 1
+
+        directory = os.path.join(self.root, partition_dir(self.partition_by, value))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{part}.parquet")
+        self.files.append(path)
+
+        compression = None if self.compression == "none" else self.compression
+        self.open_files[value] = pq.ParquetWriter(path, self.schema, compression=compression,
+                                                  compression_level=self.compression_level)
+        return self.open_files[value]
+
+
+def export_query(db, sql, root, partition_by, params=None, chunk_size=DEFAULT_CHUNK_SIZE, overwrite=False,
+                 **writer_options):
+    # Streams sql's result into a partitioned Parquet dataset at root. Returns a small summary.
+    # overwrite=True deletes whatever is at root first - otherwise an existing export is never touched.
+    if os.path.exists(root) and os.listdir(root):
+        if not overwrite:
+            raise FileExistsError(f"{root} already has files in it - pass overwrite=True to replace them")
+        shutil.rmtree(root)
+
+    started = time.perf_counter()
+    writer = PartitionedWriter(root, partition_by, **writer_options)
+
+    try:
+        for chunk in db.stream_sql(sql, params, chunk_size):
+            writer.write(chunk)
+    finally:
+        summary = writer.close()
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a query to a partitioned Parquet dataset")
+    parser.add_argument("export", nargs="?", choices=sorted(EXPORTS), help="a ready made export (or use --sql)")
+    parser.add_argument("output", help="folder to write the dataset to")
+    parser.add_argument("--sql", help="your own query instead of a ready made export")
+    parser.add_argument("--partition-by", required=True, help="column to partition by, e.g. invoice_year")
+    parser.add_argument("--database-url", default=None, help="default: DATABASE_URL from .env")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="snappy")
+    parser.add_argument("--compression-level", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS, help="partitions written at the same time")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing export")
+    args = parser.parse_args()
+
+    if (args.export is None) == (args.sql is None):
+        parser.error("give either an export name or --sql")
+
+    db = ChinookDB(create_pooled_engine(args.database_url, pool_size=1, max_overflow=0))
+
+    try:
+        summary = export_query(db, args.sql or EXPORTS[args.export], args.output, args.partition_by,
+                               chunk_size=args.chunk_size, overwrite=args.overwrite, compression=args.compression,
+                               compression_level=args.compression_level, row_group_size=args.row_group_size,
+                               writers=args.writers)
+    finally:
+        db.dispose()
+
+    print(f"{summary['rows']} rows -> {summary['partitions']} partitions, {len(summary['files'])} files "
+          f"in {summary['seconds']}s")
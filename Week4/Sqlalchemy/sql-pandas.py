@@ -1,26 +1,54 @@
-import pandas as pd
-from sqlalchemy import create_engine #creates our database engine
-from dotenv import load_dotenv #lets us read from our .env file
-import os 
+from chinook_db import ChinookDB, create_pooled_engine, grouped_totals # Our data-access module (see chinook_db.py)
 
 # Step 1: Load our environment variable(s) from our .env file
-load_dotenv() #lowecase L 
-
-database_url = os.getenv('DATABASE_URL')
-
-# print(database_url)- just a sanity check 
+# create_pooled_engine() does this for us - it calls load_dotenv() and reads DATABASE_URL
 
 # Step 2: Create our database connection
-engine = create_engine(database_url)
+# Under the hood this is still create_engine(database_url), just with explicit connection
+# pool settings (how many connections to keep open, checking them before use, etc)
+engine = create_pooled_engine(pool_size=5, max_overflow=10)
+
+db = ChinookDB(engine)
 
 # Step 3: Read from a table (that already exists)
 
 # An example of a simple query
-df = pd.read_sql("SELECT * FROM Album LIMIT 5", engine)
+df = db.read_sql("SELECT * FROM Album LIMIT 5")
 print(df)
 
 # If we just want everything in a table, we can just use pandas
 # to ask for the table
-genre_df = pd.read_sql_table('genre', engine)
+# genre barely ever changes - cache=True keeps the result around for a few minutes, so asking
+# again doesn't go back to the database
+genre_df = db.read_table('genre', cache=True)
 
 print(genre_df)
+
+# The plain pandas version, no cache: pd.read_sql_table('genre', engine)
+
+# For big tables, stream the result in chunks instead of pulling it all over at once.
+# Here we total up sales per track without ever holding all of invoice_line in memory.
+track_sales = grouped_totals(
+    db.stream_sql("SELECT track_id, unit_price * quantity AS line_total FROM invoice_line", chunk_size=5_000),
+    by="track_id",
+    columns=["line_total"],
+)
+
+print(track_sales.sort_values(("sum", "line_total"), ascending=False).head())
+
+# Rock tracks for one album, from the materialized view (Week3/SQL-Demos/materialized-views.sql).
+# The join is already stored, so this is an index lookup on album_title - view_refresher.py keeps it current.
+# The view isn't part of a plain Chinook database - run "python view_refresher.py --install" once to create it.
+# to_regclass() gives back NULL instead of an error when there's nothing by that name.
+view_installed = db.read_sql("SELECT to_regclass('rock_tracks_mv') IS NOT NULL AS installed")["installed"].iloc[0]
+
+if view_installed:
+    rock_album_df = db.read_sql(
+        "SELECT track_name, artist_name, unit_price FROM rock_tracks_mv WHERE album_title = :album",
+        params={"album": "Restless and Wild"},
+    )
+    print(rock_album_df)
+else:
+    print("rock_tracks_mv isn't installed yet - run: python view_refresher.py --install")
+
+db.dispose() # Close our pooled connections when we're done
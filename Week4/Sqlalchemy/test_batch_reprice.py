@@ -0,0 +1,124 @@
+# Tests for batched repricing, against a throwaway SQLite database
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from batch_reprice import create_job_table, reprice_genre, reprice_jobs
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chinook.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE genre (genre_id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("CREATE TABLE track (track_id INTEGER PRIMARY KEY, genre_id INTEGER, unit_price NUMERIC)"))
+        connection.execute(text("INSERT INTO genre VALUES (1, 'Rock'), (2, 'Jazz')"))
+        # 10 rock tracks and 5 jazz tracks, mixed together, all at 1.00
+        for track_id in range(1, 16):
+            connection.execute(text("INSERT INTO track VALUES (:id, :genre, 1.0)"),
+                               {"id": track_id, "genre": 2 if track_id % 3 == 0 else 1})
+    create_job_table(engine)
+    yield engine
+    engine.dispose()
+
+
+def prices(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT genre_id, unit_price FROM track ORDER BY track_id"))
+        return [(genre_id, round(float(price), 2)) for genre_id, price in rows]
+
+
+def test_reprices_genre_in_batches(engine):
+
+    # Arrange
+    progress = []
+
+    # Act
+    result = reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=progress.append)
+
+    # Assert
+    assert result["rows_updated"] == 10
+    assert all(price == (1.1 if genre_id == 1 else 1.0) for genre_id, price in prices(engine))
+    assert [update["rows_updated"] for update in progress] == [3, 6, 9, 10] # ceil(10 / 3) batches
+    assert progress[-1]["percent_done"] == 100
+
+
+def test_resumes_after_failure_without_repricing_twice(engine):
+
+    # Arrange - the job dies after its second batch has committed
+    def crash_after_two_batches(progress):
+        if progress["rows_updated"] == 6:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=crash_after_two_batches)
+
+    # Act
+    progress = []
+    result = reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=progress.append)
+
+    # Assert - every rock track went up exactly once
+    assert result["rows_updated"] == 10
+    assert progress[0]["rows_updated"] == 9
+    assert all(price == (1.1 if genre_id == 1 else 1.0) for genre_id, price in prices(engine))
+
+
+def test_retry_running_alongside_the_original_reprices_once(engine):
+
+    # Arrange - after the original run's first batch, a scheduler retry of the same job starts and
+    # finishes while the original is still going
+    retries = []
+
+    def retry_after_first_batch(progress):
+        if not retries:
+            retries.append(reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=None))
+
+    # Act
+    result = reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=retry_after_first_batch)
+
+    # Assert - the original picked up the retry's progress instead of its own, so nothing went up twice
+    assert retries[0]["rows_updated"] == 10
+    assert result["rows_updated"] == 10
+    assert all(price == (1.1 if genre_id == 1 else 1.0) for genre_id, price in prices(engine))
+
+
+def test_finished_job_is_not_run_again(engine):
+
+    # Arrange
+    reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=5, on_progress=None)
+
+    # Act
+    result = reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=5, on_progress=None)
+
+    # Assert
+    assert result["status"] == "done"
+    assert all(price == (1.1 if genre_id == 1 else 1.0) for genre_id, price in prices(engine))
+
+
+def test_failed_batch_is_recorded(engine):
+
+    # Arrange - a trigger that refuses prices over 1.05 makes the first batch's UPDATE fail
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TRIGGER price_cap BEFORE UPDATE ON track WHEN NEW.unit_price > 1.05 "
+                                "BEGIN SELECT RAISE(ABORT, 'price too high'); END"))
+
+    # Act
+    with pytest.raises(Exception):
+        reprice_genre(engine, "Rock", 10, job_id="rock-sale", batch_size=3, on_progress=None)
+
+    # Assert - the half-done batch was undone, and the failure was saved
+    with engine.connect() as connection:
+        job = connection.execute(select(reprice_jobs)).mappings().one()
+    assert job["status"] == "failed"
+    assert "price too high" in job["error"]
+    assert job["last_track_id"] == 0
+    assert all(price == 1.0 for _, price in prices(engine))
+
+
+def test_job_id_cannot_be_reused_for_different_work(engine):
+
+    # Arrange
+    reprice_genre(engine, "Rock", 10, job_id="sale", on_progress=None)
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        reprice_genre(engine, "Jazz", 10, job_id="sale", on_progress=None)
@@ -0,0 +1,114 @@
+# Tests for the Chinook data-access module, against a throwaway SQLite database
+
+import pandas as pd
+import pytest
+from sqlalchemy import event
+from chinook_db import ChinookDB, QueryCache, create_pooled_engine, grouped_totals
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_pooled_engine(f"sqlite:///{tmp_path / 'chinook.db'}", pool_size=2)
+    pd.DataFrame({"genre_id": [1, 2], "name": ["Rock", "Jazz"]}).to_sql("genre", engine, index=False)
+
+    # Count every statement the engine sends, so we can tell cache hits from real queries
+    engine.statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: engine.statements.append(sql))
+
+    db = ChinookDB(engine)
+    yield db
+    db.dispose()
+
+
+def test_read_table_with_cache_only_queries_once(db):
+
+    # Act
+    first = db.read_table("genre", cache=True)
+    second = db.read_table("genre", cache=True)
+
+    # Assert
+    assert len(db.engine.statements) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_read_sql_without_cache_always_queries(db):
+
+    # Act
+    db.read_sql("SELECT * FROM genre WHERE genre_id = :genre_id", {"genre_id": 1})
+    result = db.read_sql("SELECT * FROM genre WHERE genre_id = :genre_id", {"genre_id": 1})
+
+    # Assert
+    assert len(db.engine.statements) == 2
+    assert result["name"].tolist() == ["Rock"]
+
+
+def test_cached_results_are_keyed_by_params(db):
+
+    # Act
+    rock = db.read_sql("SELECT name FROM genre WHERE genre_id = :genre_id", {"genre_id": 1}, cache=True)
+    jazz = db.read_sql("SELECT name FROM genre WHERE genre_id = :genre_id", {"genre_id": 2}, cache=True)
+
+    # Assert
+    assert rock["name"].tolist() == ["Rock"]
+    assert jazz["name"].tolist() == ["Jazz"]
+
+
+def test_query_cache_expires_entries_after_ttl(monkeypatch):
+
+    # Arrange - control the clock instead of sleeping
+    now = [100.0]
+    monkeypatch.setattr("chinook_db.time.monotonic", lambda: now[0])
+    cache = QueryCache(max_size=10, ttl=30)
+    cache.put("genre", "cached")
+
+    # Act - Assert
+    now[0] = 129.0
+    assert cache.get("genre") == "cached"
+    now[0] = 130.0
+    assert cache.get("genre") is None
+
+
+def test_query_cache_evicts_least_recently_used():
+
+    # Arrange
+    cache = QueryCache(max_size=2, ttl=60)
+    cache.put("genre", 1)
+    cache.put("album", 2)
+    cache.get("genre") # genre is now the most recently used
+
+    # Act
+    cache.put("artist", 3)
+
+    # Assert
+    assert cache.get("album") is None
+    assert cache.get("genre") == 1
+    assert cache.get("artist") == 3
+
+
+def test_stream_sql_yields_bounded_chunks(db):
+
+    # Arrange
+    pd.DataFrame({"track_id": [1, 1, 2, 3, 3, 3, 4], "line_total": [1.0, 2.0, 3.0, 1.0, 1.0, 1.0, 5.0]}) \
+        .to_sql("invoice_line", db.engine, index=False)
+
+    # Act
+    chunks = list(db.stream_sql("SELECT * FROM invoice_line", chunk_size=3))
+
+    # Assert
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+
+
+def test_grouped_totals_matches_groupby_on_full_frame(db):
+
+    # Arrange
+    full_df = pd.DataFrame({"track_id": [1, 1, 2, 3, 3, 3, 4], "line_total": [1.0, 2.0, 3.0, 1.0, 1.0, 1.0, 5.0]})
+    full_df.to_sql("invoice_line", db.engine, index=False)
+    expected = full_df.groupby("track_id")["line_total"].agg(["sum", "count", "mean"])
+
+    # Act
+    totals = grouped_totals(db.stream_sql("SELECT * FROM invoice_line", chunk_size=2), "track_id", ["line_total"])
+
+    # Assert
+    assert totals[("sum", "line_total")].tolist() == expected["sum"].tolist()
+    assert totals[("count", "line_total")].tolist() == expected["count"].tolist()
+    assert totals[("mean", "line_total")].tolist() == expected["mean"].tolist()
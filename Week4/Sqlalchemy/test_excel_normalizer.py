@@ -0,0 +1,163 @@
+# Tests for the Excel -> 3NF converter, loading into a throwaway SQLite database
+
+import datetime
+import os
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy import create_engine, text
+from excel_normalizer import KeyEncoder, normalize_workbook, split_list
+
+RAW_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "Week3", "SQL-Demos", "Data Normalization",
+                        "raw_data.xlsx")
+
+HEADER = ["OrderID", "OrderDate", "CustomerName", "CustomerPhone", "CustomerAddress",
+          "BookTitles (multiple per order)", "BookAuthors (multiple per order)", "BookQty (multiple per order)",
+          "BookPriceEach (multiple per order)", "PaymentMethod", "Salesperson"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bookstore.db'}")
+    yield engine
+    engine.dispose()
+
+
+def query(engine, sql):
+    with engine.connect() as connection:
+        return connection.execute(text(sql)).all()
+
+
+def test_key_encoder_hands_out_keys_in_one_pass():
+
+    # Arrange
+    encoder = KeyEncoder("author_id", ["name"])
+
+    # Act
+    keys = [encoder.key_for(name) for name in ["J. Smith", "L. Turner", "J. Smith"]]
+
+    # Assert
+    assert keys == [1, 2, 1]
+    assert encoder.take_pending() == [{"author_id": 1, "name": "J. Smith"}, {"author_id": 2, "name": "L. Turner"}]
+    assert encoder.take_pending() == [] # Each new value is only handed over for inserting once
+
+
+def test_split_list_strips_the_fancy_quotes():
+
+    # Act / Assert
+    assert split_list("“39.99; 29.99”") == ["39.99", "29.99"]
+    assert split_list(None) == []
+
+
+def test_normalizes_the_demo_workbook(engine):
+
+    # Act
+    result = normalize_workbook(RAW_DATA, engine)
+
+    # Assert
+    assert result["rejects"] == []
+    assert result["rows"] == {"customers": 3, "salespeople": 2, "payment_methods": 2, "authors": 4, "books": 4,
+                              "orders": 4, "order_items": 8}
+    # Order 1003 is Alice Green's second order - her details are stored once, and both orders point at them
+    assert query(engine, "SELECT COUNT(DISTINCT customer_id) FROM orders WHERE order_id IN (1001, 1003)") == [(1,)]
+    # Joining it all back together gives the original order lines
+    assert query(engine, """
+        SELECT b.title, a.name, oi.quantity, oi.unit_price
+        FROM order_items oi
+        JOIN books b ON b.book_id = oi.book_id
+        JOIN authors a ON a.author_id = b.author_id
+        WHERE oi.order_id = 1001
+        ORDER BY b.title
+    """) == [("Data Modeling Basics", "L. Turner", 2, 29.99), ("Learning SQL", "J. Smith", 1, 39.99)]
+
+
+def test_streams_in_batches_and_rejects_bad_rows(engine, tmp_path):
+
+    # Arrange
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for number in range(25):
+        sheet.append([2000 + number, datetime.datetime(2025, 2, 1), f"Customer {number % 4}", "555-0000",
+                      "1 Main St", "“Book A; Book B”", "“Author A; Author B”", "“1;3”", "“10.00; 12.50”",
+                      "Cash", "Tom Brown"])
+    sheet.append([3000, datetime.datetime(2025, 2, 2), "Customer 0", "555-0000", "1 Main St",
+                  "“Book A; Book B”", "“Author A”", "“1”", "“10.00”", "Cash", "Tom Brown"]) # 2 titles, 1 author
+    path = tmp_path / "orders.xlsx"
+    workbook.save(path)
+
+    # Act - batches of 10 orders, so three transactions
+    result = normalize_workbook(str(path), engine, batch_size=10)
+
+    # Assert
+    assert result["rows"]["orders"] == 25
+    assert result["rows"]["order_items"] == 50
+    assert result["rows"]["customers"] == 4
+    assert result["rows"]["books"] == 2
+    assert [order_id for order_id, _ in result["rejects"]] == [3000]
+    assert query(engine, "SELECT SUM(quantity * unit_price) FROM order_items") == [(25 * (10.0 + 3 * 12.5),)]
+
+
+def write_workbook(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def order_row(order_id, customer, title, author, order_date=datetime.datetime(2025, 3, 1)):
+    return [order_id, order_date, customer, "555-0000", "1 Main St", f"“{title}”", f"“{author}”", "“2”", "“9.50”",
+            "Card", "Tom Brown"]
+
+
+def test_second_workbook_and_rerun_reuse_existing_keys(engine, tmp_path):
+
+    # Arrange - the demo workbook is already loaded
+    normalize_workbook(RAW_DATA, engine)
+    # Alice Green's details as the demo workbook has them
+    name, phone, address = query(engine, "SELECT name, phone, address FROM customers WHERE name = 'Alice Green'")[0]
+    more = write_workbook(tmp_path / "more.xlsx", [
+        [5001, datetime.datetime(2025, 3, 1), name, phone, address, "“Learning SQL”", "“J. Smith”", "“2”", "“9.50”",
+         "Card", "Tom Brown"],
+        order_row(5002, "New Customer", "New Book", "New Author"),
+    ])
+
+    # Act
+    second = normalize_workbook(more, engine)
+    rerun = normalize_workbook(RAW_DATA, engine)
+
+    # Assert - only the genuinely new customer, author and book were added
+    assert second["rows"]["customers"] == 1
+    assert second["rows"]["authors"] == 1
+    assert second["rows"]["books"] == 1
+    assert second["rows"]["orders"] == 2
+    assert query(engine, "SELECT COUNT(*) FROM orders WHERE customer_id = "
+                         "(SELECT customer_id FROM customers WHERE name = 'Alice Green')") == [(3,)]
+    # Running the demo workbook again adds nothing, and says so
+    assert sum(rerun["rows"].values()) == 0
+    assert sorted(rerun["skipped"]) == [1001, 1002, 1003, 1004]
+
+
+def test_malformed_rows_are_rejected_without_leftovers(engine, tmp_path):
+
+    # Arrange
+    path = write_workbook(tmp_path / "bad.xlsx", [
+        order_row("not a number", "Customer A", "Orphan Book 1", "Orphan Author 1"),
+        order_row(6001, "Customer B", "Orphan Book 2", "Orphan Author 2", order_date="sometime in March"),
+        order_row(6002, "Customer C", "Good Book", "Good Author"),
+        order_row(6002, "Customer C", "Good Book", "Good Author"), # The same order twice
+    ])
+
+    # Act
+    result = normalize_workbook(path, engine)
+
+    # Assert
+    assert [order_id for order_id, _ in result["rejects"]] == ["not a number", 6001]
+    assert result["skipped"] == [6002]
+    assert result["rows"]["orders"] == 1
+    assert query(engine, "SELECT name FROM authors") == [("Good Author",)]
+    assert query(engine, "SELECT title FROM books") == [("Good Book",)]
+    assert query(engine, "SELECT name FROM customers") == [("Customer C",)]
@@ -0,0 +1,114 @@
+# Tests for the index advisor's SQL parsing and plan reading.
+# Measuring candidates needs a real PostgreSQL server, so these stick to the parts that don't.
+
+from index_advisor import (candidates_for, rank, referenced_columns, seq_scans, split_statements, summarize,
+                           workload_queries)
+
+TABLE_COLUMNS = {
+    "track": {"track_id", "name", "album_id", "genre_id", "composer", "milliseconds"},
+    "album": {"album_id", "title", "artist_id"},
+    "artist": {"artist_id", "name"},
+}
+
+# Trimmed down from EXPLAIN (ANALYZE, FORMAT JSON) output for a join with a filter
+JOIN_PLAN = {
+    "Node Type": "Hash Join",
+    "Hash Cond": "(a.artist_id = ar.artist_id)",
+    "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "album", "Alias": "a"},
+        {"Node Type": "Hash", "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "artist", "Alias": "ar",
+             "Filter": "((name)::text ~~ 'A%'::text)", "Rows Removed by Filter": 240},
+        ]},
+    ],
+}
+
+
+def test_split_statements_skips_comments_and_quoted_semicolons():
+
+    # Arrange
+    sql = "-- a comment; still a comment\nSELECT 'a;b' FROM t;\n/* block; comment */\nSELECT 2;\n" \
+          "CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql;"
+
+    # Act
+    statements = split_statements(sql)
+
+    # Assert
+    assert [line for line, _ in statements] == [2, 4, 5]
+    assert statements[0][1] == "SELECT 'a;b' FROM t"
+    assert statements[2][1].endswith("$$ SELECT 1; $$ LANGUAGE sql")
+
+
+def test_workload_queries_keeps_selects_only(tmp_path):
+
+    # Arrange
+    path = tmp_path / "demo.sql"
+    path.write_text("EXPLAIN ANALYZE\nSELECT * FROM track;\nDELETE FROM track;\nselect * from  track;\n"
+                    "WITH x AS (SELECT 1) SELECT * FROM x;")
+
+    # Act
+    queries = workload_queries([str(path)])
+
+    # Assert - the EXPLAIN is stripped, the DELETE and the repeated query are dropped
+    assert queries == [("demo.sql:1", "SELECT * FROM track"), ("demo.sql:5", "WITH x AS (SELECT 1) SELECT * FROM x")]
+
+
+def test_referenced_columns_spots_like_and_ignores_literals():
+
+    # Act
+    columns = referenced_columns("(((composer)::text ~~ '%name%'::text) AND (genre_id = 1))", "track", "track",
+                                 TABLE_COLUMNS["track"])
+
+    # Assert - "name" only appears inside the string, so it isn't a column reference
+    assert columns == [("composer", True), ("genre_id", False)]
+
+
+def test_seq_scans_finds_filter_and_join_columns():
+
+    # Act
+    scans = seq_scans(JOIN_PLAN, TABLE_COLUMNS)
+
+    # Assert
+    assert scans == [
+        {"table": "album", "filtered": [], "joined": [("artist_id", False)], "rows_removed": 0},
+        {"table": "artist", "filtered": [("name", True)], "joined": [("artist_id", False)], "rows_removed": 240},
+    ]
+
+
+def test_candidates_skip_existing_indexes():
+
+    # Arrange - the primary key already covers artist.artist_id
+    existing = {"artist": [("artist_id",)], "track": [("genre_id",)]}
+    scans = seq_scans(JOIN_PLAN, TABLE_COLUMNS)
+    scans.append({"table": "track", "filtered": [("genre_id", False), ("milliseconds", False)], "joined": [],
+                  "rows_removed": 3000})
+
+    # Act
+    statements = [candidate["sql"] for candidate in candidates_for(scans, existing)]
+
+    # Assert
+    assert statements == [
+        "CREATE INDEX advisor_album_artist_id ON album (artist_id)",
+        "CREATE INDEX advisor_artist_name ON artist (name text_pattern_ops)",
+        "CREATE INDEX advisor_track_milliseconds ON track (milliseconds)",
+        "CREATE INDEX advisor_track_genre_id_milliseconds ON track (genre_id, milliseconds)",
+    ]
+
+
+def test_rank_puts_recommended_and_biggest_savings_first():
+
+    # Arrange
+    candidates = [{"name": name, "sql": f"CREATE INDEX {name}"} for name in ("unused", "small", "big")]
+    summaries = [
+        summarize(candidates[0], [{"before_ms": 5.0, "after_ms": 1.0, "uses_index": False}]),
+        summarize(candidates[1], [{"before_ms": 2.0, "after_ms": 1.0, "uses_index": True}]),
+        summarize(candidates[2], [{"before_ms": 9.0, "after_ms": 3.0, "uses_index": True}]),
+    ]
+
+    # Act
+    ranked = rank(summaries)
+
+    # Assert
+    assert [summary["index"] for summary in ranked] == ["big", "small", "unused"]
+    assert ranked[0]["speedup"] == 3.0
+    assert ranked[2]["recommended"] is False
@@ -0,0 +1,157 @@
+# Tests for the partitioned Parquet export, against a small Chinook-shaped SQLite database
+
+import os
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine, text
+from chinook_db import ChinookDB
+from parquet_export import NULL_PARTITION, PartitionedWriter, export_query
+
+# SQLite has no EXTRACT - strftime gives the same invoice_year
+INVOICE_LINES = """
+    SELECT i.invoice_id, i.invoice_date, CAST(strftime('%Y', i.invoice_date) AS INTEGER) AS invoice_year,
+           i.billing_country, il.track_id, il.unit_price, il.quantity
+    FROM invoice i
+    JOIN invoice_line il ON il.invoice_id = i.invoice_id
+    ORDER BY il.invoice_line_id
+"""
+
+COUNTRIES = ["USA", "Canada", "United Kingdom", None]
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chinook.db'}")
+
+    with engine.begin() as connection:
+        connection.execute(text("""CREATE TABLE invoice (invoice_id INTEGER PRIMARY KEY, invoice_date TEXT,
+                                   billing_country TEXT)"""))
+        connection.execute(text("""CREATE TABLE invoice_line (invoice_line_id INTEGER PRIMARY KEY, invoice_id INTEGER,
+                                   track_id INTEGER, unit_price REAL, quantity INTEGER)"""))
+        connection.execute(text("INSERT INTO invoice VALUES (:id, :date, :country)"),
+                           [{"id": number, "date": f"{2021 + number % 3}-03-0{1 + number % 9}",
+                             "country": COUNTRIES[number % 4]} for number in range(1, 61)])
+        connection.execute(text("INSERT INTO invoice_line VALUES (:id, :invoice_id, :track_id, 0.99, :quantity)"),
+                           [{"id": number, "invoice_id": 1 + number % 60, "track_id": number, "quantity": 1 + number % 2}
+                            for number in range(1, 241)])
+
+    yield ChinookDB(engine)
+    engine.dispose()
+
+
+def test_writes_one_hive_folder_per_year(db, tmp_path):
+
+    # Arrange
+    out = tmp_path / "invoice_lines"
+
+    # Act
+    summary = export_query(db, INVOICE_LINES, str(out), "invoice_year")
+
+    # Assert
+    assert summary["rows"] == 240
+    assert summary["partitions"] == 3
+    assert sorted(os.listdir(out)) == ["invoice_year=2021", "invoice_year=2022", "invoice_year=2023"]
+    # The year lives in the folder name, not in the files
+    assert "invoice_year" not in pq.read_schema(summary["files"][0]).names
+
+
+def test_readers_only_open_the_partition_they_filter_on(db, tmp_path):
+
+    # Arrange
+    out = str(tmp_path / "invoice_lines")
+    export_query(db, INVOICE_LINES, out, "invoice_year")
+    dataset = ds.dataset(out, format="parquet", partitioning="hive")
+
+    # Act
+    fragments = list(dataset.get_fragments(filter=ds.field("invoice_year") == 2022))
+    table = dataset.to_table(filter=ds.field("invoice_year") == 2022)
+
+    # Assert
+    assert [os.path.basename(os.path.dirname(fragment.path)) for fragment in fragments] == ["invoice_year=2022"]
+    expected = db.read_sql(INVOICE_LINES)
+    assert table.num_rows == (expected["invoice_year"] == 2022).sum()
+
+
+def test_small_chunks_and_row_groups_give_the_same_data(db, tmp_path):
+
+    # Arrange
+    out = tmp_path / "by_country"
+    expected = db.read_sql(INVOICE_LINES).drop(columns=["billing_country"])
+
+    # Act - 7 rows at a time from the database, row groups of 10
+    summary = export_query(db, INVOICE_LINES, str(out), "billing_country", chunk_size=7, row_group_size=10,
+                           writers=2)
+
+    # Assert
+    assert summary["partitions"] == 4
+    assert sorted(os.listdir(out)) == ["billing_country=Canada", "billing_country=USA",
+                                       "billing_country=United%20Kingdom", f"billing_country={NULL_PARTITION}"]
+    usa = pq.ParquetFile(out / "billing_country=USA" / "part-0.parquet")
+    assert usa.metadata.num_row_groups == 6 # 60 USA rows in groups of 10
+
+    actual = pd.concat([pd.read_parquet(path) for path in summary["files"]]).sort_values("track_id")
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True),
+                                  expected.sort_values("track_id").reset_index(drop=True), check_dtype=False)
+
+
+def test_closed_partitions_get_a_new_part_file(db, tmp_path):
+
+    # Act - only one file open at a time, and every chunk has every country in it
+    summary = export_query(db, INVOICE_LINES, str(tmp_path / "out"), "billing_country", chunk_size=8,
+                           row_group_size=2, max_open_files=1)
+
+    # Assert
+    assert summary["rows"] == 240
+    assert len(summary["files"]) > summary["partitions"]
+    assert sum(pq.ParquetFile(path).metadata.num_rows for path in summary["files"]) == 240
+
+
+def test_compression_option_is_used(db, tmp_path):
+
+    # Act
+    summary = export_query(db, INVOICE_LINES, str(tmp_path / "out"), "invoice_year", compression="zstd",
+                           compression_level=5)
+
+    # Assert
+    assert pq.ParquetFile(summary["files"][0]).metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_will_not_write_over_an_existing_export(db, tmp_path):
+
+    # Arrange
+    out = str(tmp_path / "out")
+    export_query(db, INVOICE_LINES, out, "invoice_year")
+
+    # Act / Assert
+    with pytest.raises(FileExistsError):
+        export_query(db, INVOICE_LINES, out, "invoice_year")
+
+    summary = export_query(db, INVOICE_LINES, out, "invoice_year", overwrite=True)
+    assert len(summary["files"]) == 3
+
+
+def test_decimals_can_grow_after_the_first_chunk(tmp_path):
+
+    # Arrange - PostgreSQL NUMERIC columns arrive as Decimal. The first chunk only has small prices,
+    # which pyarrow on its own would store as decimal(3, 2)
+    chunks = [
+        pd.DataFrame({"invoice_year": [2021, 2022], "total": [Decimal("0.99"), Decimal("1.98")]}),
+        pd.DataFrame({"invoice_year": [2021, 2022], "total": [Decimal("12345.67"), None]}),
+        pd.DataFrame({"invoice_year": [2022], "total": [Decimal("3.5")]}),
+    ]
+    writer = PartitionedWriter(str(tmp_path / "out"), "invoice_year", row_group_size=2)
+
+    # Act
+    for chunk in chunks:
+        writer.write(chunk)
+    summary = writer.close()
+
+    # Assert
+    assert summary["rows"] == 5
+    table = ds.dataset(str(tmp_path / "out"), format="parquet", partitioning="hive").to_table()
+    assert sorted(value for value in table["total"].to_pylist() if value is not None) == [
+        Decimal("0.99"), Decimal("1.98"), Decimal("3.50"), Decimal("12345.67")]
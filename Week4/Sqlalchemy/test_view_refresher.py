@@ -0,0 +1,109 @@
+# Tests for the materialized view refresher. Materialized views are Postgres only, so the refresh itself
+# is swapped out - everything else (the change log, refresh state) runs against SQLite.
+
+import os
+
+import pytest
+import view_refresher
+from sqlalchemy import create_engine, text
+from view_refresher import MATERIALIZED_VIEWS_SQL, ViewRefresher, refresh_view, split_statements
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chinook.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE mv_source (view_name TEXT, table_name TEXT)"))
+        connection.execute(text("CREATE TABLE mv_pending_change (change_id INTEGER PRIMARY KEY, view_name TEXT, "
+                                "table_name TEXT, changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"))
+        connection.execute(text("CREATE TABLE mv_refresh_state (view_name TEXT PRIMARY KEY, "
+                                "refreshed_at TIMESTAMP NOT NULL)"))
+        connection.execute(text("INSERT INTO mv_source VALUES ('rock_tracks_mv', 'track'), "
+                                "('rock_tracks_mv', 'genre')"))
+
+    engine.refreshes = []
+    monkeypatch.setattr(view_refresher, "refresh_view",
+                        lambda connection, view: engine.refreshes.append(view))
+    yield engine
+    engine.dispose()
+
+
+def log_change(connection, table):
+    # What the trigger does in Postgres
+    connection.execute(text("INSERT INTO mv_pending_change (view_name, table_name) "
+                            "SELECT view_name, table_name FROM mv_source WHERE table_name = :table"),
+                       {"table": table})
+
+
+def pending_changes(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM mv_pending_change")).scalar()
+
+
+def test_refreshes_first_time_then_only_after_changes(engine):
+
+    # Arrange
+    refresher = ViewRefresher(engine)
+
+    # Act
+    first = refresher.run_once() # Never refreshed before
+    second = refresher.run_once() # Nothing changed
+    with engine.begin() as connection:
+        log_change(connection, "invoice") # Not one of the view's tables
+    third = refresher.run_once()
+    with engine.begin() as connection:
+        log_change(connection, "genre")
+        log_change(connection, "track")
+    fourth = refresher.run_once()
+
+    # Assert - the refresh used up the logged changes
+    assert (first, second, third, fourth) == (["rock_tracks_mv"], [], [], ["rock_tracks_mv"])
+    assert engine.refreshes == ["rock_tracks_mv", "rock_tracks_mv"]
+    assert pending_changes(engine) == 0
+
+
+def test_failed_refresh_is_retried(engine, monkeypatch):
+
+    # Arrange
+    def broken_refresh(connection, view):
+        raise RuntimeError("lock timeout")
+
+    refresher = ViewRefresher(engine)
+    refresher.run_once()
+    with engine.begin() as connection:
+        log_change(connection, "track")
+    monkeypatch.setattr(view_refresher, "refresh_view", broken_refresh)
+
+    # Act
+    failed = refresher.run_once()
+    changes_after_failure = pending_changes(engine)
+    monkeypatch.setattr(view_refresher, "refresh_view", lambda connection, view: None)
+    retried = refresher.run_once()
+
+    # Assert - the failed refresh put the change it took back, so the next check tries again
+    assert failed == []
+    assert changes_after_failure == 1
+    assert retried == ["rock_tracks_mv"]
+
+
+def test_setup_script_parses_into_statements():
+
+    # Act
+    # The path is relative to this folder, and pytest might be running from somewhere else
+    with open(os.path.join(os.path.dirname(__file__), MATERIALIZED_VIEWS_SQL)) as sql_file:
+        statements = [statement for _, statement in split_statements(sql_file.read())]
+
+    # Assert - the trigger function's body stays in one piece
+    function = next(statement for statement in statements if "FUNCTION log_source_change" in statement)
+    assert function.rstrip().endswith("$$")
+    assert statements[0].startswith("CREATE MATERIALIZED VIEW IF NOT EXISTS rock_tracks_mv")
+    # CREATE OR REPLACE TRIGGER needs Postgres 14 - each trigger is dropped and created instead
+    assert sum(statement.startswith("DROP TRIGGER IF EXISTS") for statement in statements) == 4
+    assert sum(statement.startswith("CREATE TRIGGER") for statement in statements) == 4
+
+
+def test_refresh_view_only_accepts_known_views():
+
+    # Act - Assert
+    with pytest.raises(ValueError):
+        refresh_view(None, "rock_tracks_mv; DROP TABLE track")
@@ -0,0 +1,157 @@
+# Keeping rock_tracks_mv fresh - but only when it needs it
+
+# A materialized view is a stored snapshot of a query (see Week3/SQL-Demos/materialized-views.sql).
+# We could refresh it every minute on a timer, but most minutes nothing has changed and the refresh
+# re-runs the whole join for nothing.
+
+# Instead, triggers on track/genre/album/artist log a row in mv_pending_change for each view that reads
+# from the table that changed. Every interval this script takes (deletes) a view's pending changes. None -
+# nothing changed, skip it. Some - REFRESH MATERIALIZED VIEW CONCURRENTLY, which doesn't block the
+# dashboards reading the view.
+
+# Taking the changes and refreshing happen in ONE transaction. The DELETE only sees changes that were
+# committed before it ran, and the REFRESH, which runs after it, sees at least those. A change still being
+# written stays in the log for the next check, and if the refresh fails, the DELETE rolls back with it.
+
+# Usage, from this folder (DATABASE_URL in .env):
+#   python view_refresher.py --install       # Create the view, counters and triggers, then keep refreshing
+#   python view_refresher.py --once          # One check, then exit - e.g. from cron
+
+import argparse
+import logging
+import threading
+
+from sqlalchemy import bindparam, text
+
+from chinook_db import create_pooled_engine
+from index_advisor import split_statements
+
+MATERIALIZED_VIEWS_SQL = "../../Week3/SQL-Demos/materialized-views.sql"
+
+# The materialized views we keep fresh - which tables each one reads from is in the mv_source table
+VIEWS = ("rock_tracks_mv",)
+
+DEFAULT_INTERVAL = 60 # Seconds between checks
+
+logger = logging.getLogger(__name__)
+
+
+def install(engine, path=MATERIALIZED_VIEWS_SQL):
+    # Runs the setup script. Everything in it uses IF NOT EXISTS / OR REPLACE (or drops and re-creates),
+    # so running it again is safe.
+    with open(path) as sql_file:
+        statements = split_statements(sql_file.read())
+
+    with engine.begin() as connection:
+        for _, statement in statements:
+            # exec_driver_sql sends the statement as is - the $$ function body has to reach Postgres untouched
+            connection.exec_driver_sql(statement)
+
+
+def take_pending_changes(connection, view):
+    # Deletes the view's logged changes and returns how many there were. Only changes that have been
+    # committed are visible here - anything still in flight is left for the next check.
+    return connection.execute(
+        text("DELETE FROM mv_pending_change WHERE view_name = :view"), {"view": view}
+    ).rowcount
+
+
+def last_refreshed(connection, view):
+    # When the view was last refreshed, or None if we've never refreshed it
+    return connection.execute(
+        text("SELECT refreshed_at FROM mv_refresh_state WHERE view_name = :view"), {"view": view}
+    ).scalar()
+
+
+def refresh_view(connection, view, concurrently=True):
+    # The view name can't be a bind parameter (they only stand in for values), so we only ever refresh
+    # views we know about
+    if view not in VIEWS:
+        raise ValueError(f"Unknown materialized view: {view}")
+
+    keyword = "CONCURRENTLY " if concurrently else ""
+    connection.execute(text(f"REFRESH MATERIALIZED VIEW {keyword}{view}"))
+
+
+class ViewRefresher:
+
+    def __init__(self, engine, views=VIEWS, interval=DEFAULT_INTERVAL):
+        self.engine = engine
+        self.views = views
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_if_changed(self, view):
+        # Returns True if the view was refreshed
+        with self.engine.begin() as connection:
+            changes = take_pending_changes(connection, view)
+            if changes == 0 and last_refreshed(connection, view) is not None:
+                return False
+
+            refresh_view(connection, view)
+            connection.execute(text("""
+                INSERT INTO mv_refresh_state (view_name, refreshed_at)
+                VALUES (:view, CURRENT_TIMESTAMP)
+                ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+            """), {"view": view})
+
+        logger.info("Refreshed %s (%s changes)", view, changes)
+        return True
+
+    def run_once(self):
+        # Checks every view once. A failure on one view is logged, and doesn't stop the others.
+        refreshed = []
+
+        for view in self.views:
+            try:
+                if self.refresh_if_changed(view):
+                    refreshed.append(view)
+            except Exception:
+                logger.exception("Refreshing %s failed", view)
+
+        return refreshed
+
+    def run_forever(self):
+        # Event.wait() is a sleep that stop() can cut short
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        # Runs in a background thread, e.g. alongside a dashboard app in the same process
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="view-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh materialized views when their tables change")
+    parser.add_argument("--install", action="store_true", help="run materialized-views.sql first")
+    parser.add_argument("--once", action="store_true", help="check once and exit")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    engine = create_pooled_engine(pool_size=1, max_overflow=1)
+
+    try:
+        if args.install:
+            install(engine)
+
+        refresher = ViewRefresher(engine, interval=args.interval)
+        if args.once:
+            print(refresher.run_once())
+        else:
+            refresher.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.dispose()